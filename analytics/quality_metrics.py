@@ -1,33 +1,87 @@
 from collections import Counter
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 
-def compute_quality_metrics(clean_records: List[Dict], rejected_records: List[Dict]) -> Dict:
-    total = len(clean_records) + len(rejected_records)
-    clean_count = len(clean_records)
-    rejected_count = len(rejected_records)
+def new_quality_tally() -> Dict:
+    """
+    Create an empty running tally for streaming quality metrics.
+    """
+    return {
+        "clean_records": 0,
+        "rejected_records": 0,
+        "reasons": Counter(),
+        "fields": Counter(),
+        "rules": Counter()
+    }
 
-    rejection_rate = (rejected_count / total) * 100 if total else 0
+
+def update_quality_tally(
+    tally: Dict,
+    clean_records: List[Dict],
+    rejected_records: List[Dict],
+    error_counts: Optional[Counter] = None
+) -> Dict:
+    """
+    Add one batch of clean and rejected records to a running tally.
+
+    error_counts, from validation.error_codes.count_error_codes, gives the
+    batch's failures per (field, rule, reason) without looking at the
+    records. Otherwise reasons are read from each record's errors.
+    """
+    tally["clean_records"] += len(clean_records)
+    tally["rejected_records"] += len(rejected_records)
+
+    if error_counts is not None:
+        for (field_name, rule, reason), hits in error_counts.items():
+            tally["reasons"][reason] += hits
+            tally["fields"][field_name] += hits
+            tally["rules"][rule] += hits
+        return tally
 
     # Collect rejection reasons
-    reasons = []
     for r in rejected_records:
         if "rejection_reason" in r:
-            reasons.append(r["rejection_reason"])
+            tally["reasons"][r["rejection_reason"]] += 1
+        elif r.get("errors"):
+            tally["reasons"].update(r["errors"])
         else:
-            reasons.append("unknown")
+            tally["reasons"]["unknown"] += 1
+
+    return tally
+
 
-    top_rejection_reasons = Counter(reasons).most_common(10)
+def summarize_quality_tally(tally: Dict) -> Dict:
+    """
+    Turn a running tally into the metrics dict used by the quality report.
+    """
+    clean_count = tally["clean_records"]
+    rejected_count = tally["rejected_records"]
+    total = clean_count + rejected_count
+
+    rejection_rate = (rejected_count / total) * 100 if total else 0
+
+    top_rejection_reasons = tally["reasons"].most_common(10)
 
     return {
         "total_records": total,
         "clean_records": clean_count,
         "rejected_records": rejected_count,
         "rejection_rate_percent": round(rejection_rate, 2),
-        "top_rejection_reasons": top_rejection_reasons
+        "top_rejection_reasons": top_rejection_reasons,
+        "rejections_by_field": dict(tally["fields"].most_common()),
+        "rejections_by_rule": dict(tally["rules"].most_common())
     }
 
 
+def compute_quality_metrics(
+    clean_records: List[Dict],
+    rejected_records: List[Dict],
+    error_counts: Optional[Counter] = None
+) -> Dict:
+    tally = update_quality_tally(new_quality_tally(), clean_records, rejected_records, error_counts)
+    return summarize_quality_tally(tally)
+
+
 def print_quality_report(metrics: Dict):
     print("\nDATA QUALITY REPORT")
     print("-------------------")
@@ -39,3 +93,13 @@ def print_quality_report(metrics: Dict):
     print("\nTop rejection reasons:")
     for reason, count in metrics["top_rejection_reasons"]:
         print(f" - {reason}: {count}")
+
+    if metrics.get("rejections_by_field"):
+        print("\nRejections by field:")
+        for field_name, count in metrics["rejections_by_field"].items():
+            print(f" - {field_name}: {count}")
+
+    if metrics.get("rejections_by_rule"):
+        print("\nRejections by rule:")
+        for rule, count in metrics["rejections_by_rule"].items():
+            print(f" - {rule}: {count}")
@@ -1,6 +1,10 @@
 from collections import Counter
 from typing import List, Dict
 
+import pandas as pd
+
+from transformation.batch import RecordBatch
+
 
 def loan_status_report(clean_records: List[Dict]) -> Dict:
     status_counter = Counter()
@@ -27,10 +31,76 @@ def average_loan_amount_by_status(clean_records: List[Dict]) -> Dict:
     return averages
 
 
-def print_business_report(clean_records: List[Dict]):
+def new_business_tally() -> Dict:
+    """
+    Create an empty running tally for the streaming business report.
+    """
+    return {"counts": Counter(), "totals": {}}
+
+
+def update_business_tally(tally: Dict, clean_records: List[Dict]) -> Dict:
+    """
+    Add one batch of clean records to a running business tally.
+    """
+    for record in clean_records:
+        status = record.get("loan_status", "UNKNOWN")
+        amount = float(record.get("loan_amount", 0))
+
+        tally["counts"][status] += 1
+        tally["totals"][status] = tally["totals"].get(status, 0) + amount
+
+    return tally
+
+
+def update_business_tally_frame(tally: Dict, clean_frame) -> Dict:
+    """
+    Add one typed batch (loan_amount already float64), as a DataFrame or
+    RecordBatch, to a running business tally without going through
+    per-record dicts.
+    """
+    if isinstance(clean_frame, RecordBatch):
+        clean_frame = clean_frame.frame
+    if not len(clean_frame):
+        return tally
+
+    if "loan_status" in clean_frame.columns:
+        status = clean_frame["loan_status"].astype(object).fillna("UNKNOWN")
+    else:
+        status = pd.Series("UNKNOWN", index=clean_frame.index)
+
+    if "loan_amount" in clean_frame.columns:
+        amounts = clean_frame["loan_amount"].astype(float)
+    else:
+        amounts = pd.Series(0.0, index=clean_frame.index)
+
+    grouped = amounts.groupby(status.to_numpy(), sort=False).agg(["size", "sum"])
+    for status_value, row in grouped.iterrows():
+        tally["counts"][status_value] += int(row["size"])
+        tally["totals"][status_value] = tally["totals"].get(status_value, 0) + float(row["sum"])
+
+    return tally
+
+
+def print_business_report(clean_records):
+    if isinstance(clean_records, RecordBatch):
+        print_business_tally(update_business_tally_frame(new_business_tally(), clean_records))
+        return
+
     status_report = loan_status_report(clean_records)
     avg_amount_report = average_loan_amount_by_status(clean_records)
+    _print_business_sections(status_report, avg_amount_report)
+
+
+def print_business_tally(tally: Dict):
+    status_report = dict(tally["counts"])
+    avg_amount_report = {
+        status: tally["totals"][status] / tally["counts"][status]
+        for status in tally["totals"]
+    }
+    _print_business_sections(status_report, avg_amount_report)
+
 
+def _print_business_sections(status_report: Dict, avg_amount_report: Dict):
     print("\nBUSINESS REPORT")
     print("---------------")
     print("Loans by Status:")
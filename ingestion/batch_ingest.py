@@ -0,0 +1,355 @@
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, UTC
+from typing import Dict, List
+
+# Add the workspace root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ingestion.ingest import (
+    setup_logging,
+    load_client_config,
+    load_mapping_config,
+    new_run_context,
+    run_file,
+    quarantine_run,
+    discard_exports,
+    add_pipeline_arguments,
+    configure_storage,
+    storage_options_from_args
+)
+from storage import database
+from validation.error_budget import ErrorBudgetExceeded
+from storage.ingestion_manifest import SKIP
+from storage.columnar import COMPRESSION_CODECS
+
+
+RAW_ROOT = "data/raw"
+CLIENT_CONFIG_DIR = "config/clients"
+SCHEMA_PATH = "config/schemas/loan_schema.json"
+
+# Set in each worker process by _init_worker
+_worker_state = {"write_lock": None, "logger": None}
+
+
+def discover_jobs(root: str = RAW_ROOT) -> List[Dict]:
+    """
+    Find input files laid out as <root>/<client>/<file>.csv.
+    Directories without a matching client config are skipped.
+    """
+    jobs = []
+
+    for client in sorted(os.listdir(root)):
+        client_dir = os.path.join(root, client)
+        config_path = os.path.join(CLIENT_CONFIG_DIR, f"{client}.json")
+        if not os.path.isdir(client_dir) or not os.path.exists(config_path):
+            continue
+
+        for name in sorted(os.listdir(client_dir)):
+            if name.endswith(".csv"):
+                jobs.append({"client": client, "file": os.path.join(client_dir, name)})
+
+    return jobs
+
+
+def load_manifest(path: str) -> List[Dict]:
+    """
+    Load jobs from a CSV manifest with client and file columns.
+    """
+    with open(path, "r", newline="") as f:
+        reader = csv.DictReader(f)
+        missing = {"client", "file"} - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"Manifest is missing columns: {', '.join(sorted(missing))}")
+
+        return [{"client": row["client"], "file": row["file"]} for row in reader]
+
+
+def job_export_paths(client: str, file_path: str, ingestion_id: str) -> dict:
+    """
+    Per-file CSV export locations, so concurrent jobs never share a file.
+    """
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    prefix = f"{stem}_{ingestion_id}"
+
+    return {
+        "clean": os.path.join("data", "processed", client, f"{prefix}_clean.csv"),
+        "rejected": os.path.join("data", "rejected", client, f"{prefix}_error.csv"),
+        "disappeared": os.path.join("data", "processed", client, f"{prefix}_disappeared.csv")
+    }
+
+
+def plan_tasks(jobs: List[Dict], batch_id: str, cdc: bool = False) -> List[Dict]:
+    """
+    Load each client's configs once and group jobs into worker tasks.
+
+    Every file gets its own ingestion_id. With cdc a client's files share
+    one snapshot index, so they are kept together in a single task and run
+    in order; otherwise each file is its own task.
+    """
+    with open(SCHEMA_PATH, "r") as f:
+        loan_schema = json.load(f)
+
+    configs = {}
+    tasks = []
+    by_client = {}
+
+    for number, job in enumerate(jobs, start=1):
+        client = job["client"]
+        if client not in configs:
+            mapping_config = load_mapping_config(client)
+            configs[client] = {
+                "client_config": load_client_config(client),
+                "mapping": mapping_config.get("mapping", mapping_config),
+                "loan_schema": loan_schema
+            }
+
+        ingestion_id = f"{batch_id}_{number:03d}"
+        file_job = {
+            "client": client,
+            "file": job["file"],
+            "ingestion_id": ingestion_id,
+            "export_paths": job_export_paths(client, job["file"], ingestion_id)
+        }
+
+        if cdc and client in by_client:
+            by_client[client]["jobs"].append(file_job)
+            continue
+
+        task = {"configs": configs[client], "jobs": [file_job]}
+        tasks.append(task)
+        by_client[client] = task
+
+    return tasks
+
+
+class _JobLogAdapter(logging.LoggerAdapter):
+    """
+    Prefix worker log lines with the file's ingestion_id and path.
+    """
+    def process(self, msg, kwargs):
+        return f"[{self.extra['ingestion_id']} {self.extra['file']}] {msg}", kwargs
+
+
+def database_settings() -> dict:
+    """
+    Snapshot the parent's database settings to hand to worker processes.
+    """
+    return {
+        "url": database.DB_PATH,
+        "pool_size": database.POOL_SETTINGS["pool_size"],
+        "max_overflow": database.POOL_SETTINGS["max_overflow"],
+        "sqlite_pragmas": dict(database.SQLITE_PRAGMAS)
+    }
+
+
+def _init_worker(write_lock, db_settings: dict, batch_id: str):
+    """
+    Runs once in each worker process. Engines are not shared across
+    processes, so each worker opens its own against the same database.
+    """
+    database.configure_engine(**db_settings)
+    _worker_state["write_lock"] = write_lock
+    _worker_state["logger"] = setup_logging(batch_id)
+
+
+def run_task(
+    task: Dict,
+    storage_options: dict,
+    chunk_size: int = None,
+    cdc: bool = False,
+    pipeline_depth: int = None,
+    incremental: bool = False
+) -> List[Dict]:
+    """
+    Ingest the files of one task in order. A failed file is reported in
+    its result and does not stop the rest of the batch.
+    """
+    configs = task["configs"]
+    results = []
+
+    for job in task["jobs"]:
+        logger = _JobLogAdapter(
+            _worker_state["logger"] or logging.getLogger("ingestion"),
+            {"ingestion_id": job["ingestion_id"], "file": job["file"]}
+        )
+
+        result = {
+            "client": job["client"],
+            "file": job["file"],
+            "ingestion_id": job["ingestion_id"],
+            "clean": 0,
+            "rejected": 0,
+            "status": "ok",
+            "error": None
+        }
+        started = time.perf_counter()
+        run = None
+
+        try:
+            run = new_run_context(
+                configs["client_config"],
+                configs["mapping"],
+                configs["loan_schema"],
+                job["ingestion_id"],
+                logger,
+                storage_options,
+                cdc=cdc,
+                export_paths=job["export_paths"],
+                write_lock=_worker_state["write_lock"]
+            )
+            quality_tally, _ = run_file(
+                job["file"], run, chunk_size, pipeline_depth=pipeline_depth, incremental=incremental
+            )
+
+            result["clean"] = quality_tally["clean_records"]
+            result["rejected"] = quality_tally["rejected_records"]
+            if run["manifest"] is not None and run["manifest"]["action"] == SKIP:
+                result["status"] = "skipped"
+                result["error"] = f"unchanged since {run['manifest']['previous']['ingestion_id']}"
+        except ErrorBudgetExceeded as e:
+            report = quarantine_run(run, e.budget, job["file"])
+            logger.error(f"File quarantined: {e}. Report: {report['report_path']}")
+            result["rejected"] = e.budget["rejected"]
+            result["status"] = "quarantined"
+            result["error"] = str(e)
+        except Exception as e:
+            logger.error(f"Ingestion failed: {e}", exc_info=True)
+            if run is not None:
+                # a later batch writes to new export paths, so these are never resumed
+                discard_exports(run["export_paths"], run["export_compression"])
+            result["status"] = "failed"
+            result["error"] = str(e)
+
+        result["seconds"] = round(time.perf_counter() - started, 2)
+        results.append(result)
+
+    return results
+
+
+def run_batch(
+    tasks: List[Dict],
+    storage_options: dict,
+    workers: int,
+    batch_id: str,
+    chunk_size: int = None,
+    cdc: bool = False,
+    pipeline_depth: int = None,
+    incremental: bool = False
+) -> List[Dict]:
+    """
+    Run tasks across a pool of worker processes.
+
+    Tables are created up front; database writes are serialised with a
+    lock shared by every worker so SQLite sees one writer at a time while
+    reading, transforming and validating run in parallel.
+    Returns one result per file, in job order.
+    """
+    database.create_tables()
+    # Workers open their own connections; don't hand them the parent's pool
+    database.dispose_engine()
+
+    write_lock = multiprocessing.Lock()
+    results = []
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(write_lock, database_settings(), batch_id)
+    ) as pool:
+        futures = [pool.submit(run_task, task, storage_options, chunk_size, cdc, pipeline_depth, incremental) for task in tasks]
+        for future in as_completed(futures):
+            results.extend(future.result())
+
+    return sorted(results, key=lambda result: result["ingestion_id"])
+
+
+def print_batch_summary(results: List[Dict]):
+    print("\n=== BATCH INGESTION SUMMARY ===")
+    for result in results:
+        line = (
+            f"{result['ingestion_id']}  {result['client']:<10} {result['file']}: "
+            f"{result['clean']} clean, {result['rejected']} rejected ({result['seconds']}s)"
+        )
+        if result["status"] != "ok":
+            line += f"  {result['status'].upper()}: {result['error']}"
+        print(line)
+
+    failed = sum(1 for result in results if result["status"] == "failed")
+    quarantined = sum(1 for result in results if result["status"] == "quarantined")
+    skipped = sum(1 for result in results if result["status"] == "skipped")
+    print(f"Files: {len(results)}, failed: {failed}, quarantined: {quarantined}, skipped: {skipped}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ingest many lender files in parallel"
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--root",
+        default=RAW_ROOT,
+        help=f"Directory laid out as <root>/<client>/*.csv (default: {RAW_ROOT})"
+    )
+    source.add_argument(
+        "--manifest",
+        help="CSV file with client and file columns listing the files to ingest"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes (default: CPU count)"
+    )
+    add_pipeline_arguments(parser)
+
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.incremental and args.cdc:
+        parser.error("--incremental and --cdc cannot be combined")
+    if args.sink == "duckdb" and args.workers > 1:
+        parser.error("--sink duckdb writes from one process at a time; use --workers 1")
+    if args.columnar and args.columnar_compression not in COMPRESSION_CODECS[args.columnar]:
+        parser.error(f"--columnar {args.columnar} does not support {args.columnar_compression} compression")
+
+    batch_id = f"INGEST_{datetime.now(UTC).strftime('%Y%m%d%H%M%S')}"
+    logger = setup_logging(batch_id)
+
+    try:
+        configure_storage(args)
+
+        jobs = load_manifest(args.manifest) if args.manifest else discover_jobs(args.root)
+        logger.info(f"Starting batch ingestion: {batch_id} ({len(jobs)} files, {args.workers} workers)")
+
+        tasks = plan_tasks(jobs, batch_id, cdc=args.cdc)
+        results = run_batch(
+            tasks,
+            storage_options_from_args(args),
+            args.workers,
+            batch_id,
+            chunk_size=args.chunk_size,
+            cdc=args.cdc,
+            pipeline_depth=args.pipeline_depth,
+            incremental=args.incremental
+        )
+    except Exception as e:
+        logger.error(f"Batch ingestion failed: {e}", exc_info=True)
+        sys.exit(1)
+
+    print_batch_summary(results)
+
+    if any(result["status"] in ("failed", "quarantined") for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,91 @@ import json
 import logging
 import os
 import sys
+from contextlib import nullcontext
+from itertools import count
 from datetime import datetime, UTC
+from typing import Iterator, List
+
+try:
+    import zstandard
+except ImportError:  # only needed for zstd compressed exports
+    zstandard = None
 
 # Add the workspace root to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from validation.validator import validate_records
-from transformation.transformer import transform_records
-from analytics.quality_metrics import compute_quality_metrics, print_quality_report
-from analytics.reporting import print_business_report
+from validation.validator import compile_schema, validate_frame
+from validation.coercion import untype_frame
+from validation import error_codes
+from validation.error_codes import count_error_codes, with_rendered_errors, ERROR_CODES_COLUMN
+from validation.error_budget import (
+    ErrorBudgetExceeded,
+    new_error_budget,
+    check_error_budget,
+    close_error_budget,
+    write_quarantine_report,
+    print_quarantine_report
+)
+from transformation.transformer import get_client_plan, apply_mapping_frame
+from transformation.batch import RecordBatch
+from transformation.dates import (
+    DATE_SAMPLE_SIZE,
+    infer_date_formats,
+    sample_date_values,
+    explain_date_failure
+)
+from analytics.quality_metrics import (
+    compute_quality_metrics,
+    print_quality_report,
+    new_quality_tally,
+    update_quality_tally,
+    summarize_quality_tally
+)
+from analytics.reporting import (
+    print_business_report,
+    new_business_tally,
+    update_business_tally_frame,
+    print_business_tally
+)
+import numpy as np
 import pandas as pd
-from storage.database import create_tables, insert_clean_records, insert_rejected_records
+from ingestion.sharding import prepare_sharded, parse_csv_bytes, line_offset
+from ingestion.pipeline import run_pipeline, format_stage_stats, print_stage_report
+from storage.snapshot import new_snapshot_state, apply_snapshot_diff, finish_snapshot, discard_fingerprint_index
+from storage.loan_index import (
+    new_duplicate_state, find_duplicates, find_stored_since, record_stored, finish_duplicates
+)
+from storage.columnar import (
+    new_columnar_state,
+    write_columnar,
+    remove_columnar_ingestion,
+    COLUMNAR_DIR,
+    COLUMNAR_FORMATS,
+    COMPRESSION_CODECS,
+    DEFAULT_COMPRESSION
+)
+from storage.ingestion_manifest import (
+    new_manifest_state,
+    checkpoint_manifest,
+    catch_up_manifest,
+    finish_manifest,
+    rewind_manifest,
+    hash_file_range,
+    SKIP,
+    FULL,
+    RESUME
+)
+from storage.sinks import new_sink, SINKS, DEFAULT_SINK, DUCKDB_URL
+from storage.database import (
+    configure_engine,
+    new_checkpoint,
+    advance_checkpoint,
+    load_checkpoint,
+    rollback_ingestion,
+    DEFAULT_BATCH_SIZE,
+    WRITE_MODES,
+    CONFLICT_POLICIES
+)
 
 
 def setup_logging(ingestion_id: str):
@@ -26,6 +100,11 @@ def setup_logging(ingestion_id: str):
     # Create logger
     logger = logging.getLogger("ingestion")
     logger.setLevel(logging.DEBUG)
+
+    # Replace handlers from an earlier call (or inherited by a worker process)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
     
     # Ingestion log handler (INFO level)
     ingestion_handler = logging.FileHandler("logs/ingestion.log")
@@ -82,9 +161,41 @@ def load_mapping_config(client_name: str) -> dict:
         return json.load(f)
 
 
-def read_input_file(file_path: str, client_config: dict) -> pd.DataFrame:
+def read_header(file_path: str, client_config: dict) -> List[str]:
+    """
+    Column names from a CSV's header line, without reading any rows.
+    """
+    return list(pd.read_csv(
+        file_path,
+        delimiter=client_config.get("delimiter", ","),
+        encoding=client_config.get("encoding", "utf-8"),
+        nrows=0
+    ).columns)
+
+
+def csv_read_options(file_path: str, client_config: dict, plan, chunked: bool = False) -> dict:
+    """
+    Schema-aware read_csv options from the client's compiled plan: only
+    mapped columns, with their dtype hints, and the configured engine.
+    The pyarrow engine cannot stream chunks, so chunked reads use the
+    C parser.
+    """
+    if plan is None:
+        return {}
+
+    options = plan.read_options(read_header(file_path, client_config))
+    if not (chunked and plan.csv_engine == "pyarrow"):
+        options["engine"] = plan.csv_engine
+
+    return options
+
+
+def read_input_file(file_path: str, client_config: dict, plan=None, skip_rows: int = 0) -> pd.DataFrame:
     """
     Read raw client file into a DataFrame based on client configuration.
+    With the client's plan, unmapped columns are skipped and the rest are
+    read with dtypes from the schema. skip_rows leaves out that many rows
+    after the header, e.g. ones a resumed run already committed.
     """
     file_format = client_config["file_format"]
 
@@ -92,33 +203,1122 @@ def read_input_file(file_path: str, client_config: dict) -> pd.DataFrame:
         return pd.read_csv(
             file_path,
             delimiter=client_config.get("delimiter", ","),
-            encoding=client_config.get("encoding", "utf-8")
+            encoding=client_config.get("encoding", "utf-8"),
+            skiprows=range(1, skip_rows + 1) if skip_rows else None,
+            # the pyarrow engine only skips a leading count of lines, header included
+            **csv_read_options(file_path, client_config, plan, chunked=bool(skip_rows))
         )
 
     raise ValueError(f"Unsupported file format: {file_format}")
 
 
-def export_to_csv(clean_records: list, rejected_records: list, logger: logging.Logger):
+def iter_input_chunks(
+    file_path: str,
+    client_config: dict,
+    chunk_size: int,
+    plan=None,
+    skip_rows: int = 0
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a raw client file as DataFrames of at most chunk_size rows,
+    after skipping skip_rows rows.
+    """
+    file_format = client_config["file_format"]
+
+    if file_format == "csv":
+        with pd.read_csv(
+            file_path,
+            delimiter=client_config.get("delimiter", ","),
+            encoding=client_config.get("encoding", "utf-8"),
+            chunksize=chunk_size,
+            skiprows=range(1, skip_rows + 1) if skip_rows else None,
+            **csv_read_options(file_path, client_config, plan, chunked=True)
+        ) as reader:
+            yield from reader
+        return
+
+    raise ValueError(f"Unsupported file format: {file_format}")
+
+
+def iter_input_ranges(
+    file_path: str,
+    client_config: dict,
+    header: bytes,
+    start: int,
+    end: int,
+    hasher,
+    chunk_size: int = None,
+    plan=None
+) -> Iterator[tuple]:
+    """
+    Stream the rows between byte offsets start and end of a CSV, chunk_size
+    lines at a time (all of them at once by default), tracking where each
+    chunk ends so an incremental run can checkpoint it.
+
+    hasher, if given, covers the file up to start and is fed every line
+    read. Yields (df_chunk, end_offset, hasher_at_end_offset).
+    """
+    file_format = client_config["file_format"]
+    if file_format != "csv":
+        raise ValueError(f"Unsupported file format: {file_format}")
+
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        position = start
+
+        while position < end:
+            if chunk_size:
+                lines = []
+                while len(lines) < chunk_size and position < end:
+                    line = f.readline(end - position)
+                    if not line:
+                        break
+                    lines.append(line)
+                    position += len(line)
+                body = b"".join(lines)
+            else:
+                body = f.read(end - position)
+                position += len(body)
+
+            if not body:
+                break
+
+            if hasher is not None:
+                hasher.update(body)
+                yield parse_csv_bytes(header, body, client_config, plan), position, hasher.copy()
+            else:
+                yield parse_csv_bytes(header, body, client_config, plan), position, None
+
+
+CLEAN_EXPORT_PATH = "data/processed/loans_clean.csv"
+REJECTED_EXPORT_PATH = "data/rejected/loans_error.csv"
+DISAPPEARED_EXPORT_PATH = "data/processed/loans_disappeared.csv"
+
+# File name suffix of each export compression
+EXPORT_COMPRESSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+# Joins a rejected row's error messages into its one errors column
+ERRORS_SEPARATOR = "; "
+
+# storage_options entries that configure the run rather than the inserts
+RUN_OPTIONS = ("commit_size", "columnar", "export_compression", "sink")
+
+
+def default_export_paths(ingestion_id: str = None) -> dict:
+    """
+    The export locations used by a single-file run, named after the
+    ingestion so one run never overwrites another's exports.
+    """
+    paths = {
+        "clean": CLEAN_EXPORT_PATH,
+        "rejected": REJECTED_EXPORT_PATH,
+        "disappeared": DISAPPEARED_EXPORT_PATH
+    }
+    if ingestion_id is None:
+        return paths
+
+    return {kind: f"{os.path.splitext(path)[0]}_{ingestion_id}.csv" for kind, path in paths.items()}
+
+
+def run_export_paths(run: dict) -> dict:
+    return run["export_paths"] or default_export_paths(run["ingestion_id"])
+
+
+def export_path(path: str, compression: str = "none") -> str:
+    """
+    Where a finished export ends up, with its compression's suffix.
+    """
+    return path + EXPORT_COMPRESSIONS[compression]
+
+
+def partial_export_path(path: str, compression: str = "none") -> str:
+    """
+    Where an export is written until its run finishes.
+    """
+    return f"{export_path(path, compression)}.partial"
+
+
+def reset_exports(paths: dict = None, compression: str = "none"):
+    """
+    Remove previous CSV exports so a streaming run can append to fresh files.
+    """
+    paths = paths or default_export_paths()
+
+    for path in (paths["clean"], paths["rejected"]):
+        for stale in (export_path(path, compression), partial_export_path(path, compression)):
+            if os.path.exists(stale):
+                os.remove(stale)
+
+
+def export_to_csv(
+    clean_records,
+    rejected_records,
+    logger: logging.Logger,
+    append: bool = False,
+    paths: dict = None,
+    compression: str = "none"
+):
     """
     Export clean and rejected records to CSV files.
+
+    Records are lists of dicts or RecordBatches; a batch is written from
+    its columns, with its metadata as constant columns, and a rejected
+    row's error messages are joined into one errors column.
+
+    Rows go to each export's .partial file, which finish_exports renames
+    into place once the run is complete, so a finished export is never
+    half written. With append=True the records are added to the file and
+    the header is only written when it is first created. paths overrides
+    the default export locations; compression is "none", "gzip" or "zstd".
     """
-    # Create output directories if they don't exist
-    os.makedirs("data/processed", exist_ok=True)
-    os.makedirs("data/rejected", exist_ok=True)
-    
+    paths = paths or default_export_paths()
+
     # Export clean records
-    if clean_records:
-        clean_df = pd.DataFrame(clean_records)
-        clean_path = "data/processed/loans_clean.csv"
-        clean_df.to_csv(clean_path, index=False)
-        logger.info(f"Exported clean records to {clean_path}")
+    if len(clean_records):
+        path = partial_export_path(paths["clean"], compression)
+        _write_csv(_export_frame(clean_records), path, append, compression)
+        logger.info(f"Exported clean records to {path}")
     
     # Export rejected records
-    if rejected_records:
-        rejected_df = pd.DataFrame(rejected_records)
-        rejected_path = "data/rejected/loans_error.csv"
-        rejected_df.to_csv(rejected_path, index=False)
-        logger.info(f"Exported rejected records to {rejected_path}")
+    if len(rejected_records):
+        path = partial_export_path(paths["rejected"], compression)
+        _write_csv(_export_frame(rejected_records), path, append, compression)
+        logger.info(f"Exported rejected records to {path}")
+
+
+def discard_exports(paths: dict, compression: str = None) -> int:
+    """
+    Remove a run's unfinished .partial exports, written with compression
+    or, when it is not known, with any. Returns how many were removed.
+    """
+    compressions = [compression] if compression else list(EXPORT_COMPRESSIONS)
+    removed = 0
+
+    for path in (paths["clean"], paths["rejected"]):
+        for name in compressions:
+            partial = partial_export_path(path, name)
+            if os.path.exists(partial):
+                os.remove(partial)
+                removed += 1
+    return removed
+
+
+def discard_failed_exports(run: dict):
+    """
+    Remove the .partial exports of a run that failed, unless it committed
+    rows: --resume carries that ingestion on and appends to them, and
+    they are removed if it is rolled back instead.
+    """
+    checkpoint = run["checkpoint"]
+    if checkpoint is not None and checkpoint["commits"]:
+        run["logger"].info(f"Keeping the unfinished exports of {run['ingestion_id']} for --resume")
+        return
+
+    discard_exports(run_export_paths(run), run["export_compression"])
+
+
+def finish_exports(paths: dict, logger: logging.Logger, compression: str = "none"):
+    """
+    Move a finished run's exports from their .partial files into place.
+    """
+    for kind in ("clean", "rejected"):
+        partial = partial_export_path(paths[kind], compression)
+        if os.path.exists(partial):
+            os.replace(partial, export_path(paths[kind], compression))
+            logger.info(f"Finished {kind} export {export_path(paths[kind], compression)}")
+
+
+def _export_frame(records) -> pd.DataFrame:
+    if isinstance(records, RecordBatch):
+        # the batch's typed timestamp is written out as ISO-8601 text
+        metadata = {
+            name: value.isoformat() if isinstance(value, datetime) else value
+            for name, value in records.metadata.items()
+        }
+        frame = RecordBatch(records.frame, metadata).to_frame()
+    else:
+        frame = pd.DataFrame(records)
+
+    if "errors" in frame.columns:
+        frame["errors"] = [
+            errors if isinstance(errors, str) else ERRORS_SEPARATOR.join(errors)
+            for errors in frame["errors"]
+        ]
+    return frame
+
+
+def export_disappeared(loan_ids: list, logger: logging.Logger, paths: dict = None, compression: str = "none"):
+    """
+    Export the loan_ids missing from today's snapshot compared to the last one.
+    """
+    path = (paths or default_export_paths())["disappeared"]
+    final_path = export_path(path, compression)
+
+    if os.path.exists(final_path):
+        os.remove(final_path)
+
+    if loan_ids:
+        partial = partial_export_path(path, compression)
+        _write_csv(pd.DataFrame({"loan_id": loan_ids}), partial, False, compression)
+        os.replace(partial, final_path)
+        logger.info(f"Exported disappeared loan_ids to {final_path}")
+
+
+def _write_csv(df: pd.DataFrame, path: str, append: bool, compression: str = "none"):
+    """
+    Write df to path, or add it to the end. Compressed files get one more
+    gzip member or zstd frame per write, which readers decompress as one.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    options = {"compression": None if compression == "none" else compression, "index": False}
+
+    if append:
+        df.to_csv(path, mode="a", header=not os.path.exists(path), **options)
+    else:
+        df.to_csv(path, **options)
+
+
+def store_records(
+    clean_records,
+    rejected_records,
+    sink,
+    logger: logging.Logger,
+    checkpoint: dict = None
+):
+    """
+    Write clean and rejected records through the run's storage sink in
+    one transaction and log the load rate. checkpoint, when given, is
+    saved in the same transaction, so it always describes exactly the
+    rows committed.
+
+    Records are lists of dicts or RecordBatches.
+    """
+    try:
+        loads = sink.write_batch(clean_records, rejected_records)
+        if checkpoint is not None:
+            sink.write_checkpoint(checkpoint)
+        sink.commit()
+    except Exception:
+        sink.rollback()
+        raise
+
+    for stats in loads:
+        logger.info(
+            f"Loaded {stats['rows']} rows into {stats['table']} ({stats['written']} written) "
+            f"in {stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/sec)"
+        )
+
+
+def new_run_context(
+    client_config: dict,
+    mapping: dict,
+    loan_schema: dict,
+    ingestion_id: str,
+    logger: logging.Logger,
+    storage_options: dict = None,
+    cdc: bool = False,
+    export_paths: dict = None,
+    write_lock=None
+) -> dict:
+    """
+    Bundle the per-run settings every batch needs. The schema and the
+    client's transformation plan are compiled once here rather than per
+    batch; the plan is shared by every run with the same configs.
+
+    export_paths overrides the CSV export locations (by default named
+    after the ingestion) and write_lock, when given, is held around every
+    database write so concurrent runs take turns on the database.
+
+    storage_options holds batch_size, write_mode and conflict_policy for
+    the run's storage sink, chosen by its "sink" entry (see storage.sinks;
+    bulk inserts by default), and the other RUN_OPTIONS. A "columnar" entry in storage_options (format, compression, directory)
+    also writes every commit as Parquet or Arrow IPC files, and
+    "export_compression" compresses the CSV exports.
+    """
+    columnar = (storage_options or {}).get("columnar")
+    export_compression = (storage_options or {}).get("export_compression") or "none"
+    sink_options = {name: value for name, value in (storage_options or {}).items() if name not in RUN_OPTIONS}
+    if export_compression not in EXPORT_COMPRESSIONS:
+        raise ValueError(f"Unsupported export compression: {export_compression}")
+    if export_compression == "zstd" and zstandard is None:
+        raise ImportError("zstandard is required for zstd compressed exports")
+
+    return {
+        "client_config": client_config,
+        "mapping": mapping,
+        "compiled_schema": compile_schema(loan_schema),
+        "plan": get_client_plan(mapping, client_config, loan_schema),
+        "ingestion_id": ingestion_id,
+        # one typed value for every row the ingestion stores
+        "ingestion_timestamp": datetime.now(UTC),
+        "date_formats": client_config.get("date_formats", []),
+        "logger": logger,
+        "storage_options": storage_options or {},
+        "snapshot": new_snapshot_state(client_config["client_id"]) if cdc else None,
+        "export_paths": export_paths,
+        "export_compression": export_compression,
+        "sink": new_sink((storage_options or {}).get("sink"), **sink_options),
+        "columnar": new_columnar_state(client_config["client_id"], **columnar) if columnar else None,
+        "write_lock": write_lock,
+        "stage_stats": None,
+        "error_budget": new_error_budget(client_config),
+        "duplicates": new_duplicate_state(
+            check_stored=(storage_options or {}).get("write_mode", "insert") == "insert"
+        ),
+        "manifest": None,
+        "checkpoint": None
+    }
+
+
+def batch_metadata(run: dict) -> dict:
+    """
+    The metadata fields shared by every row the run stores.
+    """
+    return run["plan"].metadata(run["ingestion_id"], run["ingestion_timestamp"])
+
+
+def transform_batch(df_raw: pd.DataFrame, run: dict) -> RecordBatch:
+    """
+    Map, clean and normalise one batch of raw rows, column-wise, into a
+    RecordBatch carrying the run's metadata.
+    """
+    batch = run["plan"].transform_batch(df_raw, batch_metadata(run), run["date_formats"])
+
+    for field_name, failed in batch.frame.attrs.get("date_failures", {}).items():
+        run["logger"].warning(
+            f"{field_name}: {len(failed)} distinct value(s) matched no date format, "
+            f"e.g. {explain_date_failure(failed[0], run['date_formats'])}"
+        )
+
+    return batch
+
+
+def detect_date_formats(df_sample: pd.DataFrame, run: dict):
+    """
+    Put the file's dominant date format first in run["date_formats"],
+    judged from a sample of its rows.
+    """
+    configured = run["client_config"].get("date_formats", [])
+    if len(configured) < 2:
+        return
+
+    mapped = apply_mapping_frame(df_sample.head(DATE_SAMPLE_SIZE), run["mapping"])
+    run["date_formats"] = infer_date_formats(sample_date_values(mapped), configured)
+
+    if run["date_formats"] != configured:
+        run["logger"].info(f"Date formats reordered for this file: {run['date_formats']}")
+
+
+def validate_batch(batch: RecordBatch, run: dict, complete: bool = False):
+    """
+    Validate one transformed batch, then screen it (see screen_batch).
+    Returns (clean, rejected) RecordBatches.
+    """
+    clean, rejected = validate_frame(batch, run["compiled_schema"])
+    return screen_batch(clean, rejected, run, complete)
+
+
+def screen_batch(clean: RecordBatch, rejected: RecordBatch, run: dict, complete: bool = False):
+    """
+    Route duplicate loan_ids to the rejected rows, then charge the rejects
+    to the run's error budget, raising ErrorBudgetExceeded before anything
+    is stored. complete says this batch is the whole file.
+    Returns (clean, rejected) RecordBatches.
+    """
+    clean, rejected = reject_duplicates(clean, rejected, run)
+
+    if run["error_budget"] is not None:
+        check_error_budget(run["error_budget"], clean, rejected, run["compiled_schema"], complete)
+
+    return clean, rejected
+
+
+def reject_duplicates(clean: RecordBatch, rejected: RecordBatch, run: dict):
+    """
+    Move clean rows whose loan_id repeats an earlier row of this ingestion,
+    or one already stored, to the rejected rows.
+    Returns (clean, rejected) RecordBatches.
+    """
+    if not _has_key_field(clean, run):
+        return clean, rejected
+
+    in_file, stored = find_duplicates(run["duplicates"], clean.frame[error_codes.KEY_FIELD])
+    return _move_duplicates(clean, rejected, in_file, stored, run)
+
+
+def reject_stored_since(clean: RecordBatch, rejected: RecordBatch, run: dict):
+    """
+    Move clean rows whose loan_id another ingestion stored after this run
+    loaded its loan_id index to the rejected rows, checked against the
+    database. Called holding the write lock, just before the rows are
+    stored; these rejects are not charged to the error budget.
+    Returns (clean, rejected) RecordBatches.
+    """
+    if not _has_key_field(clean, run):
+        return clean, rejected
+
+    stored = find_stored_since(run["duplicates"], clean.frame[error_codes.KEY_FIELD])
+    return _move_duplicates(clean, rejected, np.zeros(len(stored), dtype=bool), stored, run)
+
+
+def _has_key_field(clean: RecordBatch, run: dict) -> bool:
+    return (
+        any(check["field"] == error_codes.KEY_FIELD for check in run["compiled_schema"])
+        and error_codes.KEY_FIELD in clean.frame.columns
+        and len(clean.frame) > 0
+    )
+
+
+def _move_duplicates(clean: RecordBatch, rejected: RecordBatch, in_file, stored, run: dict):
+    clean_frame, rejected_frame = clean.frame, rejected.frame
+    duplicate = in_file | stored
+    if not duplicate.any():
+        return clean, rejected
+
+    key_check = next(check for check in run["compiled_schema"] if check["field"] == error_codes.KEY_FIELD)
+    moved = untype_frame(clean_frame[duplicate])
+    codes = error_codes.new_error_codes(len(moved), run["compiled_schema"])
+    error_codes.set_error(codes, in_file[duplicate], key_check, error_codes.DUPLICATE)
+    error_codes.set_error(codes, stored[duplicate], key_check, error_codes.ALREADY_STORED)
+    moved[ERROR_CODES_COLUMN] = codes
+
+    run["logger"].warning(f"{int(duplicate.sum())} row(s) rejected for a duplicate {error_codes.KEY_FIELD}")
+
+    if len(rejected_frame):
+        # keep the rejected rows in file order
+        moved = pd.concat([rejected_frame, moved]).sort_index(kind="stable")
+    return clean.with_frame(clean_frame[~duplicate]), rejected.with_frame(moved)
+
+
+def prepare_batch(df_raw: pd.DataFrame, run: dict, complete: bool = False):
+    """
+    Transform and validate one batch of raw rows.
+    Returns (clean, rejected) RecordBatches.
+    """
+    # Validate records after transformation, column-wise on the batch
+    return validate_batch(transform_batch(df_raw, run), run, complete)
+
+
+def process_batch(df_raw: pd.DataFrame, run: dict, append: bool = False, complete: bool = False):
+    """
+    Transform, validate, store and export one batch of raw rows.
+    Returns (clean, rejected) RecordBatches.
+    """
+    clean, rejected = prepare_batch(df_raw, run, complete)
+    return write_batch(clean, rejected, run, append=append)
+
+
+def write_batch(
+    clean: RecordBatch,
+    rejected: RecordBatch,
+    run: dict,
+    append: bool = False,
+    byte_offset: int = None
+):
+    """
+    Store and export one validated batch.
+
+    When a snapshot diff is active only new and changed clean rows are
+    stored and exported. Returns (clean, rejected) for the whole batch
+    so reports still describe the full delivery, less any rows found to
+    be stored by another ingestion meanwhile (see reject_stored_since).
+
+    The batch is committed in transactions of at most commit_size input
+    rows (storage_options; the whole batch by default), each advancing
+    run["checkpoint"] in the same transaction. byte_offset, the batch's
+    end in the file, is recorded in the checkpoint; a batch that has one
+    is committed whole, since the offset only holds at its end.
+    """
+    commit_size = None if byte_offset is not None else run["storage_options"].get("commit_size")
+    pieces = split_commits(clean.frame, rejected.frame, commit_size)
+
+    committed = [
+        _commit_batch(clean.with_frame(clean_part), rejected.with_frame(rejected_part), run, append or number > 0, byte_offset)
+        for number, (clean_part, rejected_part) in enumerate(pieces)
+    ]
+
+    if len(committed) == 1:
+        return committed[0]
+    return (
+        clean.with_frame(pd.concat([part.frame for part, _ in committed])),
+        rejected.with_frame(pd.concat([part.frame for _, part in committed]))
+    )
+
+
+def split_commits(clean_frame: pd.DataFrame, rejected_frame: pd.DataFrame, commit_size: int = None) -> list:
+    """
+    Cut a validated batch into pieces of at most commit_size input rows,
+    in the order they were read. Clean and rejected rows keep the index
+    they were read with, which gives each one's place in the batch.
+    Returns [(clean_frame, rejected_frame), ...].
+    """
+    if not commit_size or len(clean_frame) + len(rejected_frame) <= commit_size:
+        return [(clean_frame, rejected_frame)]
+
+    positions = np.sort(np.concatenate([clean_frame.index.to_numpy(), rejected_frame.index.to_numpy()]))
+    # the first row of every piece after the first
+    bounds = positions[commit_size::commit_size]
+    clean_piece = np.searchsorted(bounds, clean_frame.index.to_numpy(), side="right")
+    rejected_piece = np.searchsorted(bounds, rejected_frame.index.to_numpy(), side="right")
+
+    return [
+        (clean_frame[clean_piece == piece], rejected_frame[rejected_piece == piece])
+        for piece in range(len(bounds) + 1)
+    ]
+
+
+def _commit_batch(
+    clean: RecordBatch,
+    rejected: RecordBatch,
+    run: dict,
+    append: bool,
+    byte_offset: int = None
+):
+    logger = run["logger"]
+
+    with run["write_lock"] or nullcontext():
+        if run["duplicates"]["check_stored"]:
+            clean, rejected = reject_stored_since(clean, rejected, run)
+
+        # error codes become messages only here, where rejects are written out
+        rejected_rows = rejected.with_frame(with_rendered_errors(rejected.frame, run["compiled_schema"]))
+
+        changed = clean
+        if run["snapshot"] is not None:
+            changed = clean.with_frame(apply_snapshot_diff(run["snapshot"], clean.frame, rejected.frame))
+
+        checkpoint = None
+        if run["checkpoint"] is not None:
+            checkpoint = advance_checkpoint(run["checkpoint"], len(clean), len(rejected), byte_offset)
+
+        store_records(changed, rejected_rows, run["sink"], logger, checkpoint)
+    if checkpoint is not None:
+        run["checkpoint"] = checkpoint
+    if error_codes.KEY_FIELD in clean.frame.columns:
+        record_stored(run["duplicates"], clean.frame[error_codes.KEY_FIELD].to_numpy())
+    export_to_csv(
+        changed, rejected_rows, logger, append=append, paths=run_export_paths(run), compression=run["export_compression"]
+    )
+    if run["columnar"] is not None:
+        write_columnar(run["columnar"], changed, rejected_rows, run["compiled_schema"])
+    return clean, rejected
+
+
+def batch_error_counts(rejected: RecordBatch, run: dict):
+    """
+    Per (field, rule, reason) failure counts for one validated batch.
+    """
+    return count_error_codes(rejected.frame[ERROR_CODES_COLUMN], run["compiled_schema"])
+
+
+def finish_run(run: dict):
+    """
+    Complete the snapshot diff and save the stored loan_id index once
+    every batch has been stored, then mark the run's checkpoint complete
+    and move its exports into place.
+    """
+    with run["write_lock"] or nullcontext():
+        finish_duplicates(run["duplicates"])
+
+    if run["snapshot"] is not None:
+        disappeared = finish_snapshot(run["snapshot"])
+        export_disappeared(disappeared, run["logger"], paths=run_export_paths(run), compression=run["export_compression"])
+
+        counts = run["snapshot"]["counts"]
+        run["logger"].info(
+            f"Snapshot diff: {counts['new']} new, {counts['changed']} changed, "
+            f"{counts['unchanged']} unchanged, {counts['disappeared']} disappeared"
+        )
+
+    if run["checkpoint"] is not None and run["checkpoint"]["status"] == "in_progress":
+        checkpoint = {**run["checkpoint"], "status": "complete", "updated_at": None}
+        with run["write_lock"] or nullcontext():
+            run["sink"].write_checkpoint(checkpoint)
+            run["sink"].commit()
+        run["checkpoint"] = checkpoint
+
+    finish_exports(run_export_paths(run), run["logger"], run["export_compression"])
+    run["sink"].close()
+
+
+def adopt_interrupted_ingestion(run: dict, manifest: dict) -> bool:
+    """
+    Let an incremental run that resumes a file carry on as the ingestion
+    that was interrupted, so everything it stored stays under one
+    ingestion_id and one checkpoint. Returns False, leaving the run as a
+    new ingestion, if that checkpoint is no longer open.
+    """
+    ingestion_id = manifest["previous"]["ingestion_id"]
+    checkpoint = load_checkpoint(ingestion_id)
+    if checkpoint is None or checkpoint["status"] != "in_progress":
+        return False
+
+    run["logger"].info(f"Resuming ingestion {ingestion_id}")
+    run["ingestion_id"] = manifest["ingestion_id"] = ingestion_id
+    return True
+
+
+def catch_up_to_checkpoint(manifest: dict, checkpoint: dict):
+    """
+    Bring a resumed manifest up to its ingestion's database checkpoint,
+    which is saved with the rows and so can be ahead of the manifest.
+    """
+    if checkpoint["byte_offset"] is None or checkpoint["byte_offset"] <= manifest["committed_bytes"]:
+        return
+
+    recorded = sum(
+        entry["rows"][1] - entry["rows"][0]
+        for entry in manifest["checkpoints"]
+        if entry["ingestion_id"] == checkpoint["ingestion_id"]
+    )
+    catch_up_manifest(manifest, checkpoint["ingestion_id"], checkpoint["byte_offset"], checkpoint["rows"] - recorded)
+
+
+def start_checkpoint(run: dict, file_path: str, resume: bool = False) -> dict:
+    """
+    Give the run a checkpoint that every commit advances. With resume the
+    ingestion's last committed checkpoint is picked up instead, so the
+    run carries on after the rows it already stored.
+    """
+    checkpoint = None
+
+    if resume:
+        ingestion_id = run["ingestion_id"]
+        checkpoint = load_checkpoint(ingestion_id)
+        if checkpoint is None:
+            raise ValueError(f"No checkpoint found for ingestion {ingestion_id}")
+        if checkpoint["status"] == "rolled_back":
+            raise ValueError(f"Ingestion {ingestion_id} was rolled back and cannot be resumed")
+        if (checkpoint["client_id"], checkpoint["file"]) != (run["client_config"]["client_id"], os.path.abspath(file_path)):
+            raise ValueError(f"Ingestion {ingestion_id} was for {checkpoint['client_id']} {checkpoint['file']}")
+
+        if checkpoint.get("ingestion_timestamp") is not None:
+            # the rows still to come are stamped like the ones already stored
+            run["ingestion_timestamp"] = checkpoint["ingestion_timestamp"].replace(tzinfo=UTC)
+
+    run["checkpoint"] = checkpoint or new_checkpoint(
+        run["ingestion_id"], run["client_config"]["client_id"], file_path, run["ingestion_timestamp"]
+    )
+    return run["checkpoint"]
+
+
+def rollback(
+    ingestion_id: str,
+    logger: logging.Logger,
+    columnar_dir: str = COLUMNAR_DIR,
+    export_paths: dict = None
+) -> dict:
+    """
+    Remove what an abandoned ingestion stored, including its columnar part
+    files and unfinished CSV exports (at export_paths, by default named
+    after the ingestion), restore the loans it upserted over, and rewind
+    the file's manifest entry, so an incremental run reads those rows again.
+
+    The client's snapshot fingerprint index is discarded too: it may
+    describe rows that are no longer stored, and a --cdc run trusting it
+    would skip them as unchanged.
+    """
+    checkpoint = rollback_ingestion(ingestion_id)
+    rewind_manifest(checkpoint["client_id"], checkpoint["file"], ingestion_id)
+
+    deleted = checkpoint["deleted"]
+    deleted["columnar_files"] = remove_columnar_ingestion(checkpoint["client_id"], ingestion_id, columnar_dir)
+    logger.info(
+        f"Rolled back ingestion {ingestion_id}: deleted {deleted['loans']} loans, "
+        f"{deleted['rejected_loans']} rejected rows and {deleted['columnar_files']} columnar files, "
+        f"restored {deleted['restored_loans']} loans it had replaced"
+    )
+    if discard_exports(export_paths or default_export_paths(ingestion_id)):
+        logger.info(f"Removed the unfinished exports of ingestion {ingestion_id}")
+    if discard_fingerprint_index(checkpoint["client_id"]):
+        logger.info(f"Discarded the snapshot index of {checkpoint['client_id']}; the next --cdc run rewrites every loan")
+    return checkpoint
+
+
+def quarantine_run(run: dict, budget: dict, file_path: str) -> dict:
+    """
+    Handle a file whose error budget ran out: roll back the batches the
+    ingestion had already committed, so a quarantined file is never left
+    partly loaded, remove its unfinished exports and write its quarantine
+    report. If the rollback fails the report's rolled_back is None and
+    the rows are left for --rollback.
+    """
+    checkpoint = run["checkpoint"]
+    committed_rows = checkpoint["rows"] if checkpoint is not None and checkpoint["commits"] else 0
+    rolled_back = None
+
+    if committed_rows:
+        run["logger"].warning(
+            f"Ingestion {run['ingestion_id']} is quarantined after committing {committed_rows} rows; rolling them back"
+        )
+        run["sink"].close()
+        columnar_dir = run["columnar"]["directory"] if run["columnar"] is not None else COLUMNAR_DIR
+        try:
+            with run["write_lock"] or nullcontext():
+                rolled_back = rollback(
+                    run["ingestion_id"], run["logger"], columnar_dir, run_export_paths(run)
+                )["deleted"]
+        except Exception as e:
+            # the report still goes out, telling the operator to roll back
+            run["logger"].error(f"Rollback of quarantined ingestion {run['ingestion_id']} failed: {e}", exc_info=True)
+    discard_exports(run_export_paths(run), run["export_compression"])
+
+    return write_quarantine_report(
+        budget,
+        file_path,
+        run["client_config"]["client_id"],
+        run["ingestion_id"],
+        committed_rows=committed_rows,
+        rolled_back=rolled_back
+    )
+
+
+def run_file(
+    file_path: str,
+    run: dict,
+    chunk_size: int = None,
+    shards: int = None,
+    pipeline_depth: int = None,
+    incremental: bool = False,
+    resume: bool = False
+):
+    """
+    Run transform, validate, store and export for one file.
+
+    With chunk_size the file is streamed and only one chunk of records is
+    held in memory at a time. With shards the file is split into that many
+    byte ranges that are read, transformed and validated in parallel, then
+    stored as one batch in the original row order. Otherwise it is
+    processed as a single batch.
+
+    With pipeline_depth the read, transform, validate and store stages run
+    on their own threads, connected by queues of that many batches, and
+    their busy/idle times are left in run["stage_stats"].
+
+    With incremental the file's manifest entry decides what is read: an
+    unchanged file is skipped, an appended one only has its new rows read
+    and an interrupted one carries on after its last committed chunk.
+    Each stored batch is checkpointed in the manifest, whose state is left
+    in run["manifest"].
+
+    Every commit also advances the ingestion's checkpoint in the database
+    (see write_batch). With resume the run takes over run["ingestion_id"]'s
+    checkpoint and reads only the rows after it.
+
+    Each validated batch is charged to the client's error budget. Once
+    the rejection rate is over max_error_percentage, ErrorBudgetExceeded
+    is raised before that batch is stored and the rest of the file is
+    not read. Until the budget has first been judged (after min_rows
+    rows, or at the end of the file) validated batches are held rather
+    than stored, so a file quarantined by that first judgement has
+    nothing committed.
+
+    Quality and business figures are accumulated in running tallies.
+    Returns (quality_tally, business_tally).
+    """
+    quality_tally = new_quality_tally()
+    business_tally = new_business_tally()
+    chunk_numbers = count(1)
+    manifest = None
+    held = []
+
+    def store(prepared, position=None):
+        if run["error_budget"] is not None and not run["error_budget"]["judged"]:
+            held.append((prepared, position))
+            return
+        release_held()
+        commit(prepared, position)
+
+    def release_held():
+        while held:
+            commit(*held.pop(0))
+
+    def commit(prepared, position=None):
+        # position is (end_offset, hasher) for batches read by byte range
+        clean, rejected = write_batch(
+            prepared[0], prepared[1], run, append=True, byte_offset=position[0] if position else None
+        )
+
+        update_quality_tally(quality_tally, clean, rejected, batch_error_counts(rejected, run))
+        update_business_tally_frame(business_tally, clean)
+
+        run["logger"].info(
+            f"Chunk {next(chunk_numbers)}: {len(clean) + len(rejected)} read, "
+            f"{len(clean)} clean, {len(rejected)} rejected"
+        )
+
+        if manifest is not None:
+            checkpoint_manifest(manifest, position[0], len(clean) + len(rejected), position[1])
+
+    if incremental:
+        manifest = run["manifest"] = new_manifest_state(
+            run["client_config"]["client_id"], file_path, run["ingestion_id"]
+        )
+        if manifest["action"] == SKIP:
+            run["logger"].info(
+                f"Skipping {file_path}: unchanged since ingestion {manifest['previous']['ingestion_id']}"
+            )
+            return quality_tally, business_tally
+        if manifest["previous"] is not None and manifest["action"] == FULL:
+            run["logger"].info(
+                f"{file_path} changed since ingestion {manifest['previous']['ingestion_id']}, reading it in full"
+            )
+
+    with run["write_lock"] or nullcontext():
+        run["sink"].open()
+    if manifest is not None and manifest["action"] == RESUME:
+        resume = adopt_interrupted_ingestion(run, manifest)
+    checkpoint = start_checkpoint(run, file_path, resume)
+
+    # (header, start, end, hasher) when the rows to read are known by byte offset
+    byte_range = None
+    skip_rows = 0
+
+    if manifest is not None:
+        if resume:
+            catch_up_to_checkpoint(manifest, checkpoint)
+        if manifest["previous"] is not None and manifest["action"] != FULL:
+            run["logger"].info(
+                f"Manifest: {manifest['action']} {file_path} from byte {manifest['start']} "
+                f"({manifest['rows']} rows already stored)"
+            )
+        byte_range = (manifest["header"], manifest["start"], manifest["size"], manifest["hasher"])
+    elif resume:
+        if checkpoint["status"] == "complete":
+            run["logger"].info(f"Ingestion {run['ingestion_id']} is already complete")
+            return quality_tally, business_tally
+
+        run["logger"].info(f"Resuming ingestion {run['ingestion_id']} after {checkpoint['rows']} committed rows")
+        if checkpoint["byte_offset"] is not None:
+            with open(file_path, "rb") as f:
+                header = f.readline()
+            byte_range = (header, checkpoint["byte_offset"], os.path.getsize(file_path), None)
+        else:
+            skip_rows = checkpoint["rows"]
+
+    # a resumed ingestion adds to the exports it started
+    if not resume:
+        reset_exports(run_export_paths(run), run["export_compression"])
+
+    sample_chunks = iter_input_chunks(file_path, run["client_config"], DATE_SAMPLE_SIZE, run["plan"])
+    df_sample = next(sample_chunks, None)
+    sample_chunks.close()
+    if df_sample is not None:
+        detect_date_formats(df_sample, run)
+
+    if shards and shards > 1 and not chunk_size:
+        if byte_range is not None:
+            _, start, end, hasher = byte_range
+            clean, rejected = prepare_sharded(file_path, run, shards, start, end)
+            if hasher is not None:
+                hasher = hash_file_range(file_path, start, end, hasher.copy())
+            store(screen_batch(clean, rejected, run, complete=True), (end, hasher))
+        else:
+            start = line_offset(file_path, skip_rows) if skip_rows else None
+            clean, rejected = prepare_sharded(file_path, run, shards, start)
+            store(screen_batch(clean, rejected, run, complete=True))
+    else:
+        if byte_range is not None:
+            header, start, end, hasher = byte_range
+            chunks = (
+                (df_chunk, (end_offset, chunk_hasher))
+                for df_chunk, end_offset, chunk_hasher in iter_input_ranges(
+                    file_path,
+                    run["client_config"],
+                    header,
+                    start,
+                    end,
+                    hasher.copy() if hasher is not None else None,
+                    chunk_size,
+                    run["plan"]
+                )
+            )
+        elif chunk_size:
+            chunks = (
+                (df_chunk, None)
+                for df_chunk in iter_input_chunks(file_path, run["client_config"], chunk_size, run["plan"], skip_rows)
+            )
+        else:
+            chunks = ((read_input_file(file_path, run["client_config"], run["plan"], skip_rows), None) for _ in range(1))
+
+        if pipeline_depth:
+            run["stage_stats"] = run_pipeline(
+                chunks,
+                [
+                    ("transform", lambda chunk: (transform_batch(chunk[0], run), chunk[1])),
+                    ("validate", lambda chunk: (validate_batch(chunk[0], run, complete=not chunk_size), chunk[1])),
+                    ("store", lambda chunk: store(*chunk))
+                ],
+                queue_size=pipeline_depth
+            )
+            for line in format_stage_stats(run["stage_stats"]):
+                run["logger"].info(f"Stage {line}")
+        else:
+            for df_chunk, position in chunks:
+                store(prepare_batch(df_chunk, run, complete=not chunk_size), position)
+
+    # a streamed file shorter than the budget's min_rows is judged here
+    if run["error_budget"] is not None:
+        close_error_budget(run["error_budget"])
+    release_held()
+
+    finish_run(run)
+    if manifest is not None:
+        finish_manifest(manifest)
+
+    return quality_tally, business_tally
+
+
+def parse_pragma_args(values: list) -> dict:
+    """
+    Turn repeated NAME=VALUE command line options into a dict.
+    """
+    pragmas = {}
+
+    for item in values:
+        name, separator, value = item.partition("=")
+        if not separator or not name or not value:
+            raise ValueError(f"Expected NAME=VALUE for --sqlite-pragma, got: {item}")
+        pragmas[name.strip()] = value.strip()
+
+    return pragmas
+
+
+def add_pipeline_arguments(parser: argparse.ArgumentParser):
+    """
+    Add the processing and storage options shared by every entry point.
+    """
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Stream the file in chunks of this many rows (default: load whole file)"
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        type=int,
+        default=None,
+        help="Overlap read, transform, validate and store on separate threads, "
+             "queueing at most this many batches between stages"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Rows per multi-row database insert (default: {DEFAULT_BATCH_SIZE})"
+    )
+    parser.add_argument(
+        "--commit-size",
+        type=int,
+        default=None,
+        help="Commit at most this many input rows per transaction, checkpointing each commit "
+             "(default: one transaction per chunk, or per file)"
+    )
+    parser.add_argument(
+        "--write-mode",
+        choices=WRITE_MODES,
+        default="insert",
+        help="insert rejects a row whose loan_id is already stored; upsert merges on loan_id (default: insert)"
+    )
+    parser.add_argument(
+        "--conflict-policy",
+        choices=CONFLICT_POLICIES,
+        default="changed",
+        help="Upsert policy: replace, keep existing, or update only changed rows (default: changed)"
+    )
+    parser.add_argument(
+        "--cdc",
+        action="store_true",
+        help="Diff against the client's previous snapshot and store only new and changed loans"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip files unchanged since their last ingestion, read only rows appended since, "
+             "and resume interrupted runs after their last stored chunk"
+    )
+    parser.add_argument(
+        "--db-url",
+        default=None,
+        help="Database URL (default: $ETL_DB_URL or the local SQLite file)"
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=None,
+        help="Connection pool size for the shared database engine"
+    )
+    parser.add_argument(
+        "--sqlite-pragma",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="SQLite pragma override, e.g. synchronous=FULL (repeatable)"
+    )
+    parser.add_argument(
+        "--sink",
+        choices=list(SINKS),
+        default=DEFAULT_SINK,
+        help="How stored rows are written: orm (one ORM object per row), bulk (multi-row inserts) "
+             f"or duckdb (an embedded DuckDB file, default {DUCKDB_URL}; requires duckdb_engine) "
+             f"(default: {DEFAULT_SINK})"
+    )
+    parser.add_argument(
+        "--export-compression",
+        choices=list(EXPORT_COMPRESSIONS),
+        default="none",
+        help="Compress the CSV exports with gzip or zstd (zstd requires zstandard; default: none)"
+    )
+    parser.add_argument(
+        "--columnar",
+        choices=COLUMNAR_FORMATS,
+        default=None,
+        help="Also write stored rows as Parquet or Arrow IPC files partitioned by client_id "
+             "and ingestion date (requires pyarrow)"
+    )
+    parser.add_argument(
+        "--columnar-compression",
+        choices=sorted(set(sum(COMPRESSION_CODECS.values(), ()))),
+        default=DEFAULT_COMPRESSION,
+        help=f"Compression codec for --columnar files (default: {DEFAULT_COMPRESSION})"
+    )
+    parser.add_argument(
+        "--columnar-dir",
+        default=COLUMNAR_DIR,
+        help=f"Root directory of the --columnar datasets (default: {COLUMNAR_DIR})"
+    )
+
+
+def configure_storage(args: argparse.Namespace):
+    """
+    Apply --db-url, --pool-size and --sqlite-pragma to the shared engine.
+    --sink duckdb defaults the database to the local DuckDB file.
+    """
+    url = args.db_url or (DUCKDB_URL if args.sink == "duckdb" else None)
+
+    if url or args.pool_size is not None or args.sqlite_pragma:
+        configure_engine(
+            url=url,
+            pool_size=args.pool_size,
+            sqlite_pragmas=parse_pragma_args(args.sqlite_pragma)
+        )
+
+
+def storage_options_from_args(args: argparse.Namespace) -> dict:
+    return {
+        "batch_size": args.batch_size,
+        # a snapshot diff hands over changed rows that already exist
+        "write_mode": "upsert" if args.cdc else args.write_mode,
+        "conflict_policy": args.conflict_policy,
+        "commit_size": args.commit_size,
+        "export_compression": args.export_compression,
+        "sink": args.sink,
+        "columnar": {
+            "file_format": args.columnar,
+            "compression": args.columnar_compression,
+            "directory": args.columnar_dir
+        } if args.columnar else None
+    }
 
 
 def main():
@@ -127,71 +1327,134 @@ def main():
     )
     parser.add_argument(
         "--client",
-        required=True,
         help="Client name (e.g. lender_a)"
     )
     parser.add_argument(
         "--file",
-        required=True,
         help="Path to raw input file"
     )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=None,
+        help="Split the file into this many line-aligned shards processed in parallel"
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="INGESTION_ID",
+        default=None,
+        help="Carry on an interrupted ingestion of the same file after its last committed chunk"
+    )
+    parser.add_argument(
+        "--rollback",
+        metavar="INGESTION_ID",
+        default=None,
+        help="Delete everything an abandoned ingestion stored, then exit"
+    )
+    add_pipeline_arguments(parser)
 
     args = parser.parse_args()
 
-    ingestion_id = f"INGEST_{datetime.now(UTC).strftime('%Y%m%d%H%M%S')}"
+    if args.rollback:
+        logger = setup_logging(args.rollback)
+        try:
+            configure_storage(args)
+            checkpoint = rollback(args.rollback, logger, args.columnar_dir)
+        except Exception as e:
+            logger.error(f"Rollback failed: {e}", exc_info=True)
+            sys.exit(1)
+        print(f"Rolled back {args.rollback}: {checkpoint['deleted']}")
+        return
+
+    if not (args.client and args.file):
+        parser.error("--client and --file are required")
+    if args.chunk_size and args.shards:
+        parser.error("--chunk-size and --shards cannot be combined")
+    if args.pipeline_depth is not None and args.pipeline_depth < 1:
+        parser.error("--pipeline-depth must be at least 1")
+    if args.incremental and args.cdc:
+        parser.error("--incremental and --cdc cannot be combined")
+    if args.resume and (args.incremental or args.cdc):
+        parser.error("--resume cannot be combined with --incremental or --cdc")
+    if args.commit_size is not None and args.commit_size < 1:
+        parser.error("--commit-size must be at least 1")
+    if args.columnar and args.columnar_compression not in COMPRESSION_CODECS[args.columnar]:
+        parser.error(f"--columnar {args.columnar} does not support {args.columnar_compression} compression")
+
+    ingestion_id = args.resume or f"INGEST_{datetime.now(UTC).strftime('%Y%m%d%H%M%S')}"
     logger = setup_logging(ingestion_id)
+    run = None
 
     try:
         logger.info(f"Starting ingestion: {ingestion_id}")
 
+        configure_storage(args)
+
         client_config = load_client_config(args.client)
         mapping_config = load_mapping_config(args.client)
 
-        df_raw = read_input_file(args.file, client_config)
-
-        logger.info(f"Client: {client_config['client_id']}")
-        logger.info(f"Records read: {len(df_raw)}")
-
-            
-            # Next steps # Convert raw dataframe to list of dicts
-        records = df_raw.to_dict(orient="records")
-
         # Load canonical schema
         with open("config/schemas/loan_schema.json", "r") as f:
             loan_schema = json.load(f)
 
-        # Transform records first
-        transformed_records = transform_records(
-            records,
-            mapping_config.get("mapping", mapping_config),
+        run = new_run_context(
             client_config,
-            ingestion_id
+            mapping_config.get("mapping", mapping_config),
+            loan_schema,
+            ingestion_id,
+            logger,
+            storage_options_from_args(args),
+            cdc=args.cdc
         )
 
-        # Validate records after transformation
-        from validation.validator import validate_records
+        if args.chunk_size or args.shards or args.pipeline_depth or args.incremental or args.resume or args.commit_size:
+            logger.info(f"Client: {client_config['client_id']}")
+            if args.chunk_size:
+                logger.info(f"Streaming in chunks of {args.chunk_size} rows")
 
-        clean_records, rejected_records = validate_records(
-            transformed_records,
-            loan_schema,
-            client_config
-        )
-        
-        create_tables()
-        insert_clean_records(clean_records)
-        insert_rejected_records(rejected_records)
-        export_to_csv(clean_records, rejected_records, logger)
+            quality_tally, business_tally = run_file(
+                args.file, run, args.chunk_size, args.shards, args.pipeline_depth, args.incremental, bool(args.resume)
+            )
+
+            logger.info(f"Clean records: {quality_tally['clean_records']}")
+            logger.info(f"Rejected records: {quality_tally['rejected_records']}")
+
+            print_quality_report(summarize_quality_tally(quality_tally))
+            print_business_tally(business_tally)
+            if run["stage_stats"]:
+                print_stage_report(run["stage_stats"])
+            return
+
+        df_raw = read_input_file(args.file, client_config, run["plan"])
+
+        logger.info(f"Client: {client_config['client_id']}")
+        logger.info(f"Records read: {len(df_raw)}")
+
+        detect_date_formats(df_raw, run)
+        run["sink"].open()
+        start_checkpoint(run, args.file)
+        clean, rejected = prepare_batch(df_raw, run, complete=True)
+        clean, rejected = write_batch(clean, rejected, run)
+        finish_run(run)
 
-        logger.info(f"Clean records: {len(clean_records)}")
-        logger.info(f"Rejected records: {len(rejected_records)}")
+        logger.info(f"Clean records: {len(clean)}")
+        logger.info(f"Rejected records: {len(rejected)}")
 
-        metrics = compute_quality_metrics(clean_records, rejected_records)
+        metrics = compute_quality_metrics(clean, rejected, batch_error_counts(rejected, run))
         print_quality_report(metrics)
 
-        print_business_report(clean_records)
+        print_business_report(clean)
+
+    except ErrorBudgetExceeded as e:
+        report = quarantine_run(run, e.budget, args.file)
+        logger.error(f"File quarantined: {e}. Report: {report['report_path']}")
+        print_quarantine_report(report)
+        sys.exit(1)
 
     except Exception as e:
         logger.error(f"Ingestion failed: {e}", exc_info=True)
+        if run is not None:
+            discard_failed_exports(run)
         sys.exit(1)
 
 
@@ -0,0 +1,166 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+
+DEFAULT_QUEUE_SIZE = 2
+
+# Marks the end of the stream on a stage's input queue
+_END = object()
+
+# How often a blocked stage checks whether another stage has failed
+_POLL_SECONDS = 0.1
+
+
+def new_stage_stats() -> Dict:
+    return {"batches": 0, "busy_seconds": 0.0, "idle_seconds": 0.0}
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: List[Tuple[str, Callable]],
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    source_name: str = "read"
+) -> Dict[str, Dict]:
+    """
+    Run source -> stage -> stage ... with every stage on its own thread.
+
+    Stages are connected by queues holding at most queue_size batches, so
+    a fast stage blocks (backpressure) instead of piling up batches in
+    memory. Each stage handles batches one at a time in arrival order;
+    whatever a stage returns is handed to the next one, and the last
+    stage's return value is discarded. pandas and the database driver
+    release the GIL for most of their work, so reading, transforming and
+    writing overlap.
+
+    If any stage raises, the other stages stop and the first error is
+    re-raised here. Returns per-stage stats keyed by stage name: batches
+    handled, busy seconds (doing work) and idle seconds (waiting on the
+    previous stage or on a full queue).
+    """
+    if queue_size < 1:
+        raise ValueError(f"Queue size must be at least 1, got {queue_size}")
+
+    names = [source_name] + [name for name, _ in stages]
+    stats = {name: new_stage_stats() for name in names}
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    failed = threading.Event()
+    errors = []
+
+    def put(target: queue.Queue, item, stage_stats: Dict) -> bool:
+        started = time.perf_counter()
+        try:
+            while not failed.is_set():
+                try:
+                    target.put(item, timeout=_POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            stage_stats["idle_seconds"] += time.perf_counter() - started
+
+    def get(source_queue: queue.Queue, stage_stats: Dict):
+        started = time.perf_counter()
+        try:
+            while not failed.is_set():
+                try:
+                    return source_queue.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+            return _END
+        finally:
+            stage_stats["idle_seconds"] += time.perf_counter() - started
+
+    def run_source():
+        stage_stats = stats[source_name]
+        iterator = iter(source)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    stage_stats["busy_seconds"] += time.perf_counter() - started
+
+                stage_stats["batches"] += 1
+                if not put(queues[0], item, stage_stats):
+                    return
+            put(queues[0], _END, stage_stats)
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+
+    def run_stage(position: int, name: str, func: Callable):
+        stage_stats = stats[name]
+        inbox = queues[position]
+        outbox = queues[position + 1] if position + 1 < len(queues) else None
+        try:
+            while True:
+                item = get(inbox, stage_stats)
+                if item is _END:
+                    break
+
+                started = time.perf_counter()
+                result = func(item)
+                stage_stats["busy_seconds"] += time.perf_counter() - started
+                stage_stats["batches"] += 1
+
+                if outbox is not None and not put(outbox, result, stage_stats):
+                    return
+            if outbox is not None:
+                put(outbox, _END, stage_stats)
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+
+    threads = [threading.Thread(target=run_source, name=f"pipeline-{source_name}", daemon=True)]
+    for position, (name, func) in enumerate(stages):
+        threads.append(threading.Thread(
+            target=run_stage,
+            args=(position, name, func),
+            name=f"pipeline-{name}",
+            daemon=True
+        ))
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+    return stats
+
+
+def format_stage_stats(stats: Dict[str, Dict]) -> List[str]:
+    """
+    One line per stage; the stage with the most busy time is the bottleneck.
+    """
+    if not stats:
+        return []
+
+    bottleneck = max(stats, key=lambda name: stats[name]["busy_seconds"])
+    lines = []
+
+    for name, stage_stats in stats.items():
+        line = (
+            f"{name}: {stage_stats['batches']} batches, "
+            f"busy {stage_stats['busy_seconds']:.2f}s, idle {stage_stats['idle_seconds']:.2f}s"
+        )
+        if name == bottleneck:
+            line += " (bottleneck)"
+        lines.append(line)
+
+    return lines
+
+
+def print_stage_report(stats: Dict[str, Dict]):
+    print("\nPIPELINE STAGES")
+    print("---------------")
+    for line in format_stage_stats(stats):
+        print(line)
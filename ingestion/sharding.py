@@ -0,0 +1,203 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype, is_object_dtype, is_string_dtype
+
+from transformation.batch import RecordBatch
+from validation.validator import validate_frame
+
+
+def plan_shards(
+    file_path: str,
+    shard_count: int,
+    start: int = None,
+    end: int = None
+) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """
+    Split a CSV into at most shard_count byte ranges that start and end on
+    line boundaries, leaving out the header line. start and end, both on
+    line boundaries, limit the split to part of the file.
+
+    Assumes no quoted field contains a newline, which holds for the
+    lender feeds. Returns (header, [(start, end), ...]) in file order.
+    """
+    size = os.path.getsize(file_path) if end is None else end
+
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        data_start = f.tell() if start is None else start
+        boundaries = [data_start]
+
+        for shard in range(1, shard_count):
+            target = data_start + (size - data_start) * shard // shard_count
+            if target <= boundaries[-1]:
+                continue
+
+            # Step back one byte so a target that is already a line start stays put
+            f.seek(target - 1)
+            f.readline()
+            boundary = f.tell()
+            if boundaries[-1] < boundary < size:
+                boundaries.append(boundary)
+
+    boundaries.append(size)
+    ranges = [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+    return header, ranges
+
+
+def line_offset(file_path: str, rows: int) -> int:
+    """
+    Byte offset of the start of data line number rows (0 being the line
+    after the header), under the same no-quoted-newline assumption.
+    """
+    with open(file_path, "rb") as f:
+        f.readline()
+        for _ in range(rows):
+            if not f.readline():
+                break
+        return f.tell()
+
+
+def read_shard(
+    file_path: str,
+    header: bytes,
+    start: int,
+    end: int,
+    client_config: Dict,
+    plan=None,
+    dtypes: Dict = None
+) -> pd.DataFrame:
+    """
+    Read one byte range of a CSV as a DataFrame, with the header line
+    replicated in front of it. With the client's plan only mapped columns
+    are read, with dtypes from the schema. dtypes fixes the dtype of
+    columns whose type would otherwise be inferred.
+    """
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        body = f.read(end - start)
+
+    return parse_csv_bytes(header, body, client_config, plan, dtypes)
+
+
+def parse_csv_bytes(header: bytes, body: bytes, client_config: Dict, plan=None, dtypes: Dict = None) -> pd.DataFrame:
+    """
+    Parse CSV lines read straight from a file, behind its header line.
+    """
+    delimiter = client_config.get("delimiter", ",")
+    encoding = client_config.get("encoding", "utf-8")
+    options = {}
+    if plan is not None:
+        columns = pd.read_csv(io.BytesIO(header), delimiter=delimiter, encoding=encoding, nrows=0).columns
+        options = plan.read_options(list(columns))
+        options["engine"] = plan.csv_engine
+    if dtypes:
+        options["dtype"] = {**options.get("dtype", {}), **dtypes}
+
+    return pd.read_csv(io.BytesIO(header + body), delimiter=delimiter, encoding=encoding, **options)
+
+
+def prepare_shard(file_path: str, header: bytes, start: int, end: int, shard_run: Dict, dtypes: Dict = None):
+    """
+    Read, transform and validate one shard. Runs in a worker process.
+    dtypes fixes the read dtype of columns (see read_shard).
+    Returns (clean, rejected, read_dtypes): RecordBatches and the dtype
+    each column was read with.
+    """
+    df_raw = read_shard(file_path, header, start, end, shard_run["client_config"], shard_run["plan"], dtypes)
+    batch = shard_run["plan"].transform_batch(df_raw, shard_run["metadata"], shard_run["date_formats"])
+    clean, rejected = validate_frame(batch, shard_run["compiled_schema"])
+    return clean, rejected, df_raw.dtypes.to_dict()
+
+
+def prepare_sharded(file_path: str, run: Dict, shard_count: int, start: int = None, end: int = None):
+    """
+    Transform and validate a CSV across a pool of shard_count processes.
+    start and end limit it to the rows in that byte range.
+
+    Shard results are concatenated in file order, so the merged clean and
+    rejected batches hold the same rows, in the same order, as a serial
+    run, indexed by their position in the range read as a serial read
+    would be. Columns whose dtype pandas infers can come out differently
+    in each shard (int in one, float in another with a blank); shards
+    that disagree with what a serial read would infer are read again
+    with that dtype, so rejected rows keep the values a serial run gives
+    them. Returns (clean, rejected) RecordBatches.
+    """
+    file_format = run["client_config"]["file_format"]
+    if file_format != "csv":
+        raise ValueError(f"Unsupported file format: {file_format}")
+
+    header, ranges = plan_shards(file_path, shard_count, start, end)
+    # only what a worker needs; loggers, locks and snapshot state stay here
+    shard_run = {key: run[key] for key in ("client_config", "plan", "compiled_schema", "date_formats")}
+    shard_run["metadata"] = run["plan"].metadata(run["ingestion_id"], run["ingestion_timestamp"])
+
+    if len(ranges) <= 1:
+        only = ranges[0] if ranges else (len(header), len(header))
+        return prepare_shard(file_path, header, only[0], only[1], shard_run)[:2]
+
+    run["logger"].info(f"Processing {file_path} in {len(ranges)} shards")
+
+    with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+        futures = [pool.submit(prepare_shard, file_path, header, start, end, shard_run) for start, end in ranges]
+        results = [future.result() for future in futures]
+
+        agreed = agree_dtypes([read_dtypes for _, _, read_dtypes in results])
+        rereads = {
+            number: pool.submit(prepare_shard, file_path, header, start, end, shard_run, agreed)
+            for number, (start, end) in enumerate(ranges)
+            if not all(_read_as(results[number][2][column], dtype) for column, dtype in agreed.items())
+        }
+        if rereads:
+            run["logger"].info(f"Re-reading {len(rereads)} shard(s) with dtypes {sorted(agreed)} agreed across shards")
+        for number, future in rereads.items():
+            results[number] = future.result()
+
+    # each shard's rows are numbered from 0; shift them past the shards before it
+    offset = 0
+    for number, (clean, rejected, _) in enumerate(results):
+        results[number] = (
+            clean.with_frame(clean.frame.set_axis(clean.frame.index + offset)),
+            rejected.with_frame(rejected.frame.set_axis(rejected.frame.index + offset))
+        )
+        offset += len(clean) + len(rejected)
+
+    return _merge([clean for clean, _ in results]), _merge([rejected for _, rejected in results])
+
+
+def agree_dtypes(shard_dtypes: List[Dict]) -> Dict:
+    """
+    For each column the shards read with different dtypes, the dtype a
+    read of the whole file infers: float when every shard read numbers,
+    text otherwise.
+    """
+    agreed = {}
+    for column in shard_dtypes[0]:
+        dtypes = [dtypes[column] for dtypes in shard_dtypes]
+        if all(dtype == dtypes[0] for dtype in dtypes):
+            continue
+        numeric = all(is_numeric_dtype(dtype) and not is_bool_dtype(dtype) for dtype in dtypes)
+        agreed[column] = "float64" if numeric else str
+    return agreed
+
+
+def _read_as(dtype, agreed) -> bool:
+    """
+    Whether a column read with dtype already has the agreed dtype.
+    """
+    if agreed is str:
+        return is_object_dtype(dtype) or is_string_dtype(dtype)
+    return dtype == agreed
+
+
+def _merge(batches: List[RecordBatch]) -> RecordBatch:
+    non_empty = [batch.frame for batch in batches if len(batch)]
+    if not non_empty:
+        return batches[0]
+
+    return batches[0].with_frame(pd.concat(non_empty))
@@ -0,0 +1,182 @@
+import glob
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # only needed when a columnar format is chosen
+    pa = None
+    pq = None
+
+from transformation.batch import RecordBatch, python_values
+
+
+COLUMNAR_DIR = "data/processed/columnar"
+
+COLUMNAR_FORMATS = ("parquet", "arrow")
+FILE_EXTENSIONS = {"parquet": "parquet", "arrow": "arrow"}
+
+# Codecs each format can write; "none" writes uncompressed files
+COMPRESSION_CODECS = {
+    "parquet": ("zstd", "snappy", "gzip", "brotli", "lz4", "none"),
+    "arrow": ("zstd", "lz4", "none")
+}
+DEFAULT_COMPRESSION = "zstd"
+
+# Metadata fields that are part of the directory layout, not the files
+PARTITION_FIELD = "client_id"
+
+
+def new_columnar_state(
+    client_id: str,
+    file_format: str = "parquet",
+    compression: Optional[str] = None,
+    directory: str = COLUMNAR_DIR
+) -> Dict:
+    """
+    Start writing one ingestion's stored rows as Parquet or Arrow IPC
+    files, laid out as
+
+        <directory>/<table>/client_id=<id>/ingestion_date=<date>/<ingestion_id>-<part>.<ext>
+
+    Every commit adds new part files; nothing already written is
+    rewritten, so an ingestion only ever appends to its own files.
+    """
+    compression = compression or DEFAULT_COMPRESSION
+    if file_format not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unsupported columnar format: {file_format}")
+    if compression not in COMPRESSION_CODECS[file_format]:
+        raise ValueError(f"Unsupported compression for {file_format}: {compression}")
+    if pa is None:
+        raise ImportError(f"pyarrow is required to write {file_format} files")
+
+    return {
+        "client_id": client_id,
+        "format": file_format,
+        "compression": compression,
+        "directory": directory,
+        # next part number per partition directory
+        "parts": {}
+    }
+
+
+def write_columnar(state: Dict, clean: RecordBatch, rejected: RecordBatch, compiled_schema: List[Dict]) -> List[str]:
+    """
+    Write one committed batch: clean rows to the loans dataset with the
+    schema's types, rejected rows to rejected_loans as received, with
+    their error messages as a list column. Fields with allowed_values and
+    the ingestion_id are dictionary encoded.
+    Returns the paths written.
+    """
+    paths = []
+    dictionary_fields = [check["field"] for check in compiled_schema if check["allowed_values"] is not None]
+    types = {check["field"]: check["type"] for check in compiled_schema}
+
+    if len(clean):
+        columns = {name: _typed_array(clean.frame[name], types.get(name, "string")) for name in clean.frame.columns}
+        paths.append(_write_part(state, "loans", clean.metadata, columns, dictionary_fields))
+
+    if len(rejected):
+        columns = {
+            name: pa.array(_text_values(rejected.frame[name]), type=pa.string())
+            for name in rejected.frame.columns if name != "errors"
+        }
+        if "errors" in rejected.frame.columns:
+            columns["errors"] = pa.array(list(rejected.frame["errors"]), type=pa.list_(pa.string()))
+        paths.append(_write_part(state, "rejected_loans", rejected.metadata, columns, dictionary_fields))
+
+    return paths
+
+
+def partition_directory(state: Dict, table_name: str, metadata: Dict) -> str:
+    stamp = metadata.get("ingestion_timestamp")
+    ingestion_date = stamp.date().isoformat() if isinstance(stamp, datetime) else str(stamp)[:10]
+
+    return os.path.join(
+        state["directory"],
+        table_name,
+        f"{PARTITION_FIELD}={metadata.get(PARTITION_FIELD, state['client_id'])}",
+        f"ingestion_date={ingestion_date}"
+    )
+
+
+def remove_columnar_ingestion(client_id: str, ingestion_id: str, directory: str = COLUMNAR_DIR) -> int:
+    """
+    Delete every part file an ingestion wrote, e.g. when it is rolled
+    back. Returns the number of files removed.
+    """
+    pattern = os.path.join(
+        glob.escape(directory), "*", f"{PARTITION_FIELD}={glob.escape(client_id)}", "*", f"{glob.escape(ingestion_id)}-*"
+    )
+    paths = glob.glob(pattern)
+
+    for path in paths:
+        os.remove(path)
+
+    return len(paths)
+
+
+def _write_part(state: Dict, table_name: str, metadata: Dict, columns: Dict, dictionary_fields: List[str]) -> str:
+    directory = partition_directory(state, table_name, metadata)
+    ingestion_id = metadata["ingestion_id"]
+    extension = FILE_EXTENSIONS[state["format"]]
+
+    if directory not in state["parts"]:
+        # a resumed ingestion carries on after the parts it already wrote
+        existing = glob.glob(os.path.join(glob.escape(directory), f"{glob.escape(ingestion_id)}-*.{extension}"))
+        state["parts"][directory] = len(existing)
+
+    row_count = len(next(iter(columns.values())))
+    for name, value in metadata.items():
+        if name != PARTITION_FIELD:
+            columns[name] = _constant_array(value, row_count)
+
+    table = pa.table(columns)
+    encoded = [name for name in table.column_names if name in dictionary_fields or name == "ingestion_id"]
+    compression = None if state["compression"] == "none" else state["compression"]
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{ingestion_id}-{state['parts'][directory]:05d}.{extension}")
+    temp_path = f"{path}.tmp"
+
+    if state["format"] == "parquet":
+        pq.write_table(table, temp_path, compression=compression, use_dictionary=encoded)
+    else:
+        for name in encoded:
+            position = table.column_names.index(name)
+            table = table.set_column(position, name, table.column(name).dictionary_encode())
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.OSFile(temp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+
+    # a part file appears whole or not at all
+    os.replace(temp_path, path)
+    state["parts"][directory] += 1
+
+    return path
+
+
+def _typed_array(column: pd.Series, schema_type: str):
+    if schema_type == "number":
+        return pa.array(column.to_numpy(dtype=float, na_value=np.nan), type=pa.float64(), from_pandas=True)
+    if schema_type == "integer":
+        return pa.array(python_values(column), type=pa.int64())
+    if schema_type == "date":
+        return pa.array(python_values(column), type=pa.date32())
+    return pa.array(_text_values(column), type=pa.string())
+
+
+def _text_values(column: pd.Series) -> List[Optional[str]]:
+    return [None if value is None else str(value) for value in python_values(column)]
+
+
+def _constant_array(value, row_count: int):
+    if isinstance(value, datetime):
+        return pa.repeat(pa.scalar(value, type=pa.timestamp("us", tz="UTC")), row_count)
+    return pa.repeat(pa.scalar(None if value is None else str(value), type=pa.string()), row_count)
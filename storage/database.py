@@ -1,62 +1,733 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from .models import Base, Loan, RejectedLoan
-from typing import List, Dict
-from datetime import datetime
+from sqlalchemy import (
+    create_engine, event, exists, func, inspect, literal, make_url, or_, select, Date, DateTime, Float, MetaData, String, Table
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, sessionmaker
+from .models import Base, Loan, RejectedLoan, IngestionCheckpoint, ReplacedLoan
+from typing import Callable, Iterable, Iterator, List, Dict, Optional
+from datetime import date, datetime, UTC
+from contextlib import nullcontext
+from itertools import islice
+import os
+import re
+import time
 
 
-DB_PATH = "sqlite:///data/processed/etl_pipeline.db"
+DB_PATH = os.environ.get("ETL_DB_URL", "sqlite:///data/processed/etl_pipeline.db")
+DEFAULT_BATCH_SIZE = 5000
+
+WRITE_MODES = ("insert", "upsert")
+CONFLICT_POLICIES = ("replace", "keep", "changed")
+
+# Columns that differ on every run and so do not count as a change to a loan
+VOLATILE_COLUMNS = ("ingestion_id", "ingestion_timestamp")
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,
+    "mmap_size": 268435456
+}
+POOL_SETTINGS = {
+    "pool_size": 5,
+    "max_overflow": 10
+}
+
+# Process-wide engine and session factory, built lazily by get_engine()
+_engine = None
+_engine_url = None
+_session_factory = None
+_session_factory_engine = None
+_tables_engine = None
+
+
+def configure_engine(
+    url: Optional[str] = None,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+    sqlite_pragmas: Optional[Dict] = None
+):
+    """
+    Override the database URL, pool sizing or SQLite pragmas.
+
+    The current shared engine is disposed so the next get_engine() call
+    picks up the new settings.
+    """
+    global DB_PATH
+
+    sqlite_pragmas = sqlite_pragmas or {}
+    for name, value in sqlite_pragmas.items():
+        if name not in SQLITE_PRAGMAS:
+            raise ValueError(f"Unsupported SQLite pragma: {name}")
+        if not re.fullmatch(r"-?[A-Za-z0-9_]+", str(value)):
+            raise ValueError(f"Invalid value for SQLite pragma {name}: {value}")
+
+    if url:
+        DB_PATH = url
+    if pool_size is not None:
+        POOL_SETTINGS["pool_size"] = pool_size
+    if max_overflow is not None:
+        POOL_SETTINGS["max_overflow"] = max_overflow
+    SQLITE_PRAGMAS.update(sqlite_pragmas)
+
+    dispose_engine()
 
 
 def get_engine():
-    return create_engine(DB_PATH)
+    """
+    Return the shared engine, creating it on first use or when DB_PATH changes.
+    """
+    global _engine, _engine_url
+
+    if _engine is None or _engine_url != DB_PATH:
+        dispose_engine()
+        _engine = _build_engine(DB_PATH)
+        _engine_url = DB_PATH
+
+    return _engine
+
+
+def dispose_engine():
+    """
+    Close pooled connections and forget the shared engine and session factory.
+    """
+    global _engine, _engine_url, _session_factory, _session_factory_engine, _tables_engine
+
+    if _engine is not None:
+        _engine.dispose()
+
+    _engine = None
+    _engine_url = None
+    _session_factory = None
+    _session_factory_engine = None
+    _tables_engine = None
+
+
+def get_session_factory():
+    """
+    Return the shared sessionmaker bound to the current engine.
+    """
+    global _session_factory, _session_factory_engine
+
+    engine = get_engine()
+    if _session_factory is None or _session_factory_engine is not engine:
+        _session_factory = sessionmaker(bind=engine)
+        _session_factory_engine = engine
+
+    return _session_factory
+
+
+def _build_engine(url: str):
+    parsed_url = make_url(url)
+    is_sqlite = parsed_url.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and parsed_url.database in (None, "", ":memory:")
+
+    # In-memory SQLite uses a single-connection pool that takes no sizing
+    pool_kwargs = {} if in_memory else dict(POOL_SETTINGS)
+    engine = create_engine(url, **pool_kwargs)
+
+    if is_sqlite:
+        pragmas = dict(SQLITE_PRAGMAS)
+
+        @event.listens_for(engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return engine
 
 
 def create_tables():
+    """
+    Create the tables once per shared engine, migrating a rejected_loans
+    table left by an earlier version.
+    """
+    global _tables_engine
+
     engine = get_engine()
+    if _tables_engine is engine:
+        return
+
     Base.metadata.create_all(engine)
+    _migrate_rejected_loans(engine)
+    _tables_engine = engine
 
 
-def insert_clean_records(records: List[Dict]):
-    engine = get_engine()
-    Session = sessionmaker(bind=engine)
+def _migrate_rejected_loans(engine):
+    """
+    Rebuild a rejected_loans table keyed by loan_id, as created before
+    every rejected row was kept, with the surrogate id key. Its rows are
+    copied over in one transaction.
+    """
+    inspector = inspect(engine)
+    table = RejectedLoan.__table__
+    if not inspector.has_table(table.name):
+        return
+    existing = {column["name"] for column in inspector.get_columns(table.name)}
+    if "id" in existing:
+        return
+
+    rebuilt = table.to_metadata(MetaData(), name=f"{table.name}_migrating")
+    copied = [column.name for column in table.columns if column.name in existing]
+
+    with engine.begin() as connection:
+        old = Table(table.name, MetaData(), autoload_with=connection)
+        rebuilt.create(connection)
+        connection.execute(rebuilt.insert().from_select(copied, select(*(old.c[name] for name in copied))))
+        old.drop(connection)
+        connection.exec_driver_sql(f"ALTER TABLE {rebuilt.name} RENAME TO {table.name}")
+
+
+def count_stored_loans() -> int:
+    """
+    Number of loans stored, across every client: loan_id is unique over
+    the whole loans table.
+    """
+    statement = select(func.count()).select_from(Loan.__table__)
+
+    with get_engine().connect() as connection:
+        return connection.execute(statement).scalar()
+
+
+def stored_loan_ids() -> List[str]:
+    """
+    Every stored loan_id, in one query.
+    """
+    statement = select(Loan.__table__.c.loan_id)
+
+    with get_engine().connect() as connection:
+        return list(connection.execute(statement).scalars())
+
+
+def find_stored_loan_ids(loan_ids: Iterable[str], batch_size: int = DEFAULT_BATCH_SIZE) -> List[str]:
+    """
+    The loan_ids among loan_ids that are already stored, looked up in
+    batches of batch_size by primary key.
+    """
+    _check_batch_size(batch_size)
+    table = Loan.__table__
+    found = []
+
+    with get_engine().connect() as connection:
+        for batch in _batched(loan_ids, batch_size):
+            statement = select(table.c.loan_id).where(table.c.loan_id.in_(batch))
+            found.extend(connection.execute(statement).scalars())
+    return found
+
+
+def insert_clean_records(records: List[Dict], commit_size: Optional[int] = None):
+    """
+    Add clean records through the ORM, committing every commit_size rows
+    (once at the end by default).
+    """
+    Session = get_session_factory()
     session = Session()
 
-    for r in records:
+    for number, r in enumerate(records, start=1):
         loan = Loan(
             loan_id=r["loan_id"],
             borrower_name=r["borrower_name"],
-            loan_amount=float(r["loan_amount"]),
+            loan_amount=_to_float(r["loan_amount"]),
             loan_status=r["loan_status"],
-            open_date=datetime.strptime(r["open_date"], "%Y-%m-%d").date(),
+            open_date=_to_date(r["open_date"]),
             client_id=r["client_id"],
             ingestion_id=r["ingestion_id"],
-            ingestion_timestamp=datetime.fromisoformat(r["ingestion_timestamp"])
+            ingestion_timestamp=_to_datetime(r["ingestion_timestamp"])
         )
         session.add(loan)
+        if commit_size and number % commit_size == 0:
+            session.commit()
 
     session.commit()
     session.close()
 
 
-def insert_rejected_records(records: List[Dict]):
-    engine = get_engine()
-    Session = sessionmaker(bind=engine)
+def insert_rejected_records(records: List[Dict], commit_size: Optional[int] = None):
+    """
+    Add rejected records through the ORM, committing every commit_size
+    rows (once at the end by default).
+    """
+    Session = get_session_factory()
     session = Session()
 
-    for r in records:
+    for number, r in enumerate(records, start=1):
         rejected = RejectedLoan(
-            loan_id=r.get("loan_id", "UNKNOWN"),
+            loan_id=r.get("loan_id"),
             borrower_name=r.get("borrower_name"),
             loan_amount=r.get("loan_amount"),
             loan_status=r.get("loan_status"),
             open_date=r.get("open_date"),
             client_id=r.get("client_id"),
             ingestion_id=r.get("ingestion_id"),
-            ingestion_timestamp=r.get("ingestion_timestamp"),
+            ingestion_timestamp=_to_text(r.get("ingestion_timestamp")),
             rejection_reason=r.get("rejection_reason", "Unknown")
         )
         session.add(rejected)
+        if commit_size and number % commit_size == 0:
+            session.commit()
 
     session.commit()
     session.close()
+
+
+def bulk_insert_clean_records(
+    records: Iterable[Dict],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    write_mode: str = "insert",
+    conflict_policy: str = "changed",
+    connection=None
+) -> Dict:
+    """
+    Insert clean records with batched executemany calls on the loans table.
+
+    Values are coerced using the Loan column types, so no ORM objects are
+    built per row. With write_mode="upsert" rows whose loan_id already
+    exists are merged according to conflict_policy:
+
+    - "replace": overwrite the stored row
+    - "keep": leave the stored row untouched
+    - "changed": overwrite only if a loan column differs from the stored row
+
+    With connection the rows are written inside the caller's transaction;
+    otherwise they are committed together in one of their own.
+
+    Returns load statistics including rows written and rows/sec.
+    """
+    _check_batch_size(batch_size)
+    table = Loan.__table__
+    converters = _column_converters(table)
+    rows = (
+        {name: convert(r[name]) for name, convert in converters.items()}
+        for r in records
+    )
+    statement = _write_statement(table, write_mode, conflict_policy)
+    return _bulk_insert(table, statement, rows, batch_size, connection)
+
+
+def bulk_insert_rejected_records(
+    records: Iterable[Dict],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    write_mode: str = "insert",
+    conflict_policy: str = "changed",
+    connection=None
+) -> Dict:
+    """
+    Insert rejected records with batched executemany calls on the
+    rejected_loans table. Values are stored as received, except that a
+    loan_amount which is not a number is stored as NULL; the validation
+    errors are joined into rejection_reason. write_mode, conflict_policy
+    and connection behave as in bulk_insert_clean_records.
+    """
+    _check_batch_size(batch_size)
+    table = RejectedLoan.__table__
+    rows = (_rejected_row(r) for r in records)
+    statement = _write_statement(table, write_mode, conflict_policy)
+    return _bulk_insert(table, statement, rows, batch_size, connection)
+
+
+def orm_insert_clean_records(
+    records: Iterable[Dict],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    write_mode: str = "insert",
+    conflict_policy: str = "changed",
+    connection=None
+) -> Dict:
+    """
+    Write clean records through the ORM, one Loan object per row, flushed
+    every batch_size rows. Values are coerced as in
+    bulk_insert_clean_records, and write_mode, conflict_policy and
+    connection behave the same; an upsert looks each stored loan up
+    through the session first.
+
+    Returns load statistics including rows written and rows/sec.
+    """
+    converters = _column_converters(Loan.__table__)
+    rows = (
+        {name: convert(r[name]) for name, convert in converters.items()}
+        for r in records
+    )
+    return _orm_insert(Loan, rows, batch_size, write_mode, conflict_policy, connection)
+
+
+def orm_insert_rejected_records(
+    records: Iterable[Dict],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    write_mode: str = "insert",
+    conflict_policy: str = "changed",
+    connection=None
+) -> Dict:
+    """
+    Write rejected records through the ORM, with the values
+    bulk_insert_rejected_records would store.
+    """
+    rows = (_rejected_row(r) for r in records)
+    return _orm_insert(RejectedLoan, rows, batch_size, write_mode, conflict_policy, connection)
+
+
+def write_transaction():
+    """
+    Open one transaction on the shared engine, committed when the block
+    exits cleanly and rolled back if it raises.
+    """
+    return get_engine().begin()
+
+
+def new_checkpoint(
+    ingestion_id: str,
+    client_id: str,
+    file_path: str,
+    ingestion_timestamp: Optional[datetime] = None
+) -> Dict:
+    """
+    The checkpoint of an ingestion that has not committed anything yet.
+    ingestion_timestamp is kept so a resumed run stamps its rows alike.
+    """
+    return {
+        "ingestion_id": ingestion_id,
+        "client_id": client_id,
+        "file": os.path.abspath(file_path),
+        "status": "in_progress",
+        "commits": 0,
+        "rows": 0,
+        "clean_rows": 0,
+        "rejected_rows": 0,
+        "byte_offset": None,
+        "ingestion_timestamp": ingestion_timestamp,
+        "updated_at": None
+    }
+
+
+def advance_checkpoint(
+    checkpoint: Dict,
+    clean_rows: int,
+    rejected_rows: int,
+    byte_offset: Optional[int] = None
+) -> Dict:
+    """
+    The checkpoint after one more commit of clean_rows + rejected_rows
+    input rows. byte_offset, where known, is the end of those rows in
+    the file.
+    """
+    return {
+        **checkpoint,
+        "commits": checkpoint["commits"] + 1,
+        "rows": checkpoint["rows"] + clean_rows + rejected_rows,
+        "clean_rows": checkpoint["clean_rows"] + clean_rows,
+        "rejected_rows": checkpoint["rejected_rows"] + rejected_rows,
+        "byte_offset": checkpoint["byte_offset"] if byte_offset is None else byte_offset,
+        "updated_at": datetime.now(UTC).replace(tzinfo=None)
+    }
+
+
+def write_checkpoint(connection, checkpoint: Dict):
+    """
+    Save an ingestion's checkpoint on an open transaction, so it commits
+    with the rows it describes. Once the ingestion is no longer in
+    progress the loans it replaced are forgotten.
+    """
+    table = IngestionCheckpoint.__table__
+    values = {column.name: checkpoint.get(column.name) for column in table.columns}
+    values["updated_at"] = values["updated_at"] or datetime.now(UTC).replace(tzinfo=None)
+
+    result = connection.execute(
+        table.update().where(table.c.ingestion_id == values["ingestion_id"]).values(**values)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(**values))
+
+    if values["status"] != "in_progress":
+        replaced = ReplacedLoan.__table__
+        connection.execute(replaced.delete().where(replaced.c.replaced_by == values["ingestion_id"]))
+
+
+def save_replaced_loans(
+    connection,
+    loan_ids: Iterable[str],
+    ingestion_id: str,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """
+    Copy the stored loans among loan_ids to replaced_loans on an open
+    transaction, before ingestion_id upserts over them, so
+    rollback_ingestion can put them back. Loans the ingestion wrote
+    itself, or already saved, are skipped.
+    Returns the number of loans saved.
+    """
+    _check_batch_size(batch_size)
+    loans = Loan.__table__
+    replaced = ReplacedLoan.__table__
+    names = [column.name for column in loans.columns]
+    saved = 0
+
+    for batch in _batched(loan_ids, batch_size):
+        stored = select(literal(ingestion_id, String), *[loans.c[name] for name in names]).where(
+            loans.c.loan_id.in_(batch),
+            loans.c.ingestion_id != ingestion_id,
+            ~exists().where(replaced.c.replaced_by == ingestion_id, replaced.c.loan_id == loans.c.loan_id)
+        )
+        result = connection.execute(replaced.insert().from_select(["replaced_by", *names], stored))
+        saved += max(result.rowcount, 0)
+
+    return saved
+
+
+def load_checkpoint(ingestion_id: str) -> Optional[Dict]:
+    """
+    The last committed checkpoint of an ingestion, or None if it never
+    committed anything.
+    """
+    table = IngestionCheckpoint.__table__
+
+    with get_engine().connect() as connection:
+        row = connection.execute(select(table).where(table.c.ingestion_id == ingestion_id)).mappings().first()
+
+    return dict(row) if row is not None else None
+
+
+def rollback_ingestion(ingestion_id: str) -> Dict:
+    """
+    Delete every loan and rejected row an unfinished ingestion committed,
+    in one transaction, and mark its checkpoint rolled back.
+
+    Rows are matched on ingestion_id. A stored loan that the ingestion
+    upserted is put back as it was before (see save_replaced_loans),
+    unless a later ingestion has written that loan since.
+    Returns the checkpoint with the deleted and restored row counts.
+    """
+    checkpoint = load_checkpoint(ingestion_id)
+    if checkpoint is None:
+        raise ValueError(f"No checkpoint found for ingestion {ingestion_id}")
+    if checkpoint["status"] != "in_progress":
+        raise ValueError(f"Ingestion {ingestion_id} is {checkpoint['status']} and cannot be rolled back")
+
+    counts = {}
+    with write_transaction() as connection:
+        for table in (Loan.__table__, RejectedLoan.__table__):
+            result = connection.execute(table.delete().where(table.c.ingestion_id == ingestion_id))
+            counts[table.name] = result.rowcount
+        counts["restored_loans"] = _restore_replaced_loans(connection, ingestion_id)
+        write_checkpoint(connection, {**checkpoint, "status": "rolled_back", "updated_at": None})
+
+    return {**checkpoint, "status": "rolled_back", "deleted": counts}
+
+
+def _restore_replaced_loans(connection, ingestion_id: str) -> int:
+    loans = Loan.__table__
+    replaced = ReplacedLoan.__table__
+    names = [column.name for column in loans.columns]
+
+    earlier = select(*[replaced.c[name] for name in names]).where(
+        replaced.c.replaced_by == ingestion_id,
+        ~exists().where(loans.c.loan_id == replaced.c.loan_id)
+    )
+    return connection.execute(loans.insert().from_select(names, earlier)).rowcount
+
+
+def _write_statement(table: Table, write_mode: str, conflict_policy: str):
+    if write_mode not in WRITE_MODES:
+        raise ValueError(f"Unsupported write mode: {write_mode}")
+    if write_mode == "insert":
+        return table.insert()
+
+    if conflict_policy not in CONFLICT_POLICIES:
+        raise ValueError(f"Unsupported conflict policy: {conflict_policy}")
+
+    dialect_name = get_engine().dialect.name
+    if dialect_name == "sqlite":
+        statement = sqlite.insert(table)
+    elif dialect_name in ("postgresql", "duckdb"):
+        # DuckDB takes PostgreSQL's ON CONFLICT syntax
+        statement = postgresql.insert(table)
+    else:
+        raise ValueError(f"Upsert is not supported for database dialect: {dialect_name}")
+
+    key_columns = [column.name for column in table.primary_key.columns]
+
+    if conflict_policy == "keep":
+        return statement.on_conflict_do_nothing(index_elements=key_columns)
+
+    updates = {
+        column.name: statement.excluded[column.name]
+        for column in table.columns
+        if column.name not in key_columns
+    }
+
+    if conflict_policy == "replace":
+        return statement.on_conflict_do_update(index_elements=key_columns, set_=updates)
+
+    row_changed = or_(*[
+        table.c[name].is_distinct_from(statement.excluded[name])
+        for name in updates
+        if name not in VOLATILE_COLUMNS
+    ])
+    return statement.on_conflict_do_update(
+        index_elements=key_columns,
+        set_=updates,
+        where=row_changed
+    )
+
+
+def _rejected_row(r: Dict) -> Dict:
+    if "rejection_reason" in r:
+        reason = r["rejection_reason"]
+    elif r.get("errors"):
+        reason = "; ".join(r["errors"])
+    else:
+        reason = "Unknown"
+
+    return {
+        "loan_id": r.get("loan_id") or None,
+        "borrower_name": r.get("borrower_name"),
+        "loan_amount": _to_float_or_none(r.get("loan_amount")),
+        "loan_status": r.get("loan_status"),
+        "open_date": r.get("open_date"),
+        "client_id": r.get("client_id"),
+        "ingestion_id": r.get("ingestion_id"),
+        "ingestion_timestamp": _to_text(r.get("ingestion_timestamp")),
+        "rejection_reason": reason
+    }
+
+
+def _bulk_insert(table: Table, statement, rows: Iterable[Dict], batch_size: int, connection=None) -> Dict:
+    row_count = 0
+    written_count = 0
+    started = time.perf_counter()
+
+    # a caller's connection is already inside the transaction to commit in
+    transaction = get_engine().begin() if connection is None else nullcontext(connection)
+    with transaction as connection:
+        for batch in _batched(rows, batch_size):
+            result = connection.execute(statement, batch)
+            row_count += len(batch)
+            # rowcount excludes upsert conflicts that were skipped
+            written_count += result.rowcount if result.rowcount >= 0 else len(batch)
+
+    return load_stats(table, row_count, written_count, started)
+
+
+def _orm_insert(model, rows: Iterable[Dict], batch_size: int, write_mode: str, conflict_policy: str, connection=None) -> Dict:
+    _check_batch_size(batch_size)
+    if write_mode not in WRITE_MODES:
+        raise ValueError(f"Unsupported write mode: {write_mode}")
+    if write_mode == "upsert" and conflict_policy not in CONFLICT_POLICIES:
+        raise ValueError(f"Unsupported conflict policy: {conflict_policy}")
+
+    table = model.__table__
+    key_column = table.primary_key.columns.values()[0].name
+    compared = [column.name for column in table.columns if column.name != key_column and column.name not in VOLATILE_COLUMNS]
+
+    row_count = 0
+    written_count = 0
+    started = time.perf_counter()
+
+    transaction = get_engine().begin() if connection is None else nullcontext(connection)
+    with transaction as connection:
+        # joins the connection's transaction rather than committing its own
+        session = Session(bind=connection)
+        try:
+            for batch in _batched(rows, batch_size):
+                for row in batch:
+                    stored = session.get(model, row[key_column]) if write_mode == "upsert" else None
+                    if stored is None:
+                        session.add(model(**row))
+                    elif conflict_policy == "keep":
+                        continue
+                    elif conflict_policy == "changed" and all(getattr(stored, name) == row[name] for name in compared):
+                        continue
+                    else:
+                        for name, value in row.items():
+                            setattr(stored, name, value)
+                    written_count += 1
+                row_count += len(batch)
+                session.flush()
+                session.expunge_all()
+        finally:
+            session.close()
+
+    return load_stats(table, row_count, written_count, started)
+
+
+def load_stats(table: Table, row_count: int, written_count: int, started: float) -> Dict:
+    """
+    Statistics of one load into table that began at perf_counter() started.
+    """
+    elapsed = time.perf_counter() - started
+
+    return {
+        "table": table.name,
+        "rows": row_count,
+        "written": written_count,
+        "seconds": elapsed,
+        "rows_per_sec": row_count / elapsed if elapsed else 0.0
+    }
+
+
+def _check_batch_size(batch_size: int):
+    # checked before any engine or transaction is opened
+    if batch_size < 1:
+        raise ValueError(f"Batch size must be at least 1, got {batch_size}")
+
+
+def _batched(rows: Iterable[Dict], batch_size: int) -> Iterator[List[Dict]]:
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _column_converters(table: Table) -> Dict[str, Callable]:
+    """
+    Build one value converter per column from the table definition.
+    """
+    converters = {}
+
+    for column in table.columns:
+        if isinstance(column.type, DateTime):
+            converters[column.name] = _to_datetime
+        elif isinstance(column.type, Date):
+            converters[column.name] = _to_date
+        elif isinstance(column.type, Float):
+            converters[column.name] = _to_float
+        else:
+            converters[column.name] = _passthrough
+
+    return converters
+
+
+def _to_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _to_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _to_float(value):
+    if value is None or isinstance(value, float):
+        return value
+    return float(value)
+
+
+def _to_text(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _to_float_or_none(value):
+    try:
+        return _to_float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _passthrough(value):
+    return value
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+from datetime import datetime, UTC
+from typing import Dict, Optional
+
+
+MANIFEST_DIR = "data/state/manifest"
+
+# What an incremental run does with a file, decided from its manifest entry
+SKIP = "skip"
+FULL = "full"
+APPEND = "append"
+RESUME = "resume"
+
+# Bytes hashed per read when checking a file's committed prefix
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def manifest_entry_path(client_id: str, file_path: str) -> str:
+    key = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(MANIFEST_DIR, client_id, f"{key}.json")
+
+
+def load_manifest_entry(client_id: str, file_path: str) -> Optional[Dict]:
+    """
+    The manifest entry left by the last run over this file, or None if
+    the client has never ingested it.
+    """
+    path = manifest_entry_path(client_id, file_path)
+
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest_entry(client_id: str, file_path: str, entry: Dict):
+    """
+    Persist a file's manifest entry, replacing the previous one atomically.
+    """
+    path = manifest_entry_path(client_id, file_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(entry, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def hash_file_range(file_path: str, start: int, end: int, hasher=None):
+    """
+    Feed bytes [start, end) of a file to hasher (a new sha256 by default).
+    """
+    hasher = hasher or hashlib.sha256()
+
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(HASH_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+
+    return hasher
+
+
+def new_manifest_state(client_id: str, file_path: str, ingestion_id: str) -> Dict:
+    """
+    Decide how much of a file still needs ingesting, from its entry.
+
+    A completed file with the same size and mtime is skipped without
+    reading it. Otherwise the bytes committed last time are hashed: if
+    the file still starts with them, only the rest is read, from the last
+    committed chunk of an interrupted run (resume) or from the old end of
+    a completed one (append). Anything else is ingested in full.
+
+    Only the file's size at this point is read, so rows appended while
+    the run is going are left for the next one.
+    """
+    stat = os.stat(file_path)
+    with open(file_path, "rb") as f:
+        header = f.readline()
+
+    state = {
+        "client_id": client_id,
+        "file": file_path,
+        "ingestion_id": ingestion_id,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "header": header,
+        "action": FULL,
+        "start": len(header),
+        "committed_bytes": len(header),
+        "rows": 0,
+        "hasher": hashlib.sha256(header),
+        "checkpoints": [],
+        "previous": load_manifest_entry(client_id, file_path)
+    }
+
+    previous = state["previous"]
+    if previous is None:
+        return state
+
+    if (
+        previous["status"] == "complete"
+        and previous["size"] == stat.st_size
+        and previous["mtime_ns"] == stat.st_mtime_ns
+    ):
+        state["action"] = SKIP
+        return state
+
+    committed = previous["committed_bytes"]
+    if stat.st_size < committed:
+        return state
+
+    hasher = hash_file_range(file_path, 0, committed)
+    if hasher.hexdigest() != previous["sha256"] or not _continues_on_new_line(file_path, committed):
+        return state
+
+    if committed == stat.st_size and previous["status"] == "complete":
+        # touched but not changed: store the new mtime so the next check is cheap again
+        save_manifest_entry(client_id, file_path, {**previous, "mtime_ns": stat.st_mtime_ns})
+        state["action"] = SKIP
+        return state
+
+    action = APPEND if previous["status"] == "complete" else RESUME
+
+    state.update(
+        action=action,
+        start=committed,
+        committed_bytes=committed,
+        rows=previous["rows"],
+        hasher=hasher,
+        checkpoints=list(previous["checkpoints"])
+    )
+    return state
+
+
+def _continues_on_new_line(file_path: str, committed: int) -> bool:
+    """
+    Whether the bytes after the committed prefix start a fresh line, so a
+    row written onto an unterminated last line is not mistaken for a new one.
+    """
+    with open(file_path, "rb") as f:
+        f.seek(max(committed - 1, 0))
+        around = f.read(2)
+
+    return len(around) < 2 or around[:1] == b"\n" or around[1:] in (b"\r", b"\n")
+
+
+def checkpoint_manifest(state: Dict, end: int, rows: int, hasher):
+    """
+    Record that the rows up to byte offset end are stored. Call only after
+    the chunk's writes have been committed; hasher must cover the file up
+    to end.
+    """
+    _add_checkpoint(state, state["ingestion_id"], end, rows, hasher)
+    _save_state(state, "in_progress")
+
+
+def catch_up_manifest(state: Dict, ingestion_id: str, end: int, rows: int):
+    """
+    Move a resumed file's start up to a later point that the database
+    checkpoint of ingestion_id shows was committed, for a run that
+    stopped between storing a chunk and checkpointing it here.
+    """
+    hasher = hash_file_range(state["file"], state["committed_bytes"], end, state["hasher"].copy())
+    _add_checkpoint(state, ingestion_id, end, rows, hasher)
+    state["start"] = end
+
+
+def _add_checkpoint(state: Dict, ingestion_id: str, end: int, rows: int, hasher):
+    state["checkpoints"].append({
+        "ingestion_id": ingestion_id,
+        "rows": [state["rows"], state["rows"] + rows],
+        "bytes": [state["committed_bytes"], end],
+        "sha256": hasher.hexdigest()
+    })
+    state["committed_bytes"] = end
+    state["rows"] += rows
+    state["hasher"] = hasher
+
+
+def rewind_manifest(client_id: str, file_path: str, ingestion_id: str):
+    """
+    Forget the chunks a rolled back ingestion stored, so the next
+    incremental run reads them again. The file goes back to the last
+    checkpoint before them, or is read in full if there is none.
+    """
+    entry = load_manifest_entry(client_id, file_path)
+    if entry is None:
+        return
+
+    ingestions = [checkpoint["ingestion_id"] for checkpoint in entry["checkpoints"]]
+    if ingestion_id not in ingestions:
+        return
+
+    kept = entry["checkpoints"][:ingestions.index(ingestion_id)]
+    if not kept:
+        os.remove(manifest_entry_path(client_id, file_path))
+        return
+
+    save_manifest_entry(client_id, file_path, {
+        **entry,
+        "ingestion_id": kept[-1]["ingestion_id"],
+        "status": "in_progress",
+        "sha256": kept[-1]["sha256"],
+        "committed_bytes": kept[-1]["bytes"][1],
+        "rows": kept[-1]["rows"][1],
+        "checkpoints": kept,
+        "updated_at": datetime.now(UTC).isoformat()
+    })
+
+
+def finish_manifest(state: Dict):
+    """
+    Mark the file ingested up to the size it had when the run started.
+    """
+    _save_state(state, "complete")
+
+
+def _save_state(state: Dict, status: str):
+    save_manifest_entry(state["client_id"], state["file"], {
+        "client_id": state["client_id"],
+        "file": os.path.abspath(state["file"]),
+        "ingestion_id": state["ingestion_id"],
+        "status": status,
+        "size": state["size"],
+        "mtime_ns": state["mtime_ns"],
+        "sha256": state["hasher"].hexdigest(),
+        "committed_bytes": state["committed_bytes"],
+        "rows": state["rows"],
+        "checkpoints": state["checkpoints"],
+        "updated_at": datetime.now(UTC).isoformat()
+    })
@@ -0,0 +1,135 @@
+import os
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from storage.database import count_stored_loans, stored_loan_ids, find_stored_loan_ids
+
+
+LOAN_INDEX_DIR = "data/state/loan_ids"
+
+
+def loan_index_path() -> str:
+    return os.path.join(LOAN_INDEX_DIR, "loan_ids.pkl")
+
+
+def load_loan_index() -> pd.Index:
+    """
+    Load every stored loan_id. loan_id is the loans table's primary key,
+    so one index covers all clients.
+
+    The index on disk is a cache of the loans table: if its size does not
+    match the table's row count (first run, a reset database, a run that
+    failed after storing some batches) it is rebuilt with one query.
+    """
+    path = loan_index_path()
+    stored_count = count_stored_loans()
+
+    if os.path.exists(path):
+        index = pd.read_pickle(path)
+        if len(index) == stored_count:
+            return index
+
+    index = pd.Index(stored_loan_ids(), dtype=object, name="loan_id")
+    save_loan_index(index)
+    return index
+
+
+def save_loan_index(index: pd.Index):
+    """
+    Persist the loan_id index, replacing the previous one atomically.
+    """
+    path = loan_index_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    temp_path = f"{path}.tmp"
+    pd.to_pickle(index, temp_path)
+    os.replace(temp_path, path)
+
+
+def new_duplicate_state(check_stored: bool) -> Dict:
+    """
+    Start duplicate detection for one ingestion. check_stored also looks
+    loan_ids up in the persistent index; leave it off when rows are
+    upserted, since a stored loan_id is then an update.
+    """
+    return {
+        "check_stored": check_stored,
+        # loaded on first use, once the tables exist
+        "stored": None,
+        "seen": set(),
+        "new_ids": [],
+        "counts": {"in_file": 0, "stored": 0}
+    }
+
+
+def find_duplicates(state: Dict, loan_ids: pd.Series):
+    """
+    Flag clean rows whose loan_id was already taken, by an earlier row of
+    this ingestion or by a row stored before it. Each lookup is a hash
+    probe; the database is not queried.
+    Returns (in_file_mask, stored_mask); a row is in at most one.
+    """
+    ids = loan_ids.astype(object).to_numpy()
+
+    in_file = pd.Series(ids).duplicated(keep="first").to_numpy().copy()
+    seen = state["seen"]
+    if seen:
+        in_file |= np.fromiter((loan_id in seen for loan_id in ids), dtype=bool, count=len(ids))
+
+    if state["check_stored"] and state["stored"] is None:
+        state["stored"] = load_loan_index()
+
+    stored = np.zeros(len(ids), dtype=bool)
+    if state["stored"] is not None and len(state["stored"]):
+        stored = ~in_file & (state["stored"].get_indexer(ids) >= 0)
+
+    first = ~in_file & ~stored
+    seen.update(ids[first])
+    state["counts"]["in_file"] += int(in_file.sum())
+    state["counts"]["stored"] += int(stored.sum())
+
+    return in_file, stored
+
+
+def find_stored_since(state: Dict, loan_ids: pd.Series) -> np.ndarray:
+    """
+    Flag rows whose loan_id was stored by another ingestion after this
+    one loaded its index, looking them up in the database. Call it while
+    holding the run's write lock, just before the rows are stored.
+    """
+    stored = np.zeros(len(loan_ids), dtype=bool)
+    if not state["check_stored"] or not len(loan_ids):
+        return stored
+
+    found = find_stored_loan_ids(loan_ids.astype(object).tolist())
+    if found:
+        stored = loan_ids.isin(found).to_numpy()
+        state["counts"]["stored"] += int(stored.sum())
+    return stored
+
+
+def record_stored(state: Dict, loan_ids):
+    """
+    Note loan_ids written to the loans table by this ingestion.
+    """
+    if state["stored"] is not None:
+        state["new_ids"].append(pd.Index(loan_ids, dtype=object))
+
+
+def finish_duplicates(state: Dict):
+    """
+    Add this ingestion's stored loan_ids to the persistent index, merged
+    with whatever other ingestions saved there since it was loaded. Call
+    only after the ingestion's writes have succeeded, holding the write
+    lock when ingestions run concurrently.
+    """
+    if state["stored"] is None or not state["new_ids"]:
+        return
+
+    index = state["stored"].append(state["new_ids"])
+    path = loan_index_path()
+    if os.path.exists(path):
+        index = index.append(pd.read_pickle(path))
+    save_loan_index(pd.Index(index.unique(), dtype=object, name="loan_id"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Date, DateTime
+from sqlalchemy import Column, String, Float, Date, DateTime, Integer, Sequence
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -20,7 +20,9 @@ class Loan(Base):
 class RejectedLoan(Base):
     __tablename__ = "rejected_loans"
 
-    loan_id = Column(String, primary_key=True)
+    # every rejected row is kept, so the same loan_id (or none) can repeat
+    id = Column(Integer, Sequence("rejected_loans_id_seq"), primary_key=True, autoincrement=True)
+    loan_id = Column(String)
     borrower_name = Column(String)
     loan_amount = Column(Float)
     loan_status = Column(String)
@@ -29,3 +31,35 @@ class RejectedLoan(Base):
     ingestion_id = Column(String)
     ingestion_timestamp = Column(String)
     rejection_reason = Column(String)
+
+
+class IngestionCheckpoint(Base):
+    __tablename__ = "ingestion_checkpoints"
+
+    ingestion_id = Column(String, primary_key=True)
+    client_id = Column(String, nullable=False)
+    file = Column(String)
+    status = Column(String, nullable=False)
+    commits = Column(Integer, nullable=False)
+    rows = Column(Integer, nullable=False)
+    clean_rows = Column(Integer, nullable=False)
+    rejected_rows = Column(Integer, nullable=False)
+    byte_offset = Column(Integer)
+    ingestion_timestamp = Column(DateTime)
+    updated_at = Column(DateTime, nullable=False)
+
+
+class ReplacedLoan(Base):
+    __tablename__ = "replaced_loans"
+
+    # a stored loan as it was before ingestion replaced_by upserted it,
+    # kept until that ingestion completes so a rollback can restore it
+    replaced_by = Column(String, primary_key=True)
+    loan_id = Column(String, primary_key=True)
+    borrower_name = Column(String, nullable=False)
+    loan_amount = Column(Float, nullable=False)
+    loan_status = Column(String, nullable=False)
+    open_date = Column(Date, nullable=False)
+    client_id = Column(String, nullable=False)
+    ingestion_id = Column(String, nullable=False)
+    ingestion_timestamp = Column(DateTime, nullable=False)
@@ -0,0 +1,294 @@
+import time
+from datetime import datetime, UTC
+from typing import Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import Date, DateTime, Float, Table
+
+try:
+    import duckdb_engine  # noqa: F401 - registers the duckdb:/// dialect
+except ImportError:  # only needed for the duckdb sink
+    duckdb_engine = None
+
+from storage.database import (
+    get_engine,
+    create_tables,
+    bulk_insert_clean_records,
+    bulk_insert_rejected_records,
+    orm_insert_clean_records,
+    orm_insert_rejected_records,
+    write_checkpoint,
+    save_replaced_loans,
+    load_stats,
+    DEFAULT_BATCH_SIZE,
+    WRITE_MODES,
+    CONFLICT_POLICIES,
+    VOLATILE_COLUMNS
+)
+from storage.models import Loan
+from transformation.batch import RecordBatch
+
+
+DEFAULT_SINK = "bulk"
+DUCKDB_URL = "duckdb:///data/processed/etl_pipeline.duckdb"
+
+# Name of the DataFrame a DuckDB insert selects from
+DUCKDB_BATCH_VIEW = "etl_batch"
+DUCKDB_TYPES = {Date: "DATE", DateTime: "TIMESTAMP", Float: "DOUBLE"}
+
+
+class StorageSink:
+    """
+    Where a run writes the batches it stores.
+
+    open() prepares the database once per run. write_batch() adds one
+    batch's clean and rejected rows to the sink's open transaction,
+    starting one if needed, and write_checkpoint() saves the ingestion's
+    checkpoint in it; commit() makes all of it durable together and
+    rollback() discards it. close() rolls back anything uncommitted and
+    releases the connection.
+
+    Clean rows are written with write_mode and conflict_policy; before an
+    upsert that may overwrite stored loans, their current versions are
+    saved in the same transaction so a rollback can restore them. Rejected
+    rows are always inserted: rejected_loans keeps every rejection, even
+    of a loan_id that was rejected before.
+
+    Every sink writes through the shared engine, so checkpoints, the
+    stored loan_id index and rollback work the same whichever is used.
+    """
+
+    name = None
+
+    def __init__(
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        write_mode: str = "insert",
+        conflict_policy: str = "changed"
+    ):
+        if write_mode not in WRITE_MODES:
+            raise ValueError(f"Unsupported write mode: {write_mode}")
+        if conflict_policy not in CONFLICT_POLICIES:
+            raise ValueError(f"Unsupported conflict policy: {conflict_policy}")
+
+        self.batch_size = batch_size
+        self.write_mode = write_mode
+        self.conflict_policy = conflict_policy
+        self._connection = None
+        self._transaction = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(write_mode={self.write_mode!r}, conflict_policy={self.conflict_policy!r})"
+
+    def open(self):
+        create_tables()
+
+    def write_batch(self, clean_records, rejected_records) -> List[Dict]:
+        """
+        Write clean and rejected records (lists of dicts or RecordBatches)
+        in the open transaction. Returns the load statistics of each table.
+        """
+        connection = self._begin()
+        if self.write_mode == "upsert" and self.conflict_policy != "keep":
+            for ingestion_id, loan_ids in _loan_ids_by_ingestion(clean_records).items():
+                save_replaced_loans(connection, loan_ids, ingestion_id, self.batch_size)
+        return [
+            self.write_clean(clean_records, connection),
+            self.write_rejected(rejected_records, connection)
+        ]
+
+    def write_checkpoint(self, checkpoint: Dict):
+        write_checkpoint(self._begin(), checkpoint)
+
+    def commit(self):
+        if self._transaction is not None:
+            self._transaction.commit()
+            self._release()
+
+    def rollback(self):
+        if self._transaction is not None:
+            self._transaction.rollback()
+            self._release()
+
+    def close(self):
+        self.rollback()
+
+    def write_clean(self, records, connection) -> Dict:
+        raise NotImplementedError
+
+    def write_rejected(self, records, connection) -> Dict:
+        raise NotImplementedError
+
+    def _begin(self):
+        if self._connection is None:
+            self._connection = get_engine().connect()
+            self._transaction = self._connection.begin()
+        return self._connection
+
+    def _release(self):
+        self._connection.close()
+        self._connection = None
+        self._transaction = None
+
+
+class OrmSink(StorageSink):
+    """
+    Writes through the ORM models, one object per row.
+    """
+
+    name = "orm"
+
+    def write_clean(self, records, connection) -> Dict:
+        return orm_insert_clean_records(
+            records,
+            self.batch_size,
+            write_mode=self.write_mode,
+            conflict_policy=self.conflict_policy,
+            connection=connection
+        )
+
+    def write_rejected(self, records, connection) -> Dict:
+        return orm_insert_rejected_records(records, self.batch_size, write_mode="insert", connection=connection)
+
+
+class BulkSink(StorageSink):
+    """
+    Writes with multi-row executemany inserts of batch_size rows.
+    """
+
+    name = "bulk"
+
+    def write_clean(self, records, connection) -> Dict:
+        return bulk_insert_clean_records(
+            records,
+            self.batch_size,
+            write_mode=self.write_mode,
+            conflict_policy=self.conflict_policy,
+            connection=connection
+        )
+
+    def write_rejected(self, records, connection) -> Dict:
+        return bulk_insert_rejected_records(records, self.batch_size, write_mode="insert", connection=connection)
+
+
+class DuckDBSink(BulkSink):
+    """
+    Writes to an embedded DuckDB database file (see DUCKDB_URL), whose
+    columnar storage suits large analytical scans of the loans table.
+
+    A batch's clean rows are handed to DuckDB as one DataFrame and loaded
+    with a single INSERT ... SELECT, not row by row. Needs the duckdb and
+    duckdb_engine packages and a duckdb:/// database URL. DuckDB lets one
+    process write a database file at a time.
+    """
+
+    name = "duckdb"
+
+    def open(self):
+        if duckdb_engine is None:
+            raise ImportError("duckdb and duckdb_engine are required for the duckdb sink")
+        if get_engine().dialect.name != "duckdb":
+            raise ValueError(f"The duckdb sink needs a duckdb:/// database URL, e.g. {DUCKDB_URL}")
+        super().open()
+
+    def write_clean(self, records, connection) -> Dict:
+        table = Loan.__table__
+        started = time.perf_counter()
+
+        frame = _duckdb_frame(records, table)
+        if frame.empty:
+            return load_stats(table, 0, 0, started)
+
+        names = [column.name for column in table.columns]
+        selected = ", ".join(
+            f"CAST({column.name} AS {DUCKDB_TYPES.get(type(column.type), 'VARCHAR')})"
+            for column in table.columns
+        )
+        statement = (
+            f"INSERT INTO {table.name} ({', '.join(names)}) SELECT {selected} FROM {DUCKDB_BATCH_VIEW}"
+            f"{_conflict_clause(table, self.write_mode, self.conflict_policy)}"
+        )
+
+        duckdb_connection = connection.connection.driver_connection
+        duckdb_connection.register(DUCKDB_BATCH_VIEW, frame)
+        try:
+            result = connection.exec_driver_sql(statement)
+        finally:
+            duckdb_connection.unregister(DUCKDB_BATCH_VIEW)
+
+        written = result.rowcount if result.rowcount >= 0 else len(frame)
+        return load_stats(table, len(frame), written, started)
+
+
+SINKS = {sink.name: sink for sink in (OrmSink, BulkSink, DuckDBSink)}
+
+
+def new_sink(
+    name: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    write_mode: str = "insert",
+    conflict_policy: str = "changed"
+) -> StorageSink:
+    """
+    A sink by name: "orm", "bulk" (the default) or "duckdb".
+    """
+    name = name or DEFAULT_SINK
+    if name not in SINKS:
+        raise ValueError(f"Unsupported storage sink: {name}")
+    return SINKS[name](batch_size, write_mode, conflict_policy)
+
+
+def _loan_ids_by_ingestion(records) -> Dict[str, List[str]]:
+    if isinstance(records, RecordBatch):
+        if not len(records):
+            return {}
+        return {records.metadata["ingestion_id"]: records.frame["loan_id"].tolist()}
+
+    loan_ids = {}
+    for record in records:
+        loan_ids.setdefault(record["ingestion_id"], []).append(record["loan_id"])
+    return loan_ids
+
+
+def _duckdb_frame(records, table: Table) -> pd.DataFrame:
+    """
+    Records as a DataFrame of the table's columns. DuckDB reads aware
+    timestamps as local time, so metadata timestamps are made naive UTC.
+    """
+    if isinstance(records, RecordBatch):
+        metadata = {
+            name: value.astimezone(UTC).replace(tzinfo=None) if isinstance(value, datetime) and value.tzinfo else value
+            for name, value in records.metadata.items()
+        }
+        frame = RecordBatch(records.frame, metadata).to_frame()
+    else:
+        frame = pd.DataFrame(list(records))
+
+    if frame.empty:
+        return frame
+    return frame[[column.name for column in table.columns]]
+
+
+def _conflict_clause(table: Table, write_mode: str, conflict_policy: str) -> str:
+    """
+    The ON CONFLICT clause of an INSERT ... SELECT, matching the
+    statements bulk_insert_clean_records builds for each conflict_policy.
+    """
+    if write_mode == "insert":
+        return ""
+
+    key_columns = [column.name for column in table.primary_key.columns]
+    target = ", ".join(key_columns)
+    if conflict_policy == "keep":
+        return f" ON CONFLICT ({target}) DO NOTHING"
+
+    updated = [column.name for column in table.columns if column.name not in key_columns]
+    clause = f" ON CONFLICT ({target}) DO UPDATE SET " + ", ".join(f"{name} = EXCLUDED.{name}" for name in updated)
+
+    if conflict_policy == "changed":
+        clause += " WHERE " + " OR ".join(
+            f"{table.name}.{name} IS DISTINCT FROM EXCLUDED.{name}"
+            for name in updated
+            if name not in VOLATILE_COLUMNS
+        )
+    return clause
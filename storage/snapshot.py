@@ -0,0 +1,157 @@
+import os
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+SNAPSHOT_DIR = "data/state/snapshots"
+
+# Columns stamped by the pipeline on every run; left out of the row hash
+METADATA_COLUMNS = ("client_id", "ingestion_id", "ingestion_timestamp")
+
+
+def snapshot_index_path(client_id: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{client_id}.pkl")
+
+
+def load_fingerprint_index(client_id: str) -> pd.Series:
+    """
+    Load the loan_id -> row hash index saved by the client's last ingestion.
+    Returns an empty index if the client has never been ingested.
+    """
+    path = snapshot_index_path(client_id)
+
+    if not os.path.exists(path):
+        return pd.Series(dtype="uint64", index=pd.Index([], dtype=object, name="loan_id"))
+
+    return pd.read_pickle(path)
+
+
+def save_fingerprint_index(client_id: str, index: pd.Series):
+    """
+    Persist the fingerprint index, replacing the previous one atomically.
+    """
+    path = snapshot_index_path(client_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    temp_path = f"{path}.tmp"
+    index.to_pickle(temp_path)
+    os.replace(temp_path, path)
+
+
+def discard_fingerprint_index(client_id: str) -> bool:
+    """
+    Forget the client's fingerprint index, e.g. after a rollback left the
+    loans table behind it, so the next run diffs against nothing and
+    writes every row again. Returns True if there was one.
+    """
+    path = snapshot_index_path(client_id)
+    if not os.path.exists(path):
+        return False
+
+    os.remove(path)
+    return True
+
+
+def fingerprint_rows(frame: pd.DataFrame) -> pd.Series:
+    """
+    Hash each row's loan data to a uint64, indexed by loan_id.
+    """
+    data_columns = [column for column in frame.columns if column not in METADATA_COLUMNS]
+    text = pd.DataFrame(
+        {column: _canonical_text(frame[column]) for column in data_columns},
+        index=frame.index
+    )
+    hashes = pd.util.hash_pandas_object(text, index=False)
+    return pd.Series(
+        hashes.to_numpy(),
+        index=pd.Index(frame["loan_id"].to_numpy(), dtype=object, name="loan_id")
+    )
+
+
+def _canonical_text(column: pd.Series) -> pd.Series:
+    """
+    Render values as text so runs that inferred 1500 vs 1500.0 hash alike.
+    """
+    column = column.astype(object)
+    lookup = {value: _text(value) for value in column.dropna().unique()}
+    return column.map(lookup).fillna("")
+
+
+def _text(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    # typed date columns hash the same as their YYYY-MM-DD text
+    if isinstance(value, pd.Timestamp) and value == value.normalize():
+        return value.date().isoformat()
+    return str(value)
+
+
+def new_snapshot_state(client_id: str) -> Dict:
+    """
+    Start a snapshot diff for one ingestion, loading the previous index.
+    """
+    return {
+        "client_id": client_id,
+        "previous": load_fingerprint_index(client_id),
+        "fingerprints": [],
+        "seen_ids": [],
+        "counts": {"new": 0, "changed": 0, "unchanged": 0, "disappeared": 0}
+    }
+
+
+def apply_snapshot_diff(state: Dict, clean_frame: pd.DataFrame, rejected_frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Classify one batch of clean rows against the previous snapshot.
+
+    Returns only the new and changed rows; unchanged rows are counted and
+    dropped. Rejected rows are recorded as seen so they are not reported
+    as disappeared.
+    """
+    fingerprints = fingerprint_rows(clean_frame)
+    previous = state["previous"]
+
+    # Look hashes up by position; reindex would cast uint64 to float64
+    positions = previous.index.get_indexer(fingerprints.index)
+    is_new = positions < 0
+    is_changed = np.zeros(len(fingerprints), dtype=bool)
+    if len(previous):
+        previous_hashes = previous.to_numpy()[positions]
+        is_changed = ~is_new & (previous_hashes != fingerprints.to_numpy())
+
+    state["counts"]["new"] += int(is_new.sum())
+    state["counts"]["changed"] += int(is_changed.sum())
+    state["counts"]["unchanged"] += int((~is_new & ~is_changed).sum())
+
+    state["fingerprints"].append(fingerprints)
+    state["seen_ids"].append(fingerprints.index)
+    if "loan_id" in rejected_frame.columns:
+        state["seen_ids"].append(pd.Index(rejected_frame["loan_id"].dropna().to_numpy(), dtype=object))
+
+    return clean_frame[is_new | is_changed]
+
+
+def finish_snapshot(state: Dict) -> List:
+    """
+    Work out which loans disappeared from the feed and save the new index.
+    Call only after the ingestion's writes have succeeded.
+    Returns the disappeared loan_ids.
+    """
+    if state["seen_ids"]:
+        seen_ids = pd.Index(np.concatenate([ids.to_numpy() for ids in state["seen_ids"]]), dtype=object)
+    else:
+        seen_ids = pd.Index([], dtype=object)
+
+    disappeared = state["previous"].index.difference(seen_ids)
+    state["counts"]["disappeared"] = len(disappeared)
+
+    if state["fingerprints"]:
+        index = pd.concat(state["fingerprints"])
+        index = index[~index.index.duplicated(keep="last")]
+    else:
+        index = state["previous"].iloc[:0]
+
+    save_fingerprint_index(state["client_id"], index)
+
+    return list(disappeared)
@@ -1,11 +1,23 @@
 import pytest
+from collections import Counter
+import pandas as pd
 from unittest.mock import patch
-from analytics.quality_metrics import compute_quality_metrics, print_quality_report
+from analytics.quality_metrics import (
+    compute_quality_metrics,
+    print_quality_report,
+    new_quality_tally,
+    update_quality_tally,
+    summarize_quality_tally
+)
 from analytics.reporting import (
     loan_status_report,
     average_loan_amount_by_status,
-    print_business_report
+    print_business_report,
+    new_business_tally,
+    update_business_tally,
+    update_business_tally_frame
 )
+from transformation.batch import RecordBatch
 
 
 class TestQualityMetrics:
@@ -57,6 +69,31 @@ class TestQualityMetrics:
         assert metrics["rejection_rate_percent"] == pytest.approx(66.67, rel=1e-2)
         assert len(metrics["top_rejection_reasons"]) == 2
 
+    def test_compute_quality_metrics_reads_validator_errors(self):
+        rejected_records = [
+            {"loan_id": "L001", "errors": ["Missing required field: loan_amount"]},
+            {"loan_id": "L002", "errors": ["Missing required field: loan_amount", "Invalid date format for field: open_date"]}
+        ]
+
+        metrics = compute_quality_metrics([], rejected_records)
+
+        assert dict(metrics["top_rejection_reasons"]) == {
+            "Missing required field: loan_amount": 2,
+            "Invalid date format for field: open_date": 1
+        }
+
+    def test_compute_quality_metrics_from_error_counts(self):
+        error_counts = Counter({
+            ("loan_amount", "missing", "Missing required field: loan_amount"): 2,
+            ("loan_status", "not_allowed", "Invalid value for field: loan_status"): 1
+        })
+
+        metrics = compute_quality_metrics([{}], [{}, {}], error_counts)
+
+        assert metrics["top_rejection_reasons"][0] == ("Missing required field: loan_amount", 2)
+        assert metrics["rejections_by_field"] == {"loan_amount": 2, "loan_status": 1}
+        assert metrics["rejections_by_rule"] == {"missing": 2, "not_allowed": 1}
+
     def test_compute_quality_metrics_empty(self):
         metrics = compute_quality_metrics([], [])
 
@@ -66,6 +103,18 @@ class TestQualityMetrics:
         assert metrics["rejection_rate_percent"] == 0.0
         assert metrics["top_rejection_reasons"] == []
 
+    def test_quality_tally_across_batches(self):
+        tally = new_quality_tally()
+        update_quality_tally(tally, [{"loan_id": "L001"}], [{"loan_id": "L002", "rejection_reason": "Bad"}])
+        update_quality_tally(tally, [], [{"loan_id": "L003", "rejection_reason": "Bad"}])
+
+        metrics = summarize_quality_tally(tally)
+
+        assert metrics["total_records"] == 3
+        assert metrics["rejected_records"] == 2
+        assert metrics["rejection_rate_percent"] == 66.67
+        assert metrics["top_rejection_reasons"] == [("Bad", 2)]
+
     @patch("builtins.print")
     def test_print_quality_report(self, mock_print):
         metrics = {
@@ -73,7 +122,9 @@ class TestQualityMetrics:
             "clean_records": 80,
             "rejected_records": 20,
             "rejection_rate_percent": 20.0,
-            "top_rejection_reasons": [("Missing field", 10), ("Invalid format", 5)]
+            "top_rejection_reasons": [("Missing field", 10), ("Invalid format", 5)],
+            "rejections_by_field": {"loan_amount": 12, "loan_id": 8},
+            "rejections_by_rule": {"missing": 10, "invalid_number": 6, "duplicate": 4}
         }
 
         print_quality_report(metrics)
@@ -82,6 +133,10 @@ class TestQualityMetrics:
         calls = mock_print.call_args_list
         assert len(calls) >= 5  # At least header + 4 data lines + reasons
 
+        printed = [call.args[0] for call in calls]
+        assert "\nRejections by rule:" in printed
+        assert printed[-3:] == [" - missing: 10", " - invalid_number: 6", " - duplicate: 4"]
+
 
 class TestReporting:
     def test_loan_status_report(self):
@@ -125,6 +180,33 @@ class TestReporting:
         assert report["ACTIVE"] == 15000.0
         assert report["CLOSED"] == 15000.0
 
+    def test_business_tally_across_batches(self):
+        tally = new_business_tally()
+        update_business_tally(tally, [{"loan_status": "ACTIVE", "loan_amount": "10000"}])
+        update_business_tally(tally, [{"loan_status": "ACTIVE", "loan_amount": "20000"}])
+
+        assert tally["counts"]["ACTIVE"] == 2
+        assert tally["totals"]["ACTIVE"] == 30000.0
+
+    def test_business_tally_frame_matches_records(self):
+        records = [
+            {"loan_status": "ACTIVE", "loan_amount": 10000.0},
+            {"loan_status": "ACTIVE", "loan_amount": 20000.0},
+            {"loan_status": "CLOSED", "loan_amount": 5000.0}
+        ]
+        from_records = update_business_tally(new_business_tally(), records)
+        from_frame = update_business_tally_frame(new_business_tally(), pd.DataFrame(records))
+
+        assert from_frame["counts"] == from_records["counts"]
+        assert from_frame["totals"] == from_records["totals"]
+
+    def test_business_tally_frame_accepts_record_batch(self):
+        frame = pd.DataFrame({"loan_status": ["ACTIVE", "CLOSED"], "loan_amount": [10000.0, 5000.0]})
+        tally = update_business_tally_frame(new_business_tally(), RecordBatch(frame, {"client_id": "TEST"}))
+
+        assert tally["counts"] == Counter({"ACTIVE": 1, "CLOSED": 1})
+        assert tally["totals"] == {"ACTIVE": 10000.0, "CLOSED": 5000.0}
+
     def test_average_loan_amount_by_status_empty(self):
         report = average_loan_amount_by_status([])
         assert report == {}
@@ -1,16 +1,48 @@
 import pytest
 import json
 import os
+import shutil
 import tempfile
+import time
 import pandas as pd
+from datetime import datetime, UTC
 from unittest.mock import patch, MagicMock
 from ingestion.ingest import (
     setup_logging,
     load_client_config,
     load_mapping_config,
     read_input_file,
+    iter_input_chunks,
+    export_to_csv,
+    finish_exports,
+    default_export_paths,
+    run_file,
+    split_commits,
+    new_run_context,
+    quarantine_run,
+    rollback,
+    discard_failed_exports,
+    parse_pragma_args,
     main
 )
+from ingestion.batch_ingest import (
+    discover_jobs,
+    load_manifest,
+    plan_tasks,
+    run_task,
+    run_batch
+)
+from ingestion.sharding import plan_shards, prepare_sharded
+from ingestion.pipeline import run_pipeline, format_stage_stats
+from storage import database
+from storage.loan_index import load_loan_index
+from transformation.transformer import get_client_plan
+from transformation.batch import RecordBatch
+from validation.error_budget import ErrorBudgetExceeded, write_quarantine_report
+from validation.error_codes import with_rendered_errors
+
+
+LOAD_STATS = {"table": "loans", "rows": 1, "written": 1, "seconds": 0.01, "rows_per_sec": 100.0}
 
 
 class TestSetupLogging:
@@ -99,6 +131,31 @@ class TestReadInputFile:
         finally:
             os.unlink(temp_file)
 
+    def test_read_input_file_with_plan_reads_mapped_columns_only(self):
+        csv_data = "id,notes,status\n00123,free text,A\n00124,more,C\n"
+
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False) as f:
+            f.write(csv_data)
+            temp_file = f.name
+
+        try:
+            client_config = {"client_id": "TEST", "file_format": "csv"}
+            schema = {"fields": {
+                "loan_id": {"type": "string"},
+                "loan_status": {"type": "string", "allowed_values": ["ACTIVE", "CLOSED"]}
+            }}
+            plan = get_client_plan({"id": "loan_id", "status": "loan_status"}, client_config, schema)
+
+            df = read_input_file(temp_file, client_config, plan)
+            assert list(df.columns) == ["id", "status"]
+            assert df.iloc[0]["id"] == "00123"
+            assert isinstance(df["status"].dtype, pd.CategoricalDtype)
+
+            chunks = list(iter_input_chunks(temp_file, client_config, 1, plan))
+            assert [list(chunk.columns) for chunk in chunks] == [["id", "status"], ["id", "status"]]
+        finally:
+            os.unlink(temp_file)
+
     def test_read_input_file_unsupported_format(self):
         client_config = {"file_format": "xml"}
 
@@ -106,16 +163,708 @@ class TestReadInputFile:
             read_input_file("dummy_path", client_config)
 
 
+class TestIterInputChunks:
+    def test_iter_input_chunks_splits_rows(self):
+        csv_data = "col1,col2\na,1\nb,2\nc,3\n"
+
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False) as f:
+            f.write(csv_data)
+            temp_file = f.name
+
+        try:
+            client_config = {"file_format": "csv"}
+
+            chunks = list(iter_input_chunks(temp_file, client_config, 2))
+            assert [len(chunk) for chunk in chunks] == [2, 1]
+            assert chunks[1].iloc[0]["col1"] == "c"
+        finally:
+            os.unlink(temp_file)
+
+    def test_iter_input_chunks_unsupported_format(self):
+        with pytest.raises(ValueError, match="Unsupported file format"):
+            list(iter_input_chunks("dummy_path", {"file_format": "xml"}, 10))
+
+
+class TestExportToCsv:
+    def test_export_append_writes_header_once(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            clean_path = os.path.join(temp_dir, "clean.csv")
+            rejected_path = os.path.join(temp_dir, "rejected.csv")
+
+            with patch("ingestion.ingest.CLEAN_EXPORT_PATH", clean_path), \
+                 patch("ingestion.ingest.REJECTED_EXPORT_PATH", rejected_path):
+                export_to_csv([{"loan_id": "L001"}], [], MagicMock(), append=True)
+                export_to_csv([{"loan_id": "L002"}], [], MagicMock(), append=True)
+
+                # nothing is in place until the run finishes
+                assert not os.path.exists(clean_path)
+                finish_exports(default_export_paths(), MagicMock())
+
+            df = pd.read_csv(clean_path)
+            assert list(df["loan_id"]) == ["L001", "L002"]
+            assert not os.path.exists(rejected_path)
+
+    def test_export_batch_writes_metadata_columns(self):
+        stamped = datetime(2024, 1, 1, 12, 30, tzinfo=UTC)
+        batch = RecordBatch(pd.DataFrame({"loan_id": ["L001", "L002"]}), {"ingestion_timestamp": stamped})
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = {"clean": os.path.join(temp_dir, "clean.csv"), "rejected": os.path.join(temp_dir, "rejected.csv")}
+            export_to_csv(batch, [], MagicMock(), paths=paths)
+            finish_exports(paths, MagicMock())
+
+            df = pd.read_csv(paths["clean"])
+
+        assert list(df.columns) == ["loan_id", "ingestion_timestamp"]
+        assert list(df["ingestion_timestamp"]) == ["2024-01-01T12:30:00+00:00"] * 2
+
+    def test_gzip_export_streams_batches_and_flattens_errors(self):
+        rejected = RecordBatch(
+            pd.DataFrame({"loan_id": ["L001"], "errors": [["Missing required field: loan_amount", "Invalid date"]]}),
+            {"ingestion_id": "INGEST_001"}
+        )
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = {"clean": os.path.join(temp_dir, "clean.csv"), "rejected": os.path.join(temp_dir, "rejected.csv")}
+            export_to_csv([], rejected, MagicMock(), paths=paths, compression="gzip")
+            export_to_csv([], rejected, MagicMock(), append=True, paths=paths, compression="gzip")
+            finish_exports(paths, MagicMock(), "gzip")
+
+            df = pd.read_csv(paths["rejected"] + ".gz")
+
+        assert list(df.columns) == ["loan_id", "errors", "ingestion_id"]
+        assert list(df["errors"]) == ["Missing required field: loan_amount; Invalid date"] * 2
+
+    def test_default_exports_are_named_per_ingestion(self):
+        paths = default_export_paths("INGEST_001")
+
+        assert paths["clean"] == "data/processed/loans_clean_INGEST_001.csv"
+        assert paths["rejected"] == "data/rejected/loans_error_INGEST_001.csv"
+
+
+class TestSplitCommits:
+    def test_pieces_follow_read_order(self):
+        clean = pd.DataFrame({"loan_id": ["L0", "L2", "L3", "L4"]}, index=[0, 2, 3, 4])
+        rejected = pd.DataFrame({"loan_id": ["L1"]}, index=[1])
+
+        pieces = split_commits(clean, rejected, 2)
+
+        assert [(list(c.index), list(r.index)) for c, r in pieces] == [([0], [1]), ([2, 3], []), ([4], [])]
+
+    def test_small_batch_is_one_piece(self):
+        clean = pd.DataFrame({"loan_id": ["L0"]})
+        rejected = pd.DataFrame({"loan_id": []})
+
+        assert len(split_commits(clean, rejected, 5)) == 1
+        assert len(split_commits(clean, rejected)) == 1
+
+
+class RunFileFixture:
+    """
+    Runs files end to end against a temporary SQLite database, with the
+    loan_id index, snapshot index, manifest and quarantine reports kept
+    in the same temporary directory.
+    """
+    CLIENT_CONFIG = {
+        "client_id": "TEST",
+        "file_format": "csv",
+        "date_formats": ["%Y-%m-%d"],
+        "status_code_mapping": {"A": "ACTIVE", "C": "CLOSED"}
+    }
+    MAPPING = {
+        "id": "loan_id", "name": "borrower_name", "amount": "loan_amount",
+        "status": "loan_status", "date": "open_date"
+    }
+    SCHEMA = {"fields": {
+        "loan_id": {"type": "string", "required": True},
+        "borrower_name": {"type": "string", "required": True},
+        "loan_amount": {"type": "number", "required": True},
+        "loan_status": {"type": "string", "required": True, "allowed_values": ["ACTIVE", "CLOSED"]},
+        "open_date": {"type": "date", "required": True}
+    }}
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+        def write_report(*args, **kwargs):
+            return write_quarantine_report(*args, directory=self.temp_dir, **kwargs)
+
+        self.patchers = [
+            patch("storage.database.DB_PATH", f"sqlite:///{os.path.join(self.temp_dir, 'etl.db')}"),
+            patch("storage.loan_index.LOAN_INDEX_DIR", os.path.join(self.temp_dir, "loan_ids")),
+            patch("storage.snapshot.SNAPSHOT_DIR", os.path.join(self.temp_dir, "snapshots")),
+            patch("storage.ingestion_manifest.MANIFEST_DIR", os.path.join(self.temp_dir, "manifest")),
+            patch("ingestion.ingest.write_quarantine_report", side_effect=write_report)
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def teardown_method(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        database.dispose_engine()
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def write_file(self, name, rows, mode="w"):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, mode) as f:
+            if mode == "w":
+                f.write("id,name,amount,status,date\n")
+            f.writelines(f"{loan_id},Borrower {loan_id},{amount},{status},2024-01-01\n" for loan_id, amount, status in rows)
+        return path
+
+    def new_run(self, ingestion_id, cdc=False, client_config=None, **storage_options):
+        export_paths = {
+            kind: os.path.join(self.temp_dir, f"{ingestion_id}_{kind}.csv") for kind in ("clean", "rejected", "disappeared")
+        }
+        if cdc:
+            storage_options["write_mode"] = "upsert"
+        return new_run_context(
+            client_config or self.CLIENT_CONFIG, self.MAPPING, self.SCHEMA, ingestion_id, MagicMock(), storage_options,
+            cdc=cdc, export_paths=export_paths
+        )
+
+    def query(self, sql):
+        with database.get_engine().connect() as connection:
+            return [tuple(row) for row in connection.exec_driver_sql(sql).fetchall()]
+
+    def stored_loans(self):
+        return self.query("SELECT loan_id, loan_amount, loan_status, ingestion_id FROM loans ORDER BY loan_id")
+
+    def partial_exports(self):
+        return sorted(name for name in os.listdir(self.temp_dir) if name.endswith(".partial"))
+
+
+class TestRunFile(RunFileFixture):
+    def test_run_file_processes_each_chunk(self):
+        file_path = self.write_file("loans.csv", [("L001", "100", "A"), ("L002", "200", "X"), ("L003", "300", "A")])
+
+        run = self.new_run("INGEST_001")
+        quality_tally, business_tally = run_file(file_path, run, 2)
+
+        assert self.stored_loans() == [("L001", 100.0, "ACTIVE", "INGEST_001"), ("L003", 300.0, "ACTIVE", "INGEST_001")]
+        assert self.query("SELECT loan_id, rejection_reason FROM rejected_loans") == [
+            ("L002", "Invalid value 'X' for field: loan_status")
+        ]
+        assert list(pd.read_csv(run["export_paths"]["clean"])["loan_id"]) == ["L001", "L003"]
+        assert quality_tally["clean_records"] == 2
+        assert quality_tally["rejected_records"] == 1
+        assert business_tally["counts"]["ACTIVE"] == 2
+        assert business_tally["totals"]["ACTIVE"] == 400.0
+
+    def test_run_file_commits_in_slices_with_checkpoints(self):
+        file_path = self.write_file("loans.csv", [
+            ("L001", "100", "A"), ("L002", "abc", "A"), ("L003", "300", "A"), ("L004", "400", "A"), ("L005", "500", "A")
+        ])
+
+        run = self.new_run("INGEST_001", commit_size=2)
+        with patch.object(run["sink"], "write_batch", wraps=run["sink"].write_batch) as write_batch, \
+                patch.object(run["sink"], "write_checkpoint", wraps=run["sink"].write_checkpoint) as write_checkpoint:
+            run_file(file_path, run)
+
+        checkpoints = [call.args[0] for call in write_checkpoint.call_args_list]
+
+        assert [(len(call.args[0]), len(call.args[1])) for call in write_batch.call_args_list] == [(1, 1), (2, 0), (1, 0)]
+        assert [checkpoint["rows"] for checkpoint in checkpoints] == [2, 4, 5, 5]
+        assert database.load_checkpoint("INGEST_001")["status"] == "complete"
+        assert len(self.stored_loans()) == 4
+
+    def test_run_file_resumes_after_committed_rows(self):
+        file_path = self.write_file("loans.csv", [("L001", "100", "A"), ("L002", "200", "A"), ("L003", "300", "A")])
+
+        self.interrupt_after_first_commit(file_path, self.new_run("INGEST_001"))
+        assert [loan[0] for loan in self.stored_loans()] == ["L001", "L002"]
+
+        run = self.new_run("INGEST_001")
+        run_file(file_path, run, resume=True)
+
+        assert [loan[0] for loan in self.stored_loans()] == ["L001", "L002", "L003"]
+        # rows stored after the resume carry the ingestion's original timestamp
+        assert len(self.query("SELECT DISTINCT ingestion_timestamp FROM loans")) == 1
+        # and are added to the export the interrupted run started
+        assert list(pd.read_csv(run["export_paths"]["clean"])["loan_id"]) == ["L001", "L002", "L003"]
+        checkpoint = database.load_checkpoint("INGEST_001")
+        assert (checkpoint["rows"], checkpoint["status"]) == (3, "complete")
+
+    def interrupt_after_first_commit(self, file_path, run):
+        write_batch = run["sink"].write_batch
+
+        def fail_second_commit(*args):
+            if write_batch_mock.call_count == 2:
+                raise RuntimeError("connection lost")
+            return write_batch(*args)
+
+        with patch.object(run["sink"], "write_batch", side_effect=fail_second_commit) as write_batch_mock:
+            with pytest.raises(RuntimeError):
+                run_file(file_path, run, 2)
+
+    def test_rollback_removes_unfinished_exports(self):
+        file_path = self.write_file("loans.csv", [("L001", "100", "A"), ("L002", "200", "A"), ("L003", "300", "A")])
+
+        run = self.new_run("INGEST_001")
+        self.interrupt_after_first_commit(file_path, run)
+        # kept for --resume
+        discard_failed_exports(run)
+        assert self.partial_exports() == ["INGEST_001_clean.csv.partial"]
+
+        rollback("INGEST_001", MagicMock(), export_paths=run["export_paths"])
+
+        assert self.stored_loans() == []
+        assert self.partial_exports() == []
+
+    def test_run_file_rejects_duplicate_loan_ids(self):
+        run_file(self.write_file("earlier.csv", [("L009", "900", "A")]), self.new_run("INGEST_000"))
+        file_path = self.write_file("loans.csv", [
+            ("L001", "100", "A"), ("L002", "200", "A"), ("L001", "300", "A"),
+            ("L009", "400", "A"), ("L003", "abc", "A"), ("L002", "500", "A")
+        ])
+
+        quality_tally, _ = run_file(file_path, self.new_run("INGEST_001"), 3)
+
+        assert [loan[0] for loan in self.stored_loans()] == ["L001", "L002", "L009"]
+        assert self.query("SELECT loan_id, rejection_reason FROM rejected_loans ORDER BY id") == [
+            ("L001", "Duplicate value 'L001' for field: loan_id"),
+            ("L009", "Value 'L009' already stored for field: loan_id"),
+            ("L003", "Invalid number for field: loan_amount"),
+            ("L002", "Duplicate value 'L002' for field: loan_id")
+        ]
+        assert quality_tally["rules"] == {"duplicate": 2, "already_stored": 1, "invalid_number": 1}
+
+    def test_run_file_stops_when_error_budget_exceeded(self):
+        file_path = self.write_file("loans.csv", [
+            ("L001", "100", "A"), ("L002", "abc", "A"), ("L003", "xyz", "A"),
+            ("L004", "400", "A"), ("L005", "500", "A"), ("L006", "600", "A")
+        ])
+        client_config = {**self.CLIENT_CONFIG, "ingestion_settings": {"max_error_percentage": 10, "error_budget_min_rows": 3}}
+
+        run = self.new_run("INGEST_001", client_config=client_config)
+        with pytest.raises(ErrorBudgetExceeded):
+            run_file(file_path, run, 2)
+
+        # the first chunk is under min_rows and is held until the budget is judged, then dropped
+        assert self.stored_loans() == []
+        assert run["error_budget"]["rows_seen"] == 4
+        assert run["error_budget"]["rejected"] == 2
+
+    def test_incremental_run_reads_only_new_rows(self):
+        file_path = self.write_file("rolling.csv", [("L001", "100", "A"), ("L002", "200", "A"), ("L003", "300", "A")])
+
+        def stored_by(ingestion_id):
+            return [loan[0] for loan in self.stored_loans() if loan[3] == ingestion_id]
+
+        run = self.new_run("INGEST_001")
+        run_file(file_path, run, 2, incremental=True)
+        assert stored_by("INGEST_001") == ["L001", "L002", "L003"]
+        assert run["manifest"]["rows"] == 3
+
+        self.write_file("rolling.csv", [("L004", "400", "A")], mode="a")
+
+        run = self.new_run("INGEST_002")
+        quality_tally, _ = run_file(file_path, run, 2, incremental=True)
+        assert stored_by("INGEST_002") == ["L004"]
+        assert quality_tally["clean_records"] == 1
+        assert run["manifest"]["checkpoints"][-1]["rows"] == [3, 4]
+
+        run = self.new_run("INGEST_003")
+        run_file(file_path, run, incremental=True)
+        assert run["manifest"]["action"] == "skip"
+        assert stored_by("INGEST_003") == []
+
+
+class TestQuarantine(RunFileFixture):
+    CLIENT_CONFIG = {
+        **RunFileFixture.CLIENT_CONFIG,
+        "ingestion_settings": {"max_error_percentage": 10, "error_budget_min_rows": 2}
+    }
+
+    def test_quarantine_rolls_back_earlier_commits(self):
+        file_path = self.write_file("loans.csv", [
+            ("L001", "100", "A"), ("L002", "200", "A"), ("L003", "abc", "A"), ("L004", "abc", "A")
+        ])
+
+        run = self.new_run("INGEST_001")
+        with pytest.raises(ErrorBudgetExceeded) as raised:
+            run_file(file_path, run, chunk_size=2)
+
+        # the first chunk was committed before the second ran out the budget
+        assert database.load_checkpoint("INGEST_001")["rows"] == 2
+        assert self.partial_exports() == ["INGEST_001_clean.csv.partial"]
+
+        report = quarantine_run(run, raised.value.budget, file_path)
+
+        assert self.stored_loans() == []
+        assert database.load_checkpoint("INGEST_001")["status"] == "rolled_back"
+        assert report["committed_rows"] == 2
+        assert report["rolled_back"] == {"loans": 2, "rejected_loans": 0, "restored_loans": 0, "columnar_files": 0}
+        assert self.partial_exports() == []
+
+    def test_upsert_quarantined_before_min_rows_commits_nothing(self):
+        stored_path = self.write_file("stored.csv", [(f"L{number:03d}", "100", "A") for number in range(1, 7)])
+        run_file(stored_path, self.new_run("INGEST_001"), chunk_size=2)
+        stored = self.stored_loans()
+
+        # default error_budget_min_rows: the file is only judged at its end
+        client_config = {**self.CLIENT_CONFIG, "ingestion_settings": {"max_error_percentage": 10}}
+        file_path = self.write_file("update.csv", [
+            ("L001", "150", "A"), ("L002", "250", "A"), ("L003", "abc", "A"), ("L004", "abc", "A")
+        ])
+        run = self.new_run("INGEST_002", write_mode="upsert", client_config=client_config)
+        with pytest.raises(ErrorBudgetExceeded) as raised:
+            run_file(file_path, run, chunk_size=2)
+        report = quarantine_run(run, raised.value.budget, file_path)
+
+        assert database.load_checkpoint("INGEST_002") is None
+        assert report["committed_rows"] == 0
+        assert report["rolled_back"] is None
+        assert self.stored_loans() == stored
+
+    def test_rolled_back_cdc_run_restores_loans_and_snapshot(self):
+        daily = [(f"L{number:03d}", "100", "A") for number in range(1, 7)]
+        first_path = self.write_file("day1.csv", daily)
+        run_file(first_path, self.new_run("INGEST_001", cdc=True), chunk_size=2)
+        stored = self.stored_loans()
+
+        # the first chunk changes two stored loans, the second is all rejects
+        second_path = self.write_file("day2.csv", [
+            ("L001", "150", "A"), ("L002", "250", "A"), ("L003", "abc", "A"), ("L004", "abc", "A")
+        ])
+        run = self.new_run("INGEST_002", cdc=True)
+        with pytest.raises(ErrorBudgetExceeded) as raised:
+            run_file(second_path, run, chunk_size=2)
+        report = quarantine_run(run, raised.value.budget, second_path)
+
+        assert report["rolled_back"]["restored_loans"] == 2
+        assert self.stored_loans() == stored
+        assert not os.path.exists(os.path.join(self.temp_dir, "snapshots", "TEST.pkl"))
+
+        # re-sending the first day's file is diffed afresh rather than skipped as unchanged
+        rerun = self.new_run("INGEST_003", cdc=True)
+        run_file(first_path, rerun, chunk_size=2)
+
+        assert rerun["snapshot"]["counts"]["unchanged"] == 0
+        assert self.stored_loans() == stored
+
+
+class TestBatchIngest:
+    def test_discover_jobs_skips_unknown_clients(self):
+        with tempfile.TemporaryDirectory() as root:
+            for client, name in [("lender_a", "b.csv"), ("lender_a", "a.csv"), ("lender_a", "notes.txt"),
+                                 ("unknown", "a.csv")]:
+                os.makedirs(os.path.join(root, client), exist_ok=True)
+                open(os.path.join(root, client, name), "w").close()
+
+            jobs = discover_jobs(root)
+
+        assert [(job["client"], os.path.basename(job["file"])) for job in jobs] == [
+            ("lender_a", "a.csv"),
+            ("lender_a", "b.csv")
+        ]
+
+    def test_load_manifest_requires_columns(self):
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False) as f:
+            f.write("client,path\nlender_a,x.csv\n")
+            manifest = f.name
+
+        try:
+            with pytest.raises(ValueError, match="file"):
+                load_manifest(manifest)
+        finally:
+            os.unlink(manifest)
+
+    def test_plan_tasks_groups_client_files_for_cdc(self):
+        jobs = [
+            {"client": "lender_a", "file": "one.csv"},
+            {"client": "lender_b", "file": "two.csv"},
+            {"client": "lender_a", "file": "three.csv"}
+        ]
+
+        tasks = plan_tasks(jobs, "INGEST_1")
+        cdc_tasks = plan_tasks(jobs, "INGEST_1", cdc=True)
+
+        assert len(tasks) == 3
+        assert [len(task["jobs"]) for task in cdc_tasks] == [2, 1]
+        assert cdc_tasks[0]["jobs"][1]["ingestion_id"] == "INGEST_1_003"
+        # configs are loaded once per client and shared by its tasks
+        assert tasks[0]["configs"] is tasks[2]["configs"]
+        assert tasks[0]["jobs"][0]["export_paths"]["clean"] != tasks[2]["jobs"][0]["export_paths"]["clean"]
+
+    def test_run_task_finishes_cdc_snapshot_once(self):
+        temp_dir = tempfile.mkdtemp()
+        jobs = [{"client": "lender_a", "file": "data/raw/lender_a/sample.csv"}]
+        storage_options = {"batch_size": 100, "write_mode": "upsert", "conflict_policy": "changed"}
+
+        try:
+            with patch("storage.database.DB_PATH", f"sqlite:///{os.path.join(temp_dir, 'batch.db')}"), \
+                    patch("storage.loan_index.LOAN_INDEX_DIR", os.path.join(temp_dir, "loan_ids")), \
+                    patch("storage.snapshot.SNAPSHOT_DIR", os.path.join(temp_dir, "snapshots")), \
+                    patch("ingestion.ingest.finish_snapshot", return_value=[]) as mock_finish_snapshot:
+                database.create_tables()
+                task = plan_tasks(jobs, "INGEST_TEST", cdc=True)[0]
+                task["jobs"][0]["export_paths"] = {
+                    kind: os.path.join(temp_dir, f"{kind}.csv") for kind in ("clean", "rejected", "disappeared")
+                }
+
+                results = run_task(task, storage_options, cdc=True)
+        finally:
+            database.dispose_engine()
+            import shutil
+            shutil.rmtree(temp_dir)
+
+        assert results[0]["status"] == "ok"
+        mock_finish_snapshot.assert_called_once()
+
+    def test_run_batch_with_worker_pool(self):
+        temp_dir = tempfile.mkdtemp()
+        db_url = f"sqlite:///{os.path.join(temp_dir, 'batch.db')}"
+        jobs = [
+            {"client": "lender_a", "file": "data/raw/lender_a/sample.csv"},
+            {"client": "lender_b", "file": "data/raw/lender_b/sample.csv"}
+        ]
+        storage_options = {"batch_size": 100, "write_mode": "insert", "conflict_policy": "changed"}
+
+        try:
+            with patch("storage.database.DB_PATH", db_url), \
+                    patch("storage.loan_index.LOAN_INDEX_DIR", os.path.join(temp_dir, "loan_ids")):
+                tasks = plan_tasks(jobs, "INGEST_TEST")
+                for task in tasks:
+                    for job in task["jobs"]:
+                        job["export_paths"] = {
+                            kind: os.path.join(temp_dir, f"{job['ingestion_id']}_{kind}.csv")
+                            for kind in ("clean", "rejected", "disappeared")
+                        }
+
+                results = run_batch(tasks, storage_options, 2, "INGEST_TEST")
+
+                with database.get_engine().connect() as connection:
+                    stored = connection.exec_driver_sql("SELECT COUNT(*) FROM loans").scalar()
+        finally:
+            database.dispose_engine()
+            import shutil
+            shutil.rmtree(temp_dir)
+            shutil.rmtree("logs", ignore_errors=True)
+
+        assert [result["ingestion_id"] for result in results] == ["INGEST_TEST_001", "INGEST_TEST_002"]
+        assert all(result["status"] == "ok" for result in results)
+        assert stored == sum(result["clean"] for result in results)
+
+    def test_run_batch_same_loans_from_concurrent_files(self):
+        temp_dir = tempfile.mkdtemp()
+        db_url = f"sqlite:///{os.path.join(temp_dir, 'batch.db')}"
+        jobs = []
+        for name in ("copy_1.csv", "copy_2.csv"):
+            path = os.path.join(temp_dir, name)
+            shutil.copy("data/raw/lender_a/sample.csv", path)
+            jobs.append({"client": "lender_a", "file": path})
+        storage_options = {"batch_size": 100, "write_mode": "insert", "conflict_policy": "changed"}
+
+        try:
+            with patch("storage.database.DB_PATH", db_url), \
+                    patch("storage.loan_index.LOAN_INDEX_DIR", os.path.join(temp_dir, "loan_ids")), \
+                    patch("ingestion.batch_ingest.setup_logging", return_value=None):
+                tasks = plan_tasks(jobs, "INGEST_TEST")
+                for task in tasks:
+                    # no error budget: the second file is stored with every row rejected
+                    task["configs"]["client_config"] = {**task["configs"]["client_config"], "ingestion_settings": {}}
+                    for job in task["jobs"]:
+                        job["export_paths"] = {
+                            kind: os.path.join(temp_dir, f"{job['ingestion_id']}_{kind}.csv")
+                            for kind in ("clean", "rejected", "disappeared")
+                        }
+
+                results = run_batch(tasks, storage_options, 2, "INGEST_TEST", chunk_size=10)
+
+                with database.get_engine().connect() as connection:
+                    stored = connection.exec_driver_sql("SELECT COUNT(*) FROM loans").scalar()
+                    already_stored = connection.exec_driver_sql(
+                        "SELECT COUNT(*) FROM rejected_loans WHERE rejection_reason LIKE '%already stored%'"
+                    ).scalar()
+                index = load_loan_index()
+        finally:
+            database.dispose_engine()
+            shutil.rmtree(temp_dir)
+
+        # whichever file commits second finds every loan already stored
+        assert all(result["status"] == "ok" for result in results)
+        assert stored == max(result["clean"] for result in results)
+        assert already_stored == stored
+        assert len(index) == stored
+
+
+class TestSharding:
+    def write_csv(self, rows):
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False) as f:
+            f.write("id,status,amount\n")
+            for number in range(rows):
+                amount = "abc" if number % 7 == 0 else str(number * 10.5 if number % 3 else number)
+                f.write(f"L{number:04d},{'A' if number % 5 else 'Z'},{amount}\n")
+            return f.name
+
+    def test_plan_shards_aligns_to_lines(self):
+        temp_file = self.write_csv(100)
+
+        try:
+            header, ranges = plan_shards(temp_file, 4)
+            with open(temp_file, "rb") as f:
+                content = f.read()
+        finally:
+            os.unlink(temp_file)
+
+        assert header == b"id,status,amount\n"
+        assert len(ranges) == 4
+        assert ranges[0][0] == len(header)
+        assert ranges[-1][1] == len(content)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert end == start
+            assert content[start - 1:start] == b"\n"
+
+    def test_prepare_sharded_matches_serial_run(self):
+        temp_file = self.write_csv(500)
+        client_config = {
+            "client_id": "TEST",
+            "file_format": "csv",
+            "status_code_mapping": {"A": "ACTIVE"}
+        }
+        mapping = {"id": "loan_id", "status": "loan_status", "amount": "loan_amount"}
+        schema = {
+            "fields": {
+                "loan_id": {"type": "string", "required": True},
+                "loan_status": {"type": "string", "required": True, "allowed_values": ["ACTIVE"]},
+                "loan_amount": {"type": "number", "required": True}
+            }
+        }
+        run = new_run_context(client_config, mapping, schema, "INGEST_001", MagicMock())
+
+        try:
+            serial_clean, serial_rejected = prepare_sharded(temp_file, run, 1)
+            clean, rejected = prepare_sharded(temp_file, run, 3)
+        finally:
+            os.unlink(temp_file)
+
+        assert len(serial_rejected) > 0
+        assert clean.metadata == serial_clean.metadata
+        assert clean.frame.to_dict(orient="records") == serial_clean.frame.to_dict(orient="records")
+        assert rejected.frame.to_dict(orient="records") == serial_rejected.frame.to_dict(orient="records")
+
+    def test_sharded_exports_match_serial_exports(self):
+        client_config = {"client_id": "TEST", "file_format": "csv", "status_code_mapping": {"A": "ACTIVE"}}
+        mapping = {"id": "loan_id", "status": "loan_status", "amount": "loan_amount"}
+        schema = {
+            "fields": {
+                "loan_id": {"type": "string", "required": True},
+                "loan_status": {"type": "string", "required": True, "allowed_values": ["ACTIVE"]},
+                "loan_amount": {"type": "number", "required": True}
+            }
+        }
+        run = new_run_context(client_config, mapping, schema, "INGEST_001", MagicMock())
+
+        def exports(file_path, shards):
+            clean, rejected = prepare_sharded(file_path, run, shards)
+            rejected = rejected.with_frame(with_rendered_errors(rejected.frame, run["compiled_schema"]))
+            paths = {kind: f"{file_path}.{shards}.{kind}.csv" for kind in ("clean", "rejected")}
+            export_to_csv(clean, rejected, MagicMock(), paths=paths)
+            finish_exports(paths, MagicMock())
+            contents = []
+            for path in paths.values():
+                with open(path) as f:
+                    contents.append(f.read())
+                os.unlink(path)
+            return contents
+
+        # a blank amount makes the first shard read the column as float, a
+        # bad one as text; the other shards read whole numbers as int
+        for odd_amount in ("", "abc"):
+            with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False) as f:
+                f.write("id,status,amount\n")
+                for number in range(60):
+                    amount = odd_amount if number == 3 else str(number * 100)
+                    f.write(f"L{number:04d},{'A' if number % 5 else 'Z'},{amount}\n")
+            try:
+                serial = exports(f.name, 1)
+                sharded = exports(f.name, 3)
+            finally:
+                os.unlink(f.name)
+
+            assert sharded == serial
+
+
+class TestPipeline:
+    def test_run_pipeline_keeps_order_and_counts_batches(self):
+        results = []
+
+        stats = run_pipeline(
+            range(20),
+            [("double", lambda value: value * 2), ("collect", results.append)],
+            queue_size=1
+        )
+
+        assert results == [value * 2 for value in range(20)]
+        assert [stats[name]["batches"] for name in ("read", "double", "collect")] == [20, 20, 20]
+        assert all(stage["busy_seconds"] >= 0 and stage["idle_seconds"] >= 0 for stage in stats.values())
+
+    def test_run_pipeline_applies_backpressure(self):
+        produced = []
+        consumed = []
+        max_ahead = []
+
+        def source():
+            for value in range(10):
+                produced.append(value)
+                yield value
+
+        def slow_sink(value):
+            max_ahead.append(len(produced) - len(consumed))
+            time.sleep(0.01)
+            consumed.append(value)
+
+        run_pipeline(source(), [("sink", slow_sink)], queue_size=1)
+
+        # one batch in the sink, one queued, one held by the blocked reader
+        assert max(max_ahead) <= 3
+
+    def test_run_pipeline_reraises_stage_error(self):
+        def fail(value):
+            if value == 3:
+                raise ValueError("bad batch")
+            return value
+
+        with pytest.raises(ValueError, match="bad batch"):
+            run_pipeline(range(100), [("check", fail), ("sink", lambda value: None)])
+
+    def test_format_stage_stats_marks_bottleneck(self):
+        stats = {
+            "read": {"batches": 2, "busy_seconds": 0.5, "idle_seconds": 1.0},
+            "store": {"batches": 2, "busy_seconds": 2.0, "idle_seconds": 0.1}
+        }
+
+        lines = format_stage_stats(stats)
+
+        assert lines[1].endswith("(bottleneck)")
+        assert not lines[0].endswith("(bottleneck)")
+
+
+class TestParsePragmaArgs:
+    def test_parse_pragma_args(self):
+        result = parse_pragma_args(["synchronous=FULL", "cache_size = -2000"])
+        assert result == {"synchronous": "FULL", "cache_size": "-2000"}
+
+    def test_parse_pragma_args_invalid(self):
+        with pytest.raises(ValueError, match="NAME=VALUE"):
+            parse_pragma_args(["synchronous"])
+
+
 class TestMainFunction:
+    @patch("storage.sinks.write_checkpoint")
+    @patch("storage.sinks.get_engine")
     @patch("argparse.ArgumentParser.parse_args")
     @patch("ingestion.ingest.load_client_config")
     @patch("ingestion.ingest.load_mapping_config")
     @patch("ingestion.ingest.read_input_file")
-    @patch("ingestion.ingest.transform_records")
-    @patch("ingestion.ingest.validate_records")
-    @patch("ingestion.ingest.create_tables")
-    @patch("ingestion.ingest.insert_clean_records")
-    @patch("ingestion.ingest.insert_rejected_records")
+    @patch("ingestion.ingest.transform_batch")
+    @patch("ingestion.ingest.validate_frame")
+    @patch("storage.sinks.create_tables")
+    @patch("storage.sinks.bulk_insert_clean_records")
+    @patch("storage.sinks.bulk_insert_rejected_records")
     @patch("ingestion.ingest.compute_quality_metrics")
     @patch("ingestion.ingest.print_quality_report")
     @patch("ingestion.ingest.print_business_report")
@@ -125,19 +874,41 @@ class TestMainFunction:
                               mock_print_quality, mock_compute_metrics, mock_insert_rejected,
                               mock_insert_clean, mock_create_tables, mock_validate,
                               mock_transform, mock_read_file, mock_load_mapping,
-                              mock_load_config, mock_parse_args):
+                              mock_load_config, mock_parse_args, mock_transaction, mock_write_checkpoint):
         # Setup mocks
         mock_args = MagicMock()
         mock_args.client = "test_client"
         mock_args.file = "test_file.csv"
+        mock_args.chunk_size = None
+        mock_args.shards = None
+        mock_args.pipeline_depth = None
+        mock_args.batch_size = 1000
+        mock_args.write_mode = "insert"
+        mock_args.conflict_policy = "changed"
+        mock_args.cdc = False
+        mock_args.incremental = False
+        mock_args.resume = None
+        mock_args.rollback = None
+        mock_args.commit_size = None
+        mock_args.db_url = None
+        mock_args.pool_size = None
+        mock_args.sqlite_pragma = []
+        mock_args.columnar = None
+        mock_args.export_compression = "none"
+        mock_args.sink = "bulk"
         mock_parse_args.return_value = mock_args
 
         mock_load_config.return_value = {"client_id": "TEST"}
         mock_load_mapping.return_value = {"mapping": {}}
         mock_read_file.return_value = pd.DataFrame({"col": [1, 2]})
-        mock_transform.return_value = [{"transformed": "data"}]
-        mock_validate.return_value = ([{"clean": "data"}], [{"rejected": "data"}])
+        mock_transform.return_value = RecordBatch(pd.DataFrame([{"transformed": "data"}]))
+        mock_validate.return_value = (
+            RecordBatch(pd.DataFrame([{"clean": "data"}])),
+            RecordBatch(pd.DataFrame([{"rejected": "data", "error_codes": 0}]))
+        )
         mock_compute_metrics.return_value = {"metrics": "data"}
+        mock_insert_clean.return_value = LOAD_STATS
+        mock_insert_rejected.return_value = LOAD_STATS
 
         # Mock the schema loading
         mock_json_load.return_value = {"fields": {}}
@@ -151,7 +922,7 @@ class TestMainFunction:
         mock_load_mapping.assert_called_once_with("test_client")
         mock_read_file.assert_called_once()
         mock_transform.assert_called_once()
-        # Note: validate_records may not be called if there are issues with the flow
+        mock_validate.assert_called_once()
         mock_create_tables.assert_called_once()
         mock_insert_clean.assert_called_once()
         mock_insert_rejected.assert_called_once()
@@ -159,6 +930,9 @@ class TestMainFunction:
         mock_print_quality.assert_called_once()
         mock_print_business.assert_called_once()
 
+        # the batch and its checkpoint commit together, then the run is marked complete
+        assert [call.args[1]["status"] for call in mock_write_checkpoint.call_args_list] == ["in_progress", "complete"]
+
         # Should not exit with error
         mock_exit.assert_not_called()
 
@@ -168,6 +942,20 @@ class TestMainFunction:
         mock_args = MagicMock()
         mock_args.client = "test_client"
         mock_args.file = "test_file.csv"
+        mock_args.chunk_size = None
+        mock_args.shards = None
+        mock_args.pipeline_depth = None
+        mock_args.cdc = False
+        mock_args.incremental = False
+        mock_args.resume = None
+        mock_args.rollback = None
+        mock_args.commit_size = None
+        mock_args.db_url = None
+        mock_args.pool_size = None
+        mock_args.sqlite_pragma = []
+        mock_args.columnar = None
+        mock_args.export_compression = "none"
+        mock_args.sink = "bulk"
         mock_parse_args.return_value = mock_args
 
         mock_load_config.side_effect = Exception("Test error")
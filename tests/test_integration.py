@@ -164,11 +164,11 @@ L003,Bob Johnson,18000,A,2024-07-01"""
         assert rejected_records[0]["loan_id"] == "L002"
         assert "errors" in rejected_records[0]
 
-    @patch("storage.database.create_engine")
+    @patch("storage.database.get_engine")
     @patch("storage.database.sessionmaker")
-    def test_storage_pipeline(self, mock_sessionmaker, mock_create_engine):
+    def test_storage_pipeline(self, mock_sessionmaker, mock_get_engine):
         mock_engine = MagicMock()
-        mock_create_engine.return_value = mock_engine
+        mock_get_engine.return_value = mock_engine
 
         mock_session = MagicMock()
         mock_sessionmaker.return_value = mock_session
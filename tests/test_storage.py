@@ -1,15 +1,58 @@
 import pytest
 import os
 import tempfile
+import pandas as pd
 from unittest.mock import patch, MagicMock
-from datetime import datetime
+from datetime import datetime, UTC
 from storage.database import (
     get_engine,
+    get_session_factory,
+    configure_engine,
+    dispose_engine,
     create_tables,
     insert_clean_records,
-    insert_rejected_records
+    insert_rejected_records,
+    bulk_insert_clean_records,
+    bulk_insert_rejected_records,
+    write_transaction,
+    new_checkpoint,
+    advance_checkpoint,
+    write_checkpoint,
+    load_checkpoint,
+    rollback_ingestion
 )
-from storage.models import Loan, RejectedLoan
+from storage.models import Loan, RejectedLoan, ReplacedLoan
+from storage.snapshot import (
+    new_snapshot_state,
+    apply_snapshot_diff,
+    finish_snapshot,
+    fingerprint_rows,
+    load_fingerprint_index
+)
+from storage.loan_index import (
+    new_duplicate_state,
+    find_duplicates,
+    record_stored,
+    finish_duplicates,
+    find_stored_since,
+    load_loan_index
+)
+from storage.ingestion_manifest import (
+    new_manifest_state,
+    checkpoint_manifest,
+    finish_manifest,
+    rewind_manifest,
+    load_manifest_entry,
+    hash_file_range,
+    SKIP,
+    FULL,
+    APPEND,
+    RESUME
+)
+from storage.sinks import new_sink
+from storage.columnar import new_columnar_state, write_columnar, remove_columnar_ingestion
+from transformation.batch import RecordBatch
+from validation.validator import compile_schema
 
 
 class TestDatabaseFunctions:
@@ -40,11 +83,11 @@ class TestDatabaseFunctions:
         # Verify that create_all was called on the metadata
         mock_engine.assert_has_calls([])  # The actual call happens inside SQLAlchemy
 
-    @patch("storage.database.create_engine")
+    @patch("storage.database.get_engine")
     @patch("storage.database.sessionmaker")
-    def test_insert_clean_records(self, mock_sessionmaker, mock_create_engine):
+    def test_insert_clean_records(self, mock_sessionmaker, mock_get_engine):
         mock_engine = MagicMock()
-        mock_create_engine.return_value = mock_engine
+        mock_get_engine.return_value = mock_engine
 
         mock_session = MagicMock()
         mock_sessionmaker.return_value = mock_session
@@ -73,11 +116,11 @@ class TestDatabaseFunctions:
             # Just verify that the function completed without error
             mock_loan.assert_called_once()
 
-    @patch("storage.database.create_engine")
+    @patch("storage.database.get_engine")
     @patch("storage.database.sessionmaker")
-    def test_insert_clean_records_invalid_data(self, mock_sessionmaker, mock_create_engine):
+    def test_insert_clean_records_invalid_data(self, mock_sessionmaker, mock_get_engine):
         mock_engine = MagicMock()
-        mock_create_engine.return_value = mock_engine
+        mock_get_engine.return_value = mock_engine
 
         mock_session = MagicMock()
         mock_sessionmaker.return_value = mock_session
@@ -100,11 +143,11 @@ class TestDatabaseFunctions:
         with pytest.raises((KeyError, ValueError)):
             insert_clean_records(records)
 
-    @patch("storage.database.create_engine")
+    @patch("storage.database.get_engine")
     @patch("storage.database.sessionmaker")
-    def test_insert_rejected_records(self, mock_sessionmaker, mock_create_engine):
+    def test_insert_rejected_records(self, mock_sessionmaker, mock_get_engine):
         mock_engine = MagicMock()
-        mock_create_engine.return_value = mock_engine
+        mock_get_engine.return_value = mock_engine
 
         mock_session = MagicMock()
         mock_sessionmaker.return_value = mock_session
@@ -134,11 +177,11 @@ class TestDatabaseFunctions:
             # Just verify that the function completed without error
             mock_rejected_loan.assert_called_once()
 
-    @patch("storage.database.create_engine")
+    @patch("storage.database.get_engine")
     @patch("storage.database.sessionmaker")
-    def test_insert_rejected_records_minimal_data(self, mock_sessionmaker, mock_create_engine):
+    def test_insert_rejected_records_minimal_data(self, mock_sessionmaker, mock_get_engine):
         mock_engine = MagicMock()
-        mock_create_engine.return_value = mock_engine
+        mock_get_engine.return_value = mock_engine
 
         mock_session = MagicMock()
         mock_sessionmaker.return_value = mock_session
@@ -160,4 +203,838 @@ class TestDatabaseFunctions:
             insert_rejected_records(records)
 
             # Just verify that the function completed without error
-            mock_rejected_loan.assert_called_once()
\ No newline at end of file
+            mock_rejected_loan.assert_called_once()
+
+
+def remove_sqlite_files(path):
+    dispose_engine()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+
+
+class TestSharedEngine:
+    def setup_method(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        self.temp_db.close()
+        self.db_path = f"sqlite:///{self.temp_db.name}"
+
+    def teardown_method(self):
+        remove_sqlite_files(self.temp_db.name)
+
+    def test_engine_and_session_factory_are_reused(self):
+        with patch("storage.database.DB_PATH", self.db_path):
+            assert get_engine() is get_engine()
+            assert get_session_factory() is get_session_factory()
+
+    def test_engine_rebuilt_when_url_changes(self):
+        with patch("storage.database.DB_PATH", self.db_path):
+            first = get_engine()
+        with patch("storage.database.DB_PATH", "sqlite:///:memory:"):
+            assert get_engine() is not first
+
+    def test_sqlite_pragmas_applied(self):
+        with patch("storage.database.DB_PATH", self.db_path), \
+             patch.dict("storage.database.SQLITE_PRAGMAS", {"synchronous": "OFF"}):
+            with get_engine().connect() as connection:
+                journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+                synchronous = connection.exec_driver_sql("PRAGMA synchronous").scalar()
+
+        assert journal_mode == "wal"
+        assert synchronous == 0
+
+    def test_create_tables_runs_once_per_engine(self):
+        with patch("storage.database.DB_PATH", self.db_path):
+            with patch("storage.database.Base.metadata.create_all") as mock_create_all:
+                create_tables()
+                create_tables()
+
+        mock_create_all.assert_called_once()
+
+    def test_create_tables_migrates_rejected_loans_keyed_by_loan_id(self):
+        with patch("storage.database.DB_PATH", self.db_path):
+            with get_engine().begin() as connection:
+                connection.exec_driver_sql(
+                    "CREATE TABLE rejected_loans (loan_id VARCHAR PRIMARY KEY, borrower_name VARCHAR, "
+                    "loan_amount FLOAT, loan_status VARCHAR, open_date VARCHAR, client_id VARCHAR, "
+                    "ingestion_id VARCHAR, ingestion_timestamp VARCHAR, rejection_reason VARCHAR)"
+                )
+                connection.exec_driver_sql(
+                    "INSERT INTO rejected_loans (loan_id, client_id, rejection_reason) "
+                    "VALUES ('L1', 'TEST', 'Invalid number for field: loan_amount')"
+                )
+
+            create_tables()
+            bulk_insert_rejected_records([{"loan_id": "L1", "client_id": "TEST", "rejection_reason": "again"}])
+
+            with get_engine().connect() as connection:
+                rows = connection.exec_driver_sql(
+                    "SELECT id, loan_id, rejection_reason FROM rejected_loans ORDER BY id"
+                ).fetchall()
+                tables = connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").scalars()
+                migrating = [name for name in tables if name.endswith("_migrating")]
+            dispose_engine()
+
+        assert [tuple(row) for row in rows] == [
+            (1, "L1", "Invalid number for field: loan_amount"),
+            (2, "L1", "again")
+        ]
+        assert migrating == []
+
+    def test_configure_engine_rejects_unknown_pragma(self):
+        with pytest.raises(ValueError, match="Unsupported SQLite pragma"):
+            configure_engine(sqlite_pragmas={"foreign_keys": "ON"})
+
+    def test_configure_engine_rejects_unsafe_value(self):
+        with pytest.raises(ValueError, match="Invalid value"):
+            configure_engine(sqlite_pragmas={"journal_mode": "WAL; DROP TABLE loans"})
+
+
+class TestBulkInsert:
+    def setup_method(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        self.temp_db.close()
+        self.db_path = f"sqlite:///{self.temp_db.name}"
+
+    def teardown_method(self):
+        remove_sqlite_files(self.temp_db.name)
+
+    def clean_record(self, loan_id):
+        return {
+            "loan_id": loan_id,
+            "borrower_name": "John Doe",
+            "loan_amount": "15000.0",
+            "loan_status": "ACTIVE",
+            "open_date": "2024-05-01",
+            "client_id": "TEST_CLIENT",
+            "ingestion_id": "INGEST_001",
+            "ingestion_timestamp": "2024-01-01T00:00:00"
+        }
+
+    def test_bulk_insert_clean_records(self):
+        records = [self.clean_record(f"L{i:03d}") for i in range(7)]
+
+        with patch("storage.database.DB_PATH", self.db_path):
+            create_tables()
+            stats = bulk_insert_clean_records(records, batch_size=3)
+
+            with get_engine().connect() as connection:
+                rows = connection.execute(Loan.__table__.select()).fetchall()
+
+        assert stats["rows"] == 7
+        assert stats["table"] == "loans"
+        assert stats["rows_per_sec"] > 0
+        assert len(rows) == 7
+        assert rows[0].loan_amount == 15000.0
+        assert rows[0].open_date == datetime(2024, 5, 1).date()
+
+    def test_bulk_insert_rejected_records_joins_errors(self):
+        records = [
+            {"loan_id": None, "loan_amount": "abc", "errors": ["Missing required field: loan_id", "Invalid number for field: loan_amount"]}
+        ]
+
+        with patch("storage.database.DB_PATH", self.db_path):
+            create_tables()
+            stats = bulk_insert_rejected_records(records)
+
+            with get_engine().connect() as connection:
+                row = connection.execute(RejectedLoan.__table__.select()).fetchone()
+
+        assert stats["rows"] == 1
+        assert row.loan_id is None
+        assert row.rejection_reason == "Missing required field: loan_id; Invalid number for field: loan_amount"
+
+    def test_bulk_insert_rejected_records_keeps_every_row(self):
+        records = [
+            {"loan_id": "L001", "ingestion_id": "INGEST_001", "errors": ["Missing required field: borrower_name"]},
+            {"loan_id": "L001", "ingestion_id": "INGEST_001", "errors": ["Duplicate value 'L001' for field: loan_id"]},
+            {"loan_id": None, "ingestion_id": "INGEST_001", "errors": ["Missing required field: loan_id"]},
+            {"loan_id": None, "ingestion_id": "INGEST_002", "errors": ["Missing required field: loan_id"]}
+        ]
+
+        with patch("storage.database.DB_PATH", self.db_path):
+            create_tables()
+            bulk_insert_rejected_records(records[:2])
+            bulk_insert_rejected_records(records[2:])
+
+            with get_engine().connect() as connection:
+                rows = connection.execute(RejectedLoan.__table__.select().order_by(RejectedLoan.id)).fetchall()
+
+        assert [(row.loan_id, row.rejection_reason) for row in rows] == [
+            (record["loan_id"], record["errors"][0]) for record in records
+        ]
+
+    def test_bulk_insert_typed_timestamp(self):
+        stamped = datetime(2024, 1, 1, 12, 30, tzinfo=UTC)
+        clean = dict(self.clean_record("L001"), ingestion_timestamp=stamped)
+        rejected = {"loan_id": "L002", "ingestion_timestamp": stamped, "errors": ["Missing required field: borrower_name"]}
+
+        with patch("storage.database.DB_PATH", self.db_path):
+            create_tables()
+            bulk_insert_clean_records([clean])
+            bulk_insert_rejected_records([rejected])
+
+            with get_engine().connect() as connection:
+                loan = connection.execute(Loan.__table__.select()).fetchone()
+                rejected_row = connection.execute(RejectedLoan.__table__.select()).fetchone()
+
+        assert loan.ingestion_timestamp == datetime(2024, 1, 1, 12, 30)
+        assert rejected_row.ingestion_timestamp == "2024-01-01T12:30:00+00:00"
+
+    def test_bulk_insert_invalid_batch_size(self):
+        with patch("storage.database.DB_PATH", self.db_path), \
+                patch("storage.database.get_engine") as mock_get_engine:
+            with pytest.raises(ValueError, match="Batch size"):
+                bulk_insert_clean_records([self.clean_record("L001")], batch_size=0)
+            with pytest.raises(ValueError, match="Batch size"):
+                bulk_insert_rejected_records([{"loan_id": "L001"}], batch_size=0, write_mode="upsert")
+
+        # rejected before any engine or transaction is opened
+        mock_get_engine.assert_not_called()
+
+
+class TestCheckpoints:
+    def setup_method(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        self.temp_db.close()
+        self.db_path = f"sqlite:///{self.temp_db.name}"
+
+    def teardown_method(self):
+        remove_sqlite_files(self.temp_db.name)
+
+    def clean_record(self, loan_id):
+        return {
+            "loan_id": loan_id,
+            "borrower_name": "John Doe",
+            "loan_amount": 1000.0,
+            "loan_status": "ACTIVE",
+            "open_date": "2024-05-01",
+            "client_id": "TEST_CLIENT",
+            "ingestion_id": "INGEST_001",
+            "ingestion_timestamp": "2024-01-01T00:00:00"
+        }
+
+    def store(self, loan_ids, checkpoint):
+        with write_transaction() as connection:
+            bulk_insert_clean_records([self.clean_record(loan_id) for loan_id in loan_ids], connection=connection)
+            checkpoint = advance_checkpoint(checkpoint, len(loan_ids), 0)
+            write_checkpoint(connection, checkpoint)
+        return checkpoint
+
+    def count_loans(self):
+        with get_engine().connect() as connection:
+            return len(connection.execute(Loan.__table__.select()).fetchall())
+
+    def test_checkpoint_commits_with_its_rows(self):
+        with patch("storage.database.DB_PATH", self.db_path):
+            create_tables()
+            checkpoint = new_checkpoint("INGEST_001", "TEST_CLIENT", "loans.csv")
+            checkpoint = self.store(["L1", "L2"], checkpoint)
+            self.store(["L3"], checkpoint)
+
+            stored = load_checkpoint("INGEST_001")
+
+        assert stored["status"] == "in_progress"
+        assert stored["commits"] == 2
+        assert stored["rows"] == 3
+        assert stored["clean_rows"] == 3
+
+    def test_failed_write_rolls_back_rows_and_checkpoint(self):
+        from sqlalchemy.exc import IntegrityError
+
+        with patch("storage.database.DB_PATH", self.db_path):
+            create_tables()
+            checkpoint = new_checkpoint("INGEST_001", "TEST_CLIENT", "loans.csv")
+            checkpoint = self.store(["L1"], checkpoint)
+            with pytest.raises(IntegrityError):
+                self.store(["L2", "L1"], checkpoint)
+
+            stored = load_checkpoint("INGEST_001")
+            loans = self.count_loans()
+
+        assert stored["rows"] == 1
+        assert loans == 1
+
+    def test_rollback_deletes_rows_of_interrupted_ingestion(self):
+        with patch("storage.database.DB_PATH", self.db_path):
+            create_tables()
+            checkpoint = new_checkpoint("INGEST_001", "TEST_CLIENT", "loans.csv")
+            self.store(["L1", "L2"], checkpoint)
+
+            result = rollback_ingestion("INGEST_001")
+            loans = self.count_loans()
+
+            with pytest.raises(ValueError, match="rolled_back"):
+                rollback_ingestion("INGEST_001")
+
+        assert result["deleted"]["loans"] == 2
+        assert result["status"] == "rolled_back"
+        assert loans == 0
+
+    def test_rollback_restores_loans_an_upsert_replaced(self):
+        with patch("storage.database.DB_PATH", self.db_path):
+            create_tables()
+            self.store(["L1", "L2"], new_checkpoint("INGEST_001", "TEST_CLIENT", "loans.csv"))
+
+            rerun = [dict(self.clean_record(loan_id), ingestion_id="INGEST_002", loan_status="CLOSED") for loan_id in ("L1", "L3")]
+            sink = new_sink(write_mode="upsert")
+            sink.write_batch(rerun, [])
+            sink.write_checkpoint(advance_checkpoint(new_checkpoint("INGEST_002", "TEST_CLIENT", "loans.csv"), 2, 0))
+            sink.commit()
+
+            result = rollback_ingestion("INGEST_002")
+            with get_engine().connect() as connection:
+                loans = connection.execute(Loan.__table__.select().order_by(Loan.loan_id)).fetchall()
+                replaced = connection.execute(ReplacedLoan.__table__.select()).fetchall()
+
+        assert result["deleted"] == {"loans": 2, "rejected_loans": 0, "restored_loans": 1}
+        assert [(row.loan_id, row.loan_status, row.ingestion_id) for row in loans] == [
+            ("L1", "ACTIVE", "INGEST_001"),
+            ("L2", "ACTIVE", "INGEST_001")
+        ]
+        assert replaced == []
+
+    def test_completed_ingestion_forgets_replaced_loans(self):
+        with patch("storage.database.DB_PATH", self.db_path):
+            create_tables()
+            self.store(["L1"], new_checkpoint("INGEST_001", "TEST_CLIENT", "loans.csv"))
+
+            checkpoint = new_checkpoint("INGEST_002", "TEST_CLIENT", "loans.csv")
+            sink = new_sink(write_mode="upsert", conflict_policy="replace")
+            sink.write_batch([dict(self.clean_record("L1"), ingestion_id="INGEST_002")], [])
+            sink.write_checkpoint(advance_checkpoint(checkpoint, 1, 0))
+            sink.commit()
+            with get_engine().connect() as connection:
+                saved = len(connection.execute(ReplacedLoan.__table__.select()).fetchall())
+
+            sink.write_checkpoint({**checkpoint, "status": "complete"})
+            sink.commit()
+            with get_engine().connect() as connection:
+                kept = len(connection.execute(ReplacedLoan.__table__.select()).fetchall())
+
+        assert (saved, kept) == (1, 0)
+
+    def test_rollback_refuses_complete_ingestion(self):
+        with patch("storage.database.DB_PATH", self.db_path):
+            create_tables()
+            checkpoint = new_checkpoint("INGEST_001", "TEST_CLIENT", "loans.csv")
+            checkpoint = self.store(["L1"], checkpoint)
+            checkpoint["status"] = "complete"
+            with write_transaction() as connection:
+                write_checkpoint(connection, checkpoint)
+
+            with pytest.raises(ValueError, match="complete"):
+                rollback_ingestion("INGEST_001")
+            with pytest.raises(ValueError, match="No checkpoint"):
+                rollback_ingestion("INGEST_999")
+
+            loans = self.count_loans()
+
+        assert loans == 1
+
+    def test_insert_with_commit_size_commits_in_slices(self):
+        records = [self.clean_record(f"L{i}") for i in range(5)]
+        records[4]["loan_id"] = "L0"
+
+        with patch("storage.database.DB_PATH", self.db_path):
+            create_tables()
+            with pytest.raises(Exception):
+                insert_clean_records(records, commit_size=2)
+
+            loans = self.count_loans()
+
+        # the first two slices were committed before the duplicate failed
+        assert loans == 4
+
+
+class TestUpsert:
+    def setup_method(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix=".db")
+        self.temp_db.close()
+        self.db_path = f"sqlite:///{self.temp_db.name}"
+        self.records = [
+            {
+                "loan_id": f"L00{i}",
+                "borrower_name": "John Doe",
+                "loan_amount": 1000.0 * i,
+                "loan_status": "ACTIVE",
+                "open_date": "2024-05-01",
+                "client_id": "TEST_CLIENT",
+                "ingestion_id": "INGEST_001",
+                "ingestion_timestamp": "2024-01-01T00:00:00"
+            }
+            for i in range(1, 4)
+        ]
+
+    def teardown_method(self):
+        remove_sqlite_files(self.temp_db.name)
+
+    def rerun(self, conflict_policy):
+        rerun_records = [dict(r, ingestion_id="INGEST_002") for r in self.records]
+        rerun_records[0]["loan_status"] = "CLOSED"
+
+        with patch("storage.database.DB_PATH", self.db_path):
+            create_tables()
+            bulk_insert_clean_records(self.records)
+            stats = bulk_insert_clean_records(
+                rerun_records, write_mode="upsert", conflict_policy=conflict_policy
+            )
+
+            with get_engine().connect() as connection:
+                rows = connection.execute(Loan.__table__.select().order_by(Loan.loan_id)).fetchall()
+
+        return stats, rows
+
+    def test_upsert_changed_only_updates_changed_rows(self):
+        stats, rows = self.rerun("changed")
+
+        assert stats["rows"] == 3
+        assert stats["written"] == 1
+        assert rows[0].loan_status == "CLOSED"
+        assert rows[0].ingestion_id == "INGEST_002"
+        assert rows[1].ingestion_id == "INGEST_001"
+
+    def test_upsert_keep_leaves_existing_rows(self):
+        stats, rows = self.rerun("keep")
+
+        assert stats["written"] == 0
+        assert rows[0].loan_status == "ACTIVE"
+
+    def test_upsert_replace_overwrites_all_rows(self):
+        stats, rows = self.rerun("replace")
+
+        assert stats["written"] == 3
+        assert all(row.ingestion_id == "INGEST_002" for row in rows)
+
+    def test_insert_mode_fails_on_duplicate(self):
+        from sqlalchemy.exc import IntegrityError
+
+        with patch("storage.database.DB_PATH", self.db_path):
+            create_tables()
+            bulk_insert_clean_records(self.records)
+            with pytest.raises(IntegrityError):
+                bulk_insert_clean_records(self.records)
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError, match="Unsupported conflict policy"):
+            bulk_insert_clean_records(self.records, write_mode="upsert", conflict_policy="merge")
+
+
+class TestSnapshotDiff:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.patcher = patch("storage.snapshot.SNAPSHOT_DIR", self.temp_dir)
+        self.patcher.start()
+
+    def teardown_method(self):
+        self.patcher.stop()
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def frame(self, rows, ingestion_id="INGEST_001"):
+        return pd.DataFrame([
+            {"loan_id": loan_id, "loan_amount": amount, "ingestion_id": ingestion_id}
+            for loan_id, amount in rows
+        ])
+
+    def test_first_run_everything_new(self):
+        state = new_snapshot_state("TEST_CLIENT")
+        delta = apply_snapshot_diff(state, self.frame([("L1", 100), ("L2", 200)]), pd.DataFrame())
+        disappeared = finish_snapshot(state)
+
+        assert list(delta["loan_id"]) == ["L1", "L2"]
+        assert state["counts"]["new"] == 2
+        assert disappeared == []
+        assert len(load_fingerprint_index("TEST_CLIENT")) == 2
+
+    def test_second_run_classifies_rows(self):
+        state = new_snapshot_state("TEST_CLIENT")
+        apply_snapshot_diff(state, self.frame([("L1", 100), ("L2", 200), ("L3", 300)]), pd.DataFrame())
+        finish_snapshot(state)
+
+        state = new_snapshot_state("TEST_CLIENT")
+        today = self.frame([("L1", 100), ("L2", 250), ("L4", 400)], ingestion_id="INGEST_002")
+        delta = apply_snapshot_diff(state, today.iloc[:2], pd.DataFrame())
+        delta = pd.concat([delta, apply_snapshot_diff(state, today.iloc[2:], pd.DataFrame())])
+        disappeared = finish_snapshot(state)
+
+        assert list(delta["loan_id"]) == ["L2", "L4"]
+        assert state["counts"] == {"new": 1, "changed": 1, "unchanged": 1, "disappeared": 1}
+        assert disappeared == ["L3"]
+
+    def test_fingerprint_ignores_int_float_inference(self):
+        as_int = pd.DataFrame({"loan_id": ["L1"], "days_past_due": [0]}, dtype=object)
+        as_float = pd.DataFrame({"loan_id": ["L1"], "days_past_due": [0.0]}, dtype=object)
+
+        assert fingerprint_rows(as_int).iloc[0] == fingerprint_rows(as_float).iloc[0]
+
+    def test_fingerprint_typed_date_matches_text(self):
+        as_text = pd.DataFrame({"loan_id": ["L1"], "open_date": ["2024-05-01"]}, dtype=object)
+        typed = pd.DataFrame({"loan_id": ["L1"], "open_date": pd.to_datetime(["2024-05-01"])})
+
+        assert fingerprint_rows(as_text).iloc[0] == fingerprint_rows(typed).iloc[0]
+
+    def test_rejected_rows_are_not_disappeared(self):
+        state = new_snapshot_state("TEST_CLIENT")
+        apply_snapshot_diff(state, self.frame([("L1", 100), ("L2", 200)]), pd.DataFrame())
+        finish_snapshot(state)
+
+        state = new_snapshot_state("TEST_CLIENT")
+        apply_snapshot_diff(state, self.frame([("L1", 100)]), pd.DataFrame({"loan_id": ["L2"]}))
+
+        assert finish_snapshot(state) == []
+
+
+class TestLoanIndex:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.patchers = [
+            patch("storage.loan_index.LOAN_INDEX_DIR", self.temp_dir),
+            patch("storage.loan_index.count_stored_loans", return_value=2),
+            patch("storage.loan_index.stored_loan_ids", return_value=["S1", "S2"])
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def teardown_method(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_duplicates_within_and_across_batches(self):
+        state = new_duplicate_state(check_stored=False)
+
+        in_file, stored = find_duplicates(state, pd.Series(["L1", "L2", "L1"]))
+        assert list(in_file) == [False, False, True]
+        assert not stored.any()
+
+        in_file, _ = find_duplicates(state, pd.Series(["L3", "L2"]))
+        assert list(in_file) == [False, True]
+        assert state["counts"] == {"in_file": 2, "stored": 0}
+
+    def test_stored_loan_ids_are_duplicates_in_insert_mode(self):
+        state = new_duplicate_state(check_stored=True)
+
+        in_file, stored = find_duplicates(state, pd.Series(["S1", "L1", "S1"]))
+
+        assert list(stored) == [True, False, False]
+        assert list(in_file) == [False, False, True]
+
+    def test_index_rebuilt_when_out_of_step_with_database(self):
+        assert list(load_loan_index()) == ["S1", "S2"]
+
+        with patch("storage.loan_index.stored_loan_ids", return_value=["S1", "S2", "S3"]) as query:
+            # cached copy matches the row count: no query
+            load_loan_index()
+            query.assert_not_called()
+
+            with patch("storage.loan_index.count_stored_loans", return_value=3):
+                assert list(load_loan_index()) == ["S1", "S2", "S3"]
+
+    def test_finish_adds_stored_ids_to_index(self):
+        state = new_duplicate_state(check_stored=True)
+        find_duplicates(state, pd.Series(["L1"]))
+        record_stored(state, ["L1"])
+        finish_duplicates(state)
+
+        with patch("storage.loan_index.count_stored_loans", return_value=3):
+            assert sorted(load_loan_index()) == ["L1", "S1", "S2"]
+
+    def test_finish_merges_ids_saved_by_concurrent_runs(self):
+        first = new_duplicate_state(check_stored=True)
+        second = new_duplicate_state(check_stored=True)
+        find_duplicates(first, pd.Series(["L1"]))
+        find_duplicates(second, pd.Series(["L2"]))
+        record_stored(first, ["L1"])
+        record_stored(second, ["L2"])
+
+        finish_duplicates(first)
+        finish_duplicates(second)
+
+        with patch("storage.loan_index.count_stored_loans", return_value=4):
+            assert sorted(load_loan_index()) == ["L1", "L2", "S1", "S2"]
+
+    def test_find_stored_since_checks_the_database(self):
+        state = new_duplicate_state(check_stored=True)
+
+        with patch("storage.loan_index.find_stored_loan_ids", return_value=["L2"]) as query:
+            stored = find_stored_since(state, pd.Series(["L1", "L2"]))
+
+        query.assert_called_once_with(["L1", "L2"])
+        assert list(stored) == [False, True]
+        assert state["counts"]["stored"] == 1
+
+
+class TestIngestionManifest:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.patcher = patch("storage.ingestion_manifest.MANIFEST_DIR", os.path.join(self.temp_dir, "manifest"))
+        self.patcher.start()
+        self.file_path = os.path.join(self.temp_dir, "loans.csv")
+        self.write("id,amount\nL1,100\nL2,200\n")
+
+    def teardown_method(self):
+        self.patcher.stop()
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, text: str, mode: str = "w"):
+        with open(self.file_path, mode) as f:
+            f.write(text)
+
+    def ingest(self, ingestion_id: str):
+        """
+        Checkpoint every remaining line as its own chunk, then finish.
+        """
+        state = new_manifest_state("TEST_CLIENT", self.file_path, ingestion_id)
+        position = state["start"]
+        with open(self.file_path, "rb") as f:
+            f.seek(position)
+            for line in f:
+                position += len(line)
+                checkpoint_manifest(state, position, 1, hash_file_range(self.file_path, 0, position))
+        finish_manifest(state)
+        return state
+
+    def test_new_file_is_read_in_full_after_its_header(self):
+        state = new_manifest_state("TEST_CLIENT", self.file_path, "INGEST_001")
+
+        assert state["action"] == FULL
+        assert state["start"] == len("id,amount\n")
+        assert state["previous"] is None
+
+    def test_unchanged_file_is_skipped_without_hashing(self):
+        self.ingest("INGEST_001")
+
+        with patch("storage.ingestion_manifest.hash_file_range") as hash_range:
+            state = new_manifest_state("TEST_CLIENT", self.file_path, "INGEST_002")
+
+        assert state["action"] == SKIP
+        assert state["previous"]["ingestion_id"] == "INGEST_001"
+        hash_range.assert_not_called()
+
+    def test_appended_file_reads_only_the_tail(self):
+        first = self.ingest("INGEST_001")
+        self.write("L3,300\n", mode="a")
+
+        state = new_manifest_state("TEST_CLIENT", self.file_path, "INGEST_002")
+
+        assert state["action"] == APPEND
+        assert state["start"] == first["size"]
+        assert state["rows"] == 2
+        assert state["checkpoints"][-1]["ingestion_id"] == "INGEST_001"
+        assert state["checkpoints"][-1]["rows"] == [1, 2]
+        assert state["checkpoints"][-1]["bytes"] == [17, 24]
+
+    def test_interrupted_run_resumes_after_last_checkpoint(self):
+        state = new_manifest_state("TEST_CLIENT", self.file_path, "INGEST_001")
+        checkpoint_manifest(state, 17, 1, hash_file_range(self.file_path, 0, 17))
+
+        resumed = new_manifest_state("TEST_CLIENT", self.file_path, "INGEST_002")
+
+        assert resumed["action"] == RESUME
+        assert resumed["start"] == 17
+        assert resumed["rows"] == 1
+
+    def test_rewind_forgets_rolled_back_checkpoints(self):
+        state = new_manifest_state("TEST_CLIENT", self.file_path, "INGEST_001")
+        checkpoint_manifest(state, 17, 1, hash_file_range(self.file_path, 0, 17))
+        state["ingestion_id"] = "INGEST_002"
+        checkpoint_manifest(state, 24, 1, hash_file_range(self.file_path, 0, 24))
+
+        rewind_manifest("TEST_CLIENT", self.file_path, "INGEST_002")
+        entry = load_manifest_entry("TEST_CLIENT", self.file_path)
+
+        assert entry["committed_bytes"] == 17
+        assert [c["ingestion_id"] for c in entry["checkpoints"]] == ["INGEST_001"]
+
+        rewind_manifest("TEST_CLIENT", self.file_path, "INGEST_001")
+        assert load_manifest_entry("TEST_CLIENT", self.file_path) is None
+
+    def test_rewritten_file_is_read_in_full(self):
+        self.ingest("INGEST_001")
+        self.write("id,amount\nL1,999\nL2,200\nL3,300\n")
+
+        state = new_manifest_state("TEST_CLIENT", self.file_path, "INGEST_002")
+
+        assert state["action"] == FULL
+        assert state["rows"] == 0
+
+
+class TestStorageSinks:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.records = [
+            {
+                "loan_id": f"L00{i}",
+                "borrower_name": "John Doe",
+                "loan_amount": 1000.0 * i,
+                "loan_status": "ACTIVE",
+                "open_date": "2024-05-01",
+                "client_id": "TEST_CLIENT",
+                "ingestion_id": "INGEST_001",
+                "ingestion_timestamp": "2024-01-01T00:00:00"
+            }
+            for i in range(1, 4)
+        ]
+        self.rejected = [{"loan_id": "L009", "errors": ["Missing required field: borrower_name"]}]
+
+    def teardown_method(self):
+        dispose_engine()
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def stored_loans(self):
+        with get_engine().connect() as connection:
+            return connection.execute(Loan.__table__.select().order_by(Loan.loan_id)).fetchall()
+
+    def test_orm_and_bulk_sinks_store_the_same_rows(self):
+        rerun_records = [dict(r, ingestion_id="INGEST_002") for r in self.records]
+        rerun_records[0]["loan_status"] = "CLOSED"
+        results = {}
+
+        for name in ("orm", "bulk"):
+            with patch("storage.database.DB_PATH", f"sqlite:///{os.path.join(self.temp_dir, name)}.db"):
+                sink = new_sink(name)
+                sink.open()
+                sink.write_batch(self.records, self.rejected)
+                sink.commit()
+
+                upsert = new_sink(name, write_mode="upsert", conflict_policy="changed")
+                loads = upsert.write_batch(rerun_records, self.rejected)
+                upsert.commit()
+                results[name] = ([stats["written"] for stats in loads], [tuple(row) for row in self.stored_loans()])
+
+        assert results["orm"] == results["bulk"]
+        written, rows = results["orm"]
+        assert written == [1, 1]
+        assert [(row[0], row[3], row[6]) for row in rows][:2] == [
+            ("L001", "CLOSED", "INGEST_002"),
+            ("L002", "ACTIVE", "INGEST_001")
+        ]
+
+    def test_rollback_discards_rows_and_checkpoint(self):
+        with patch("storage.database.DB_PATH", f"sqlite:///{os.path.join(self.temp_dir, 'sink.db')}"):
+            sink = new_sink()
+            sink.open()
+            sink.write_batch(self.records, self.rejected)
+            sink.write_checkpoint(advance_checkpoint(new_checkpoint("INGEST_001", "TEST_CLIENT", "loans.csv"), 3, 1))
+            sink.rollback()
+
+            assert self.stored_loans() == []
+            assert load_checkpoint("INGEST_001") is None
+
+    def test_unknown_sink_or_policy(self):
+        with pytest.raises(ValueError, match="Unsupported storage sink"):
+            new_sink("parquet")
+        with pytest.raises(ValueError, match="Unsupported conflict policy"):
+            new_sink("bulk", write_mode="upsert", conflict_policy="merge")
+
+    def test_duckdb_sink_loads_a_batch(self):
+        pytest.importorskip("duckdb_engine")
+        stamped = datetime(2024, 1, 2, 3, 4, 5, tzinfo=UTC)
+        batch = RecordBatch(
+            pd.DataFrame(self.records).drop(columns=["client_id", "ingestion_id", "ingestion_timestamp"])
+            .assign(open_date=pd.to_datetime("2024-05-01")),
+            {"client_id": "TEST_CLIENT", "ingestion_id": "INGEST_001", "ingestion_timestamp": stamped}
+        )
+
+        with patch("storage.database.DB_PATH", f"duckdb:///{os.path.join(self.temp_dir, 'sink.duckdb')}"):
+            sink = new_sink("duckdb", write_mode="upsert")
+            sink.open()
+            loads = sink.write_batch(batch, self.rejected)
+            sink.commit()
+            rows = self.stored_loans()
+
+        assert [stats["rows"] for stats in loads] == [3, 1]
+        assert rows[0].open_date == datetime(2024, 5, 1).date()
+        assert rows[0].ingestion_timestamp == datetime(2024, 1, 2, 3, 4, 5)
+
+
+class TestColumnarSink:
+    SCHEMA = {"fields": {
+        "loan_id": {"type": "string", "required": True},
+        "loan_amount": {"type": "number", "required": True},
+        "loan_status": {"type": "string", "allowed_values": ["ACTIVE", "CLOSED"]},
+        "origination_date": {"type": "date", "required": True}
+    }}
+
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.metadata = {
+            "client_id": "TEST_CLIENT",
+            "ingestion_id": "INGEST_001",
+            "ingestion_timestamp": datetime(2024, 1, 2, 3, 4, 5, tzinfo=UTC)
+        }
+        self.partition = os.path.join(self.temp_dir, "loans", "client_id=TEST_CLIENT", "ingestion_date=2024-01-02")
+
+    def teardown_method(self):
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def batches(self):
+        clean = RecordBatch(pd.DataFrame({
+            "loan_id": ["L1", "L2"],
+            "loan_amount": [100.0, None],
+            "loan_status": ["ACTIVE", "CLOSED"],
+            "origination_date": pd.to_datetime(["2024-01-01", "2023-06-30"])
+        }), self.metadata)
+        rejected = RecordBatch(pd.DataFrame({
+            "loan_id": ["L3"],
+            "loan_amount": ["abc"],
+            "loan_status": ["ACTIVE"],
+            "origination_date": ["2024-01-01"],
+            "errors": [["Invalid number for field: loan_amount"]]
+        }), self.metadata)
+        return clean, rejected
+
+    def test_rejects_unknown_format_or_codec(self):
+        with pytest.raises(ValueError):
+            new_columnar_state("TEST_CLIENT", "orc", directory=self.temp_dir)
+        with pytest.raises(ValueError):
+            new_columnar_state("TEST_CLIENT", "arrow", "snappy", directory=self.temp_dir)
+
+    def test_parquet_parts_are_typed_partitioned_and_appended(self):
+        pq = pytest.importorskip("pyarrow.parquet")
+        state = new_columnar_state("TEST_CLIENT", "parquet", "zstd", directory=self.temp_dir)
+        compiled_schema = compile_schema(self.SCHEMA)
+
+        paths = write_columnar(state, *self.batches(), compiled_schema)
+        paths += write_columnar(state, *self.batches(), compiled_schema)
+
+        assert paths[0] == os.path.join(self.partition, "INGEST_001-00000.parquet")
+        assert paths[2] == os.path.join(self.partition, "INGEST_001-00001.parquet")
+        assert "rejected_loans" in paths[1]
+
+        table = pq.read_table(paths[0])
+        assert "client_id" not in table.column_names
+        assert str(table.schema.field("origination_date").type) == "date32[day]"
+        assert table.column("loan_amount").to_pylist() == [100.0, None]
+        assert pq.ParquetFile(paths[0]).metadata.row_group(0).column(0).compression == "ZSTD"
+        assert pq.read_table(paths[1]).column("errors").to_pylist() == [["Invalid number for field: loan_amount"]]
+
+        # a resumed ingestion carries on numbering its parts
+        resumed = new_columnar_state("TEST_CLIENT", "parquet", directory=self.temp_dir)
+        path = write_columnar(resumed, self.batches()[0], RecordBatch(pd.DataFrame(), self.metadata), compiled_schema)[0]
+        assert path.endswith("INGEST_001-00002.parquet")
+
+    def test_arrow_files_dictionary_encode_allowed_values(self):
+        pa = pytest.importorskip("pyarrow")
+        state = new_columnar_state("TEST_CLIENT", "arrow", "lz4", directory=self.temp_dir)
+
+        path = write_columnar(state, *self.batches(), compile_schema(self.SCHEMA))[0]
+
+        with pa.OSFile(path, "rb") as source:
+            table = pa.ipc.open_file(source).read_all()
+        assert pa.types.is_dictionary(table.schema.field("loan_status").type)
+        assert pa.types.is_dictionary(table.schema.field("ingestion_id").type)
+        assert table.column("loan_status").to_pylist() == ["ACTIVE", "CLOSED"]
+
+    def test_remove_ingestion_deletes_only_its_parts(self):
+        os.makedirs(self.partition)
+        for name in ("INGEST_001-00000.parquet", "INGEST_001-00001.parquet", "INGEST_002-00000.parquet"):
+            open(os.path.join(self.partition, name), "w").close()
+
+        assert remove_columnar_ingestion("TEST_CLIENT", "INGEST_001", self.temp_dir) == 2
+        assert os.listdir(self.partition) == ["INGEST_002-00000.parquet"]
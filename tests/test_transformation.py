@@ -1,12 +1,30 @@
 import pytest
+import pandas as pd
 from datetime import datetime
+from unittest.mock import patch
 from transformation.transformer import (
     convert_format_string,
     apply_mapping,
     normalize_status,
     normalize_date,
     add_metadata,
-    transform_records
+    transform_records,
+    clean_frame,
+    apply_mapping_frame,
+    transform_frame,
+    CompiledClientPlan,
+    get_client_plan,
+    config_fingerprint
+)
+from transformation.batch import RecordBatch
+from transformation.dates import (
+    compile_date_formats,
+    compile_date_layout,
+    infer_date_formats,
+    parse_date,
+    parse_date_column,
+    parse_with_layout,
+    explain_date_failure
 )
 
 
@@ -100,6 +118,13 @@ class TestNormalizeDate:
         result = normalize_date(record, client_config)
         assert result["open_date"] is None
 
+    def test_normalize_date_missing_value(self):
+        record = {"open_date": None}
+        client_config = {"date_formats": ["YYYY-MM-DD"]}
+
+        result = normalize_date(record, client_config)
+        assert result["open_date"] is None
+
     def test_normalize_date_no_date_field(self):
         record = {"other_field": "value"}
         client_config = {"date_formats": ["YYYY-MM-DD"]}
@@ -108,6 +133,109 @@ class TestNormalizeDate:
         assert result == record
 
 
+    def test_normalize_date_all_date_fields(self):
+        record = {"open_date": "05/01/2024", "close_date": "06/02/2025", "last_payment_date": None}
+        client_config = {"date_formats": ["MM/DD/YYYY"]}
+
+        result = normalize_date(record, client_config)
+        assert result["open_date"] == "2024-05-01"
+        assert result["close_date"] == "2025-06-02"
+        assert result["last_payment_date"] is None
+
+
+class TestDateParsing:
+    def test_compile_date_formats_is_cached(self):
+        first = compile_date_formats(("YYYY-MM-DD", "MM/DD/YYYY"))
+        second = compile_date_formats(("YYYY-MM-DD", "MM/DD/YYYY"))
+
+        assert [spec["layout"] for spec in first] == ["YYYY-MM-DD", "MM/DD/YYYY"]
+        assert first is second
+
+    def test_parse_date_repeated_value(self):
+        assert parse_date("12/31/2024", ["MM/DD/YYYY"]) == "2024-12-31"
+        assert parse_date("12/31/2024", ["MM/DD/YYYY"]) == "2024-12-31"
+        assert parse_date("bad", ["MM/DD/YYYY"]) is None
+
+    def test_parse_date_column_reuses_cached_dates(self):
+        formats = ["DD.MM.YYYY"]
+        values = pd.Series(["31.12.2024", "bad", "31.12.2024"], dtype=object)
+        assert parse_date("01.05.2024", formats) == "2024-05-01"
+        assert parse_date_column(values, formats).tolist() == ["2024-12-31", None, "2024-12-31"]
+
+        # dates parsed by either path are not parsed again
+        with patch("transformation.dates.compile_date_formats") as compile_formats:
+            result = parse_date_column(pd.Series(["01.05.2024", "bad", "31.12.2024"], dtype=object), formats)
+            assert parse_date("31.12.2024", formats) == "2024-12-31"
+
+        compile_formats.assert_not_called()
+        assert result.tolist() == ["2024-05-01", None, "2024-12-31"]
+
+    def test_date_cache_is_bounded(self):
+        formats = ["YYYY/MM/DD"]
+
+        with patch("transformation.dates.DATE_CACHE_SIZE", 2):
+            parse_date_column(pd.Series(["2024/01/01", "2024/01/02", "2024/01/03"], dtype=object), formats)
+            parse_date("2024/01/04", formats)
+
+            with patch("transformation.dates.compile_date_formats", wraps=compile_date_formats) as compile_formats:
+                assert parse_date("2024/01/01", formats) == "2024-01-01"
+
+        compile_formats.assert_called_once()
+
+    def test_infer_date_formats_puts_dominant_first(self):
+        values = ["25/12/2024", "13/01/2024", "01/02/2024", None]
+        formats = ["MM/DD/YYYY", "DD/MM/YYYY"]
+
+        ordered = infer_date_formats(values, formats)
+
+        assert ordered == ["DD/MM/YYYY", "MM/DD/YYYY"]
+        # an ambiguous date follows the file's dominant layout
+        assert parse_date("01/02/2024", ordered) == "2024-02-01"
+
+    def test_infer_date_formats_keeps_order_on_tie(self):
+        assert infer_date_formats([], ["YYYY-MM-DD", "MM/DD/YYYY"]) == ["YYYY-MM-DD", "MM/DD/YYYY"]
+
+
+class TestDateLayouts:
+    def test_single_letter_layout_parses(self):
+        # M/D/YYYY used to become %-m/%-d/%Y, which strptime rejects
+        assert parse_date("5/1/2024", ["M/D/YYYY"]) == "2024-05-01"
+
+    def test_strict_day_and_month_ranges(self):
+        spec = compile_date_layout("MM/DD/YYYY")
+
+        assert parse_with_layout("02/29/2024", spec) == ("2024-02-29", None)
+        assert parse_with_layout("02/29/2023", spec)[1] == "day 29 out of range for 2023-02 in '02/29/2023' (MM/DD/YYYY)"
+        assert parse_with_layout("13/01/2024", spec)[1] == "month 13 out of range in '13/01/2024' (MM/DD/YYYY)"
+        assert parse_with_layout("05/01/2024 ", spec)[1] == "'05/01/2024 ' does not match layout MM/DD/YYYY"
+
+    def test_two_digit_year_pivot(self):
+        assert parse_date("05/01/24", ["MM/DD/YY"]) == "2024-05-01"
+        assert parse_date("05/01/85", ["MM/DD/YY"]) == "1985-05-01"
+
+    def test_unsupported_layout_falls_back_to_strptime(self):
+        spec = compile_date_layout("%d %b %Y")
+
+        assert spec["regex"] is None
+        assert parse_with_layout("01 May 2024", spec) == ("2024-05-01", None)
+
+    def test_parse_date_column_matches_scalar(self):
+        values = pd.Series(["2024-05-01", "05/01/2024", "02/30/2024", None, "bad", 7], dtype=object)
+        formats = ["YYYY-MM-DD", "MM/DD/YYYY"]
+
+        result = parse_date_column(values, formats)
+
+        assert result.tolist() == [
+            parse_date(value, formats) if isinstance(value, str) else None for value in values
+        ]
+
+    def test_explain_date_failure_lists_each_layout(self):
+        reason = explain_date_failure("2024-13-01", ["YYYY-MM-DD", "MM/DD/YYYY"])
+
+        assert "month 13 out of range" in reason
+        assert "does not match layout MM/DD/YYYY" in reason
+
+
 class TestAddMetadata:
     def test_add_metadata(self):
         record = {"loan_id": "123"}
@@ -118,8 +246,8 @@ class TestAddMetadata:
 
         assert result["client_id"] == "TEST_CLIENT"
         assert result["ingestion_id"] == "INGEST_001"
-        assert "ingestion_timestamp" in result
-        assert isinstance(result["ingestion_timestamp"], str)
+        assert isinstance(result["ingestion_timestamp"], datetime)
+        assert result["ingestion_timestamp"].tzinfo is not None
 
 
 class TestTransformRecords:
@@ -161,6 +289,149 @@ class TestTransformRecords:
         assert record["ingestion_id"] == "INGEST_001"
         assert "ingestion_timestamp" in record
 
+    def test_transform_records_share_one_timestamp(self):
+        records = [{"id": f"L{number}"} for number in range(3)]
+
+        result = transform_records(records, {"id": "loan_id"}, {"client_id": "TEST_CLIENT"}, "INGEST_001")
+
+        assert len({record["ingestion_timestamp"] for record in result}) == 1
+        assert isinstance(result[0]["ingestion_timestamp"], datetime)
+
     def test_transform_records_empty_list(self):
         result = transform_records([], {}, {}, "INGEST_001")
-        assert result == []
\ No newline at end of file
+        assert result == []
+
+
+class TestTransformFrame:
+    def setup_method(self):
+        self.mapping = {
+            "id": "loan_id",
+            "cust_name": "borrower_name",
+            "amt": "loan_amount",
+            "status": "loan_status",
+            "date_opened": "open_date",
+            "not_in_file": "purpose"
+        }
+        self.client_config = {
+            "client_id": "TEST_CLIENT",
+            "status_code_mapping": {"A": "ACTIVE", "C": "CLOSED"},
+            "date_formats": ["YYYY-MM-DD", "MM/DD/YYYY"]
+        }
+
+    def test_clean_frame_nan_and_empty(self):
+        df = pd.DataFrame({"a": [1.5, float("nan")], "b": ["", "x"]})
+
+        result = clean_frame(df)
+        assert result["a"].tolist() == [1.5, None]
+        assert result["b"].tolist() == [None, "x"]
+
+    def test_apply_mapping_frame_missing_source(self):
+        df = pd.DataFrame({"old": ["v1", "v2"], "extra": [1, 2]})
+
+        result = apply_mapping_frame(df, {"old": "new", "missing": "target"})
+        assert list(result.columns) == ["new", "target"]
+        assert result["target"].tolist() == [None, None]
+
+    def test_transform_frame_matches_per_record_path(self):
+        df = pd.DataFrame({
+            "id": ["L001", "L002", "L003", "L004"],
+            "cust_name": ["John Doe", "", "Bob", None],
+            "amt": [15000, 2000, None, 30],
+            "status": ["A", "C", "X", None],
+            "date_opened": ["2024-05-01", "05/01/2024", "bad", None]
+        })
+
+        frame_records = transform_frame(df, self.mapping, self.client_config, "INGEST_001").to_dict(orient="records")
+        row_records = transform_records(df.to_dict(orient="records"), self.mapping, self.client_config, "INGEST_001")
+
+        for record in frame_records + row_records:
+            record.pop("ingestion_timestamp")
+
+        assert frame_records == row_records
+        assert frame_records[1]["open_date"] == "2024-05-01"
+        assert frame_records[2]["loan_status"] == "X"
+        assert frame_records[2]["open_date"] is None
+
+
+class TestCompiledClientPlan:
+    def setup_method(self):
+        self.mapping = {"id": "loan_id", "status": "loan_status", "opened": "open_date", "amt": "loan_amount"}
+        self.client_config = {
+            "client_id": "TEST_CLIENT",
+            "status_code_mapping": {"A": "ACTIVE"},
+            "date_formats": ["MM/DD/YYYY"]
+        }
+        self.schema = {
+            "fields": {
+                "loan_id": {"type": "string"},
+                "loan_amount": {"type": "number"},
+                "open_date": {"type": "date"}
+            }
+        }
+
+    def test_plan_precomputes_client_settings(self):
+        plan = CompiledClientPlan(self.mapping, self.client_config, self.schema)
+
+        assert plan.source_columns == ["id", "status", "opened", "amt"]
+        assert plan.date_fields == ["open_date"]
+        assert plan.read_dtypes == {"id": "str", "opened": "str"}
+
+    def test_plan_read_options_prune_unmapped_columns(self):
+        schema = {"fields": {**self.schema["fields"], "loan_status": {"type": "string", "allowed_values": ["ACTIVE"]}}}
+        plan = CompiledClientPlan(self.mapping, self.client_config, schema)
+
+        options = plan.read_options(["id", "notes", "status", "amt", "opened"])
+
+        assert options["usecols"] == ["id", "status", "amt", "opened"]
+        assert options["dtype"] == {"id": "str", "status": "category", "opened": "str"}
+        assert plan.read_options(["notes"]) == {}
+
+    def test_plan_batch_holds_metadata_once(self):
+        plan = get_client_plan(self.mapping, self.client_config)
+        df = pd.DataFrame({"id": ["L1", "L2"], "status": ["A", "A"], "opened": ["05/01/2024", ""], "amt": [1.0, 2.0]})
+
+        batch = plan.transform_batch(df, plan.metadata("INGEST_001", "2024-01-01T00:00:00"))
+        frame = plan.transform_frame(df, "INGEST_001", "2024-01-01T00:00:00")
+
+        assert isinstance(batch, RecordBatch)
+        assert list(batch.frame.columns) == ["loan_id", "loan_status", "open_date", "loan_amount"]
+        assert batch.metadata == {
+            "client_id": "TEST_CLIENT", "ingestion_id": "INGEST_001", "ingestion_timestamp": "2024-01-01T00:00:00"
+        }
+        assert batch.columns == [
+            "loan_id", "loan_status", "open_date", "loan_amount", "client_id", "ingestion_id", "ingestion_timestamp"
+        ]
+        assert list(batch) == frame.to_dict(orient="records")
+
+    def test_plan_rejects_unknown_csv_engine(self):
+        with pytest.raises(ValueError, match="Unsupported CSV engine"):
+            CompiledClientPlan(self.mapping, {**self.client_config, "csv_engine": "fast"}, self.schema)
+
+    def test_get_client_plan_is_cached_by_config_hash(self):
+        plan = get_client_plan(self.mapping, self.client_config, self.schema)
+        reordered = dict(reversed(list(self.client_config.items())))
+
+        assert get_client_plan(self.mapping, reordered, self.schema) is plan
+        assert get_client_plan(self.mapping, {**self.client_config, "client_id": "OTHER"}, self.schema) is not plan
+        assert config_fingerprint(self.mapping, reordered, self.schema) == config_fingerprint(
+            self.mapping, self.client_config, self.schema
+        )
+
+    def test_plan_frame_and_record_paths_agree(self):
+        plan = get_client_plan(self.mapping, self.client_config)
+        df = pd.DataFrame({
+            "id": ["L1", "L2"],
+            "status": ["A", ""],
+            "opened": ["05/01/2024", "bad"],
+            "amt": [100.0, float("nan")]
+        })
+
+        frame = plan.transform_frame(df, "INGEST_001", "2024-01-01T00:00:00")
+        records = [plan.transform_record(row, "INGEST_001", "2024-01-01T00:00:00")
+                   for row in df.to_dict(orient="records")]
+
+        assert frame.to_dict(orient="records") == records
+        assert records[0]["loan_status"] == "ACTIVE"
+        assert records[1]["loan_status"] is None
+        assert records[1]["open_date"] is None
+        assert frame.attrs["date_failures"] == {"open_date": ["bad"]}
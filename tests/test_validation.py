@@ -1,6 +1,18 @@
 import pytest
-from validation.validator import validate_record, validate_records
+import pandas as pd
+from datetime import date
+from validation.validator import validate_record, validate_records, compile_schema, validate_frame
+from validation.coercion import coerce_frame, to_records
+from validation.error_budget import (
+    ErrorBudgetExceeded,
+    new_error_budget,
+    check_error_budget,
+    close_error_budget,
+    write_quarantine_report
+)
+from validation.error_codes import count_error_codes, render_errors, with_rendered_errors
 from validation import rules
+from transformation.batch import RecordBatch
 
 
 class TestValidateRecord:
@@ -203,6 +215,96 @@ class TestValidateRecords:
         assert len(rejected) == 1
 
 
+class TestValidateFrame:
+    def setup_method(self):
+        self.schema = {
+            "fields": {
+                "loan_id": {"type": "string", "required": True},
+                "loan_amount": {"type": "number", "required": True, "min": 0},
+                "credit_score": {"type": "integer", "required": False, "min": 300, "max": 850},
+                "loan_status": {"type": "string", "required": True, "allowed_values": ["ACTIVE", "CLOSED"]},
+                "open_date": {"type": "date", "required": True}
+            }
+        }
+
+    def test_validate_frame_matches_validate_records(self):
+        records = [
+            {"loan_id": "L001", "loan_amount": 15000.0, "credit_score": 700,
+             "loan_status": "ACTIVE", "open_date": "2024-05-01"},
+            {"loan_id": None, "loan_amount": "abc", "credit_score": 900,
+             "loan_status": "BAD", "open_date": "05/01/2024"},
+            {"loan_id": "L003", "loan_amount": -5, "credit_score": 700.5,
+             "loan_status": "CLOSED", "open_date": None},
+            {"loan_id": "", "loan_amount": "1_000", "credit_score": "",
+             "loan_status": "ACTIVE", "open_date": "2024-02-30"}
+        ]
+
+        clean_frame, rejected_frame = validate_frame(pd.DataFrame(records, dtype=object), compile_schema(self.schema))
+        clean, rejected = validate_records(records, self.schema, {})
+
+        # clean rows come back typed, rejected rows as received
+        assert [record["loan_id"] for record in to_records(clean_frame)] == [record["loan_id"] for record in clean]
+        assert to_records(clean_frame)[0] == {
+            "loan_id": "L001", "loan_amount": 15000.0, "credit_score": 700,
+            "loan_status": "ACTIVE", "open_date": date(2024, 5, 1)
+        }
+        rendered = with_rendered_errors(rejected_frame, compile_schema(self.schema))
+        assert rendered.to_dict(orient="records") == rejected
+        assert rejected[0]["errors"] == [
+            "Missing required field: loan_id",
+            "Invalid number for field: loan_amount",
+            "Value above maximum 850 for field: credit_score",
+            "Invalid value 'BAD' for field: loan_status",
+            "Invalid date format for field: open_date"
+        ]
+
+    def test_validate_frame_missing_column(self):
+        frame = pd.DataFrame({"loan_id": ["L001"]})
+
+        compiled = compile_schema(self.schema)
+        clean_frame, rejected_frame = validate_frame(frame, compiled)
+
+        assert len(clean_frame) == 0
+        assert render_errors(rejected_frame, compiled)[0][0] == "Missing required field: loan_amount"
+
+    def test_validate_frame_numeric_dtype_bounds(self):
+        frame = pd.DataFrame({
+            "loan_id": ["L001", "L002"],
+            "loan_amount": [100.0, 200.0],
+            "credit_score": [250.0, float("nan")],
+            "loan_status": ["ACTIVE", "ACTIVE"],
+            "open_date": ["2024-05-01", "2024-05-01"]
+        })
+
+        compiled = compile_schema(self.schema)
+        clean_frame, rejected_frame = validate_frame(frame, compiled)
+
+        assert list(clean_frame["loan_id"]) == ["L002"]
+        assert render_errors(rejected_frame, compiled) == [["Value below minimum 300 for field: credit_score"]]
+
+    def test_validate_frame_checks_batch_metadata_once(self):
+        schema = {"fields": {**self.schema["fields"], "client_id": {"type": "string", "required": True}}}
+        compiled = compile_schema(schema)
+        frame = pd.DataFrame({
+            "loan_id": ["L001", "L002"],
+            "loan_amount": [100.0, -1.0],
+            "loan_status": ["ACTIVE", "ACTIVE"],
+            "open_date": ["2024-05-01", "2024-05-01"]
+        })
+
+        clean, rejected = validate_frame(RecordBatch(frame, {"client_id": "TEST"}), compiled)
+        flat_clean, _ = validate_frame(frame.assign(client_id="TEST"), compiled)
+
+        assert isinstance(clean, RecordBatch)
+        assert to_records(clean) == to_records(flat_clean)
+        assert "client_id" not in clean.frame.columns
+        assert render_errors(rejected.frame, compiled) == [["Negative value not allowed for field: loan_amount"]]
+
+        _, rejected = validate_frame(RecordBatch(frame, {"client_id": None}), compiled)
+        assert render_errors(rejected.frame, compiled)[0][0] == "Missing required field: client_id"
+        assert len(rejected) == 2
+
+
 class TestValidationRules:
     def test_required_field_valid(self):
         valid, error = rules.required_field("value", "test_field")
@@ -239,6 +341,23 @@ class TestValidationRules:
         assert valid is False
         assert "Negative value" in error
 
+    def test_is_integer_valid(self):
+        valid, error = rules.is_integer("60", "test_field")
+        assert valid is True
+        assert error is None
+
+    def test_is_integer_fractional(self):
+        valid, error = rules.is_integer(1.5, "test_field")
+        assert valid is False
+        assert "Invalid integer" in error
+
+    def test_within_bounds(self):
+        assert rules.within_bounds(500, "test_field", 300, 850) == (True, None)
+        assert rules.within_bounds(900, "test_field", 300, 850) == (
+            False, "Value above maximum 850 for field: test_field"
+        )
+        assert "below minimum" in rules.within_bounds(1, "test_field", 300)[1]
+
     def test_allowed_values_valid(self):
         valid, error = rules.allowed_values("ACTIVE", "test_field", ["ACTIVE", "CLOSED"])
         assert valid is True
@@ -254,7 +373,158 @@ class TestValidationRules:
         assert valid is True
         assert error is None
 
+    def test_valid_date_rejects_impossible_day(self):
+        valid, error = rules.valid_date("2024-02-30", "test_field", ["%Y-%m-%d"])
+        assert valid is False
+        assert error == "Invalid date format for field: test_field"
+
     def test_valid_date_invalid(self):
         valid, error = rules.valid_date("invalid-date", "test_field", ["%Y-%m-%d"])
         assert valid is False
-        assert "Invalid date format" in error
\ No newline at end of file
+        assert "Invalid date format" in error
+
+class TestCoercion:
+    def setup_method(self):
+        self.schema = compile_schema({
+            "fields": {
+                "loan_amount": {"type": "number"},
+                "credit_score": {"type": "integer"},
+                "loan_status": {"type": "string", "allowed_values": ["ACTIVE", "CLOSED"]},
+                "open_date": {"type": "date"}
+            }
+        })
+
+    def test_coerce_frame_types_and_invalid_masks(self):
+        frame = pd.DataFrame({
+            "loan_amount": ["1500.50", "abc", None],
+            "credit_score": ["700", "700.5", None],
+            "loan_status": ["ACTIVE", "BOGUS", "CLOSED"],
+            "open_date": ["2024-05-01", "2024-02-30", None]
+        }, dtype=object)
+
+        typed, invalid = coerce_frame(frame, self.schema)
+
+        assert typed["loan_amount"].dtype == "float64"
+        assert str(typed["credit_score"].dtype) == "Int64"
+        assert isinstance(typed["loan_status"].dtype, pd.CategoricalDtype)
+        assert pd.api.types.is_datetime64_any_dtype(typed["open_date"])
+
+        assert list(invalid["loan_amount"]) == [False, True, False]
+        assert list(invalid["credit_score"]) == [False, True, False]
+        assert list(invalid["open_date"]) == [False, True, False]
+        assert typed["loan_amount"].iloc[0] == 1500.5
+
+    def test_to_records_returns_native_values(self):
+        frame = pd.DataFrame({
+            "loan_amount": ["1500.50", None],
+            "credit_score": ["700", None],
+            "loan_status": ["ACTIVE", None],
+            "open_date": ["2024-05-01", None]
+        }, dtype=object)
+
+        typed, _ = coerce_frame(frame, self.schema)
+        records = to_records(typed)
+
+        assert records[0] == {
+            "loan_amount": 1500.5,
+            "credit_score": 700,
+            "loan_status": "ACTIVE",
+            "open_date": date(2024, 5, 1)
+        }
+        assert type(records[0]["credit_score"]) is int
+        assert records[1] == {"loan_amount": None, "credit_score": None, "loan_status": None, "open_date": None}
+
+
+class TestErrorBudget:
+    def setup_method(self):
+        self.schema = compile_schema({"fields": {"loan_amount": {"type": "number", "required": True}}})
+
+    def frames(self, clean, rejected):
+        clean_frame = pd.DataFrame({"loan_id": [f"C{n}" for n in range(clean)], "loan_amount": 1.0})
+        rejected_frame = pd.DataFrame({"loan_id": [f"R{n}" for n in range(rejected)], "loan_amount": None})
+        return validate_frame(pd.concat([clean_frame, rejected_frame], ignore_index=True), self.schema)
+
+    def test_no_budget_without_max_error_percentage(self):
+        assert new_error_budget({"ingestion_settings": {}}) is None
+        assert new_error_budget({}) is None
+
+    def test_rate_judged_only_after_min_rows(self):
+        budget = new_error_budget({"ingestion_settings": {"max_error_percentage": 10, "error_budget_min_rows": 10}})
+
+        check_error_budget(budget, *self.frames(2, 3), self.schema)
+        with pytest.raises(ErrorBudgetExceeded, match="30.00% over 10 rows"):
+            check_error_budget(budget, *self.frames(5, 0), self.schema)
+
+        assert budget["reasons"]["Missing required field: loan_amount"] == 3
+
+    def test_complete_batch_is_judged_immediately(self):
+        budget = new_error_budget({"ingestion_settings": {"max_error_percentage": 10}})
+
+        check_error_budget(budget, *self.frames(10, 1), self.schema, complete=True)
+        with pytest.raises(ErrorBudgetExceeded):
+            check_error_budget(budget, *self.frames(0, 1), self.schema, complete=True)
+
+    def test_close_judges_short_files(self):
+        budget = new_error_budget({"ingestion_settings": {"max_error_percentage": 10}})
+        check_error_budget(budget, *self.frames(1, 1), self.schema)
+
+        with pytest.raises(ErrorBudgetExceeded):
+            close_error_budget(budget)
+
+    def test_write_quarantine_report(self, tmp_path):
+        budget = new_error_budget({"ingestion_settings": {"max_error_percentage": 10}})
+        check_error_budget(budget, *self.frames(1, 2), self.schema)
+
+        report = write_quarantine_report(budget, "in.csv", "TEST", "INGEST_001", directory=str(tmp_path))
+
+        assert report["report_path"] == str(tmp_path / "INGEST_001_quarantine.json")
+        assert report["rejection_rate_percent"] == 66.67
+        assert [record["loan_id"] for record in report["sample_rejected_records"]] == ["R0", "R1"]
+        assert report["sample_rejected_records"][0]["errors"] == ["Missing required field: loan_amount"]
+        assert report["committed_rows"] == 0
+        assert report["rolled_back"] is None
+
+
+class TestErrorCodes:
+    def setup_method(self):
+        self.compiled = compile_schema({
+            "fields": {
+                "loan_id": {"type": "string", "required": True},
+                "credit_score": {"type": "integer", "min": 300, "max": 850},
+                "loan_status": {"type": "string", "allowed_values": ["ACTIVE"]}
+            }
+        })
+
+    def test_compile_schema_assigns_a_slot_per_rule(self):
+        assert [check["slots"] for check in self.compiled] == [
+            {"missing": 0, "duplicate": 1, "already_stored": 2},
+            {"invalid_integer": 3, "below_min": 4, "above_max": 5},
+            {"not_allowed": 6}
+        ]
+
+    def test_rejected_rows_carry_codes_not_messages(self):
+        frame = pd.DataFrame({
+            "loan_id": [None, "L2", "L3"],
+            "credit_score": ["700", "900", "x"],
+            "loan_status": ["BAD", "ACTIVE", "BAD"]
+        }, dtype=object)
+
+        _, rejected_frame = validate_frame(frame, self.compiled)
+
+        assert "errors" not in rejected_frame.columns
+        assert list(rejected_frame["error_codes"]) == [1 << 0 | 1 << 6, 1 << 5, 1 << 3 | 1 << 6]
+        assert render_errors(rejected_frame, self.compiled)[2] == [
+            "Invalid integer for field: credit_score",
+            "Invalid value 'BAD' for field: loan_status"
+        ]
+
+    def test_count_error_codes_per_field_and_rule(self):
+        frame = pd.DataFrame({"loan_id": [None, None, "L3"], "loan_status": ["BAD", "ACTIVE", "BAD"]}, dtype=object)
+
+        _, rejected_frame = validate_frame(frame, self.compiled)
+        counts = count_error_codes(rejected_frame["error_codes"], self.compiled)
+
+        assert counts == {
+            ("loan_id", "missing", "Missing required field: loan_id"): 2,
+            ("loan_status", "not_allowed", "Invalid value for field: loan_status"): 2
+        }
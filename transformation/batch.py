@@ -0,0 +1,93 @@
+from typing import Dict, Iterator, Optional
+
+import pandas as pd
+
+
+# Rows converted to Python values at a time when a batch is read row by row
+RECORD_BLOCK_SIZE = 10000
+
+
+class RecordBatch:
+    """
+    One batch of rows in flight, held by column.
+
+    frame has a column per row-level field. metadata holds the fields
+    every row of the batch shares (client_id, ingestion_id,
+    ingestion_timestamp) once, rather than repeating them on each row;
+    where a name is in both, metadata wins.
+
+    Iterating a batch yields one dict per row, metadata included, built
+    a block at a time, so row-by-row code such as the bulk inserts can
+    consume it without a list of dicts for the whole batch.
+    """
+
+    __slots__ = ("frame", "metadata")
+
+    def __init__(self, frame: pd.DataFrame, metadata: Optional[Dict] = None):
+        self.frame = frame
+        self.metadata = dict(metadata or {})
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter_records(self.frame, self.metadata)
+
+    def __repr__(self) -> str:
+        return f"RecordBatch({len(self.frame)} rows, metadata={self.metadata})"
+
+    @property
+    def columns(self) -> list:
+        return list(self.frame.columns) + [name for name in self.metadata if name not in self.frame.columns]
+
+    def with_frame(self, frame: pd.DataFrame) -> "RecordBatch":
+        """
+        Another batch of the same ingestion, e.g. a filtered or typed copy.
+        """
+        return RecordBatch(frame, self.metadata)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        The batch as one flat DataFrame, metadata as constant columns.
+        """
+        frame = self.frame.assign(**self.metadata)
+        frame.attrs = dict(self.frame.attrs)
+        return frame
+
+
+def iter_records(frame: pd.DataFrame, metadata: Optional[Dict] = None) -> Iterator[Dict]:
+    """
+    Yield each row of a typed frame as a dict of native Python values
+    (see validation.coercion.to_records), with metadata added to each.
+    Columns are converted RECORD_BLOCK_SIZE rows at a time.
+    """
+    metadata = metadata or {}
+    names = [name for name in frame.columns if name not in metadata]
+    metadata_items = list(metadata.items())
+
+    for start in range(0, len(frame), RECORD_BLOCK_SIZE):
+        block = frame.iloc[start:start + RECORD_BLOCK_SIZE]
+        columns = [python_values(block[name]) for name in names]
+        rows = zip(*columns) if columns else [()] * len(block)
+        for row in rows:
+            record = dict(zip(names, row))
+            record.update(metadata_items)
+            yield record
+
+
+def python_values(column: pd.Series):
+    """
+    A column as an object array of floats, ints, datetime.date for date
+    columns, str, and None for anything missing.
+    """
+    if pd.api.types.is_datetime64_any_dtype(column):
+        values = column.dt.date.to_numpy(dtype=object, copy=True)
+        values[column.isna().to_numpy()] = None
+        return values
+
+    values = column.astype(object).to_numpy()
+    missing = pd.isna(values)
+    if missing.any():
+        values = values.copy()
+        values[missing] = None
+    return values
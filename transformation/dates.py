@@ -0,0 +1,311 @@
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Canonical date fields normalised to YYYY-MM-DD by the transformer
+DATE_FIELDS = ("open_date", "close_date", "last_payment_date")
+
+# Distinct raw strings remembered across batches, per list of formats
+DATE_CACHE_SIZE = 65536
+
+# Distinct raw values sampled per file to find its dominant format
+DATE_SAMPLE_SIZE = 500
+
+
+def convert_format_string(fmt: str) -> str:
+    # If already in Python format, return as-is
+    if "%" in fmt:
+        return fmt
+
+    fmt = fmt.replace("YYYY", "%Y")
+    fmt = fmt.replace("YY", "%y")
+    fmt = fmt.replace("MM", "%m")
+    fmt = fmt.replace("DD", "%d")
+    fmt = fmt.replace("M", "%-m")  # Single M for non-padded month
+    fmt = fmt.replace("D", "%-d")  # Single D for non-padded day
+    # Clean up double replacements
+    fmt = fmt.replace("%-m%-m", "%m")
+    fmt = fmt.replace("%-d%-d", "%d")
+    return fmt
+
+
+# Layout tokens, longest first so YYYY is not read as YY + YY
+_LAYOUT_TOKENS = re.compile(r"YYYY|YY|MM|M|DD|D|%-?[A-Za-z%]")
+
+# What each supported token captures. Like strptime, month and day accept
+# one or two digits whether or not the layout pads them.
+_TOKEN_FIELDS = {
+    "YYYY": ("year", "[0-9]{4}"),
+    "%Y": ("year", "[0-9]{4}"),
+    "YY": ("year2", "[0-9]{2}"),
+    "%y": ("year2", "[0-9]{2}"),
+    "MM": ("month", "[0-9]{1,2}"),
+    "M": ("month", "[0-9]{1,2}"),
+    "%m": ("month", "[0-9]{1,2}"),
+    "%-m": ("month", "[0-9]{1,2}"),
+    "DD": ("day", "[0-9]{1,2}"),
+    "D": ("day", "[0-9]{1,2}"),
+    "%d": ("day", "[0-9]{1,2}"),
+    "%-d": ("day", "[0-9]{1,2}"),
+}
+
+_DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+@lru_cache(maxsize=None)
+def compile_date_layout(layout: str) -> Dict:
+    """
+    Compile one configured layout (YYYY-MM-DD, M/D/YYYY, %d.%m.%Y, ...)
+    into an anchored regex with year, month and day groups.
+
+    Layouts using anything other than year, month and day fields fall
+    back to strptime; the spec's "regex" is then None.
+    """
+    pattern = []
+    fields = []
+    position = 0
+
+    for token in _LAYOUT_TOKENS.finditer(layout):
+        pattern.append(re.escape(layout[position:token.start()]))
+        position = token.end()
+
+        field = _TOKEN_FIELDS.get(token.group())
+        if field is None:
+            return _strptime_layout(layout)
+        fields.append(field[0])
+        pattern.append(f"(?P<{field[0]}>{field[1]})")
+
+    pattern.append(re.escape(layout[position:]))
+
+    literals = _LAYOUT_TOKENS.sub("", layout)
+    if any(character.isalpha() for character in literals):
+        return _strptime_layout(layout)
+
+    has_year = sorted(field for field in fields if field.startswith("year")) in (["year"], ["year2"])
+    if not has_year or sorted(fields) != sorted(set(fields)) or {"month", "day"} - set(fields):
+        return _strptime_layout(layout)
+
+    return {
+        "layout": layout,
+        "regex": re.compile("^" + "".join(pattern) + r"\Z"),
+        "two_digit_year": "year2" in fields,
+        "strptime": None
+    }
+
+
+def _strptime_layout(layout: str) -> Dict:
+    # strptime has no %-m / %-d; %m and %d already accept unpadded values
+    python_fmt = convert_format_string(layout).replace("%-m", "%m").replace("%-d", "%d")
+    return {"layout": layout, "regex": None, "two_digit_year": False, "strptime": python_fmt}
+
+
+@lru_cache(maxsize=None)
+def compile_date_formats(date_formats: Tuple[str, ...]) -> Tuple[Dict, ...]:
+    """
+    Compile a client's configured layouts once per distinct layout list.
+    """
+    return tuple(compile_date_layout(layout) for layout in date_formats)
+
+
+def _full_year(year: int, two_digit_year: bool) -> int:
+    # same pivot as strptime's %y: 69-99 -> 1900s, 00-68 -> 2000s
+    if two_digit_year:
+        return year + (1900 if year >= 69 else 2000)
+    return year
+
+
+def _days_in_month(year, month):
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    return _DAYS_IN_MONTH[month - 1] + (leap & (month == 2))
+
+
+def parse_with_layout(raw_date, spec: Dict) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Parse one value with one compiled layout.
+    Returns (YYYY-MM-DD, None) on success or (None, reason) on failure.
+    """
+    layout = spec["layout"]
+
+    if not isinstance(raw_date, str):
+        return None, f"{raw_date!r} is not text"
+
+    if spec["regex"] is None:
+        try:
+            return datetime.strptime(raw_date, spec["strptime"]).strftime("%Y-%m-%d"), None
+        except ValueError:
+            return None, f"'{raw_date}' does not match layout {layout}"
+
+    match = spec["regex"].match(raw_date)
+    if match is None:
+        return None, f"'{raw_date}' does not match layout {layout}"
+
+    groups = match.groupdict()
+    year = _full_year(int(groups.get("year") or groups.get("year2")), spec["two_digit_year"])
+    month = int(groups["month"])
+    day = int(groups["day"])
+
+    if year < 1:
+        return None, f"year {year} out of range in '{raw_date}' ({layout})"
+    if not 1 <= month <= 12:
+        return None, f"month {month} out of range in '{raw_date}' ({layout})"
+    if not 1 <= day <= _days_in_month(year, month):
+        return None, f"day {day} out of range for {year:04d}-{month:02d} in '{raw_date}' ({layout})"
+
+    return f"{year:04d}-{month:02d}-{day:02d}", None
+
+
+# Parsed dates shared by parse_date and parse_date_column, keyed by the
+# tuple of formats they were parsed with; see _remember_dates
+_date_cache: Dict[Tuple[str, ...], Dict] = {}
+_date_cache_lock = threading.Lock()
+
+
+def _remember_dates(cache: Dict, parsed: Dict):
+    # drop the oldest entries to stay within DATE_CACHE_SIZE
+    overflow = len(cache) + len(parsed) - DATE_CACHE_SIZE
+    for raw_date in list(islice(cache, max(overflow, 0))):
+        del cache[raw_date]
+    if len(parsed) <= DATE_CACHE_SIZE:
+        cache.update(parsed)
+
+
+def _parse_compiled(raw_date, date_formats: Tuple[str, ...]) -> Optional[str]:
+    for spec in compile_date_formats(date_formats):
+        parsed, _ = parse_with_layout(raw_date, spec)
+        if parsed is not None:
+            return parsed
+
+    # if conversion fails
+    return None
+
+
+def parse_date(raw_date, date_formats: Iterable[str]) -> Optional[str]:
+    """
+    Parse a raw date against the client's formats and return it as
+    YYYY-MM-DD, or None if it is missing or no format matches.
+
+    Results are kept in a bounded cache shared with parse_date_column,
+    so a date that repeats across rows, chunks or files is parsed only
+    once.
+    """
+    if raw_date is None:
+        return None
+
+    date_formats = tuple(date_formats)
+    with _date_cache_lock:
+        cache = _date_cache.setdefault(date_formats, {})
+        if raw_date in cache:
+            return cache[raw_date]
+
+    parsed = _parse_compiled(raw_date, date_formats)
+    with _date_cache_lock:
+        _remember_dates(cache, {raw_date: parsed})
+    return parsed
+
+
+def explain_date_failure(raw_date, date_formats: Iterable[str]) -> str:
+    """
+    Say why a value matched none of the layouts, one reason per layout.
+    """
+    reasons = [parse_with_layout(raw_date, spec)[1] for spec in compile_date_formats(tuple(date_formats))]
+    return "; ".join(reasons) if reasons else "no date formats configured"
+
+
+def parse_date_column(values: pd.Series, date_formats: Iterable[str]) -> pd.Series:
+    """
+    Vectorized parse_date over a column. Values already in the date cache
+    are looked up; for the rest each layout's regex is applied to all
+    still-unparsed values at once and day/month ranges are checked with
+    array arithmetic, and the results are added to the cache.
+    Returns an object column of YYYY-MM-DD strings, None where unparsed.
+    """
+    date_formats = tuple(date_formats)
+    result = np.full(len(values), None, dtype=object)
+    raw = values.to_numpy(dtype=object)
+    pending = np.array([isinstance(value, str) for value in raw], dtype=bool)
+
+    with _date_cache_lock:
+        cache = _date_cache.setdefault(date_formats, {})
+        for position in np.flatnonzero(pending):
+            if raw[position] in cache:
+                result[position] = cache[raw[position]]
+                pending[position] = False
+
+    missed = np.flatnonzero(pending)
+    if not len(missed):
+        return pd.Series(result, index=values.index, dtype=object)
+
+    for spec in compile_date_formats(date_formats):
+        positions = np.flatnonzero(pending)
+        if not len(positions):
+            break
+
+        if spec["regex"] is None:
+            for position in positions:
+                result[position], _ = parse_with_layout(raw[position], spec)
+            pending[positions] = pd.isna(result[positions])
+            continue
+
+        parts = pd.Series(raw[positions], dtype=object).str.extract(spec["regex"])
+        year_column = "year2" if spec["two_digit_year"] else "year"
+        matched = parts[year_column].notna().to_numpy()
+
+        year = pd.to_numeric(parts[year_column]).fillna(0).to_numpy(dtype=np.int64)
+        if spec["two_digit_year"]:
+            year = year + np.where(year >= 69, 1900, 2000)
+        month = pd.to_numeric(parts["month"]).fillna(0).to_numpy(dtype=np.int64)
+        day = pd.to_numeric(parts["day"]).fillna(0).to_numpy(dtype=np.int64)
+
+        valid = matched & (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1)
+        valid[valid] &= day[valid] <= _days_in_month(year[valid], month[valid])
+
+        for position, y, m, d in zip(positions[valid], year[valid], month[valid], day[valid]):
+            result[position] = f"{y:04d}-{m:02d}-{d:02d}"
+        pending[positions[valid]] = False
+
+    with _date_cache_lock:
+        _remember_dates(cache, dict(zip(raw[missed], result[missed])))
+
+    return pd.Series(result, index=values.index, dtype=object)
+
+
+def infer_date_formats(values: Iterable, date_formats: List[str], sample_size: int = DATE_SAMPLE_SIZE) -> List[str]:
+    """
+    Reorder a client's formats so the one most of the sampled values
+    match is tried first.
+
+    Formats keep their configured order when they match equally often.
+    A value that several formats accept is parsed with the file's
+    dominant format, not whichever format is listed first.
+    """
+    specs = compile_date_formats(tuple(date_formats))
+    hits = Counter()
+
+    sample = pd.unique(pd.Series(list(values), dtype=object).dropna())[:sample_size]
+    for raw_date in sample:
+        for fmt, spec in zip(date_formats, specs):
+            if parse_with_layout(raw_date, spec)[0] is not None:
+                hits[fmt] += 1
+                break
+
+    position = {fmt: index for index, fmt in enumerate(date_formats)}
+    return sorted(date_formats, key=lambda fmt: (-hits[fmt], position[fmt]))
+
+
+def sample_date_values(frame: pd.DataFrame, fields: Iterable[str] = DATE_FIELDS) -> List:
+    """
+    Collect the raw values of every date field present in a frame.
+    """
+    values = []
+    for field_name in fields:
+        if field_name in frame.columns:
+            values.extend(frame[field_name].dropna().tolist())
+    return values
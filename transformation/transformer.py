@@ -1,23 +1,18 @@
 from datetime import datetime, UTC
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
+import hashlib
+import json
 import math
 
+import pandas as pd
 
-def convert_format_string(fmt: str) -> str:
-    # If already in Python format, return as-is
-    if "%" in fmt:
-        return fmt
-    
-    fmt = fmt.replace("YYYY", "%Y")
-    fmt = fmt.replace("YY", "%y")
-    fmt = fmt.replace("MM", "%m")
-    fmt = fmt.replace("DD", "%d")
-    fmt = fmt.replace("M", "%-m")  # Single M for non-padded month
-    fmt = fmt.replace("D", "%-d")  # Single D for non-padded day
-    # Clean up double replacements
-    fmt = fmt.replace("%-m%-m", "%m")
-    fmt = fmt.replace("%-d%-d", "%d")
-    return fmt
+from transformation.batch import RecordBatch
+from transformation.dates import (
+    DATE_FIELDS,
+    convert_format_string,
+    parse_date,
+    parse_date_column
+)
 
 
 def clean_record(record: Dict) -> Dict:
@@ -72,33 +67,26 @@ def normalize_date(record: Dict, client_config: Dict) -> Dict:
     """
     date_formats = client_config.get("date_formats", [])
 
-    if "open_date" in record:
-        raw_date = record.get("open_date")
-        for fmt in date_formats:
-            try:
-                # Convert format string to Python strptime format
-                python_fmt = convert_format_string(fmt)
-                parsed = datetime.strptime(raw_date, python_fmt)
-                record["open_date"] = parsed.strftime("%Y-%m-%d")
-                return record
-            except ValueError:
-                continue
-
-        # if conversion fails
-        record["open_date"] = None
-        return record
-
+    for field_name in DATE_FIELDS:
+        if field_name in record:
+            record[field_name] = parse_date(record.get(field_name), date_formats)
 
     return record
 
 
-def add_metadata(record: Dict, client_config: Dict, ingestion_id: str) -> Dict:
+def add_metadata(
+    record: Dict,
+    client_config: Dict,
+    ingestion_id: str,
+    ingestion_timestamp: Optional[datetime] = None
+) -> Dict:
     """
-    Add metadata fields to the record.
+    Add metadata fields to the record. Pass the ingestion's
+    ingestion_timestamp so every record of it is stamped alike.
     """
     record["client_id"] = client_config["client_id"]
     record["ingestion_id"] = ingestion_id
-    record["ingestion_timestamp"] = datetime.now(UTC).isoformat()
+    record["ingestion_timestamp"] = ingestion_timestamp or datetime.now(UTC)
 
     return record
 
@@ -110,24 +98,267 @@ def transform_records(
     ingestion_id: str
 ) -> List[Dict]:
     """
-    Apply all transformation steps to a list of records.
+    Apply all transformation steps to a list of records, stamping them
+    all with one ingestion_timestamp.
     """
-    transformed_records = []
+    plan = get_client_plan(mapping, client_config)
+    ingestion_timestamp = datetime.now(UTC)
+    return [plan.transform_record(record, ingestion_id, ingestion_timestamp) for record in records]
 
-    for record in records:
-        # 0) clean NaN values
-        record = clean_record(record)
-        
-        # 1) rename fields
-        record = apply_mapping(record, mapping)
 
-        # 2) normalize values
-        record = normalize_status(record, client_config)
-        record = normalize_date(record, client_config)
+def _as_python_values(series: pd.Series) -> pd.Series:
+    """
+    Cast a column to object dtype with None for every missing value.
+    """
+    series = series.astype(object)
+    return series.where(series.notna(), None)
+
+
+def _map_unique(series: pd.Series, func: Callable) -> pd.Series:
+    """
+    Apply func once per distinct non-null value and broadcast the results.
+
+    Lender files repeat the same status codes and dates many times, so this
+    is far cheaper than calling func for every row.
+    """
+    lookup = {value: func(value) for value in series.dropna().unique()}
+    return _as_python_values(series.map(lookup))
+
+
+def clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Column-wise equivalent of clean_record: NaN and empty strings become None.
+    """
+    cleaned = df.astype(object)
+    return cleaned.where(cleaned.notna() & (cleaned != ""), None)
+
+
+def apply_mapping_frame(df: pd.DataFrame, mapping: Dict) -> pd.DataFrame:
+    """
+    Column-wise equivalent of apply_mapping. Source columns missing from
+    the file become all-None target columns.
+    """
+    columns = {}
+
+    for src_field, target_field in mapping.items():
+        columns[target_field] = df[src_field] if src_field in df.columns else None
 
-        # 3) add metadata
-        record = add_metadata(record, client_config, ingestion_id)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def transform_frame(
+    df: pd.DataFrame,
+    mapping: Dict,
+    client_config: Dict,
+    ingestion_id: str,
+    ingestion_timestamp: Optional[datetime] = None,
+    date_formats: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Vectorized version of transform_records operating on whole columns.
+
+    Produces the same values as the per-record path; convert the result
+    with to_dict(orient="records") to get the equivalent list of dicts.
+    Pass ingestion_timestamp to stamp every batch of a run alike, and
+    date_formats to override the client's format order (see
+    infer_date_formats).
+    """
+    return get_client_plan(mapping, client_config).transform_frame(
+        df, ingestion_id, ingestion_timestamp, date_formats
+    )
+
+
+def _parse_date_values(series: pd.Series, date_formats: List[str]):
+    """
+    Parse the distinct values of a date column in one vectorized pass and
+    broadcast the results.
+    Returns (parsed_series, distinct values that failed to parse).
+    """
+    distinct = pd.Series(series.dropna().unique(), dtype=object)
+    parsed = parse_date_column(distinct, date_formats)
+
+    lookup = dict(zip(distinct, parsed))
+    failed = [value for value, iso in lookup.items() if iso is None]
+
+    return _as_python_values(series.map(lookup)), failed
+
+
+# read_csv engines a client config may select with "csv_engine"
+CSV_ENGINES = ("c", "python", "pyarrow")
+
+
+def read_dtype(field_spec: Dict) -> Optional[str]:
+    """
+    The dtype to read a source column as, from the schema field it maps to.
+
+    Fields with allowed_values are low-cardinality and read as categoricals;
+    other strings and dates are read as text, so ids like 00123 and dates
+    like 20240501 are never inferred as numbers. Numeric fields keep the
+    parser's own inference: a stray non-numeric value must reach the
+    validator rather than fail the read.
+    """
+    if field_spec["type"] == "string" and field_spec.get("allowed_values"):
+        return "category"
+    if field_spec["type"] in ("string", "date", "datetime"):
+        return "str"
+    return None
+
+
+class CompiledClientPlan:
+    """
+    Everything the transformer needs for one client, worked out once from
+    the mapping, client and (optionally) schema configs: the rename
+    table, status lookup, date fields and read dtypes.
+
+    transform_batch and transform_record are the fused per-batch and
+    per-row transforms; each source column is read, cleaned and
+    normalised in a single pass. transform_frame is transform_batch with
+    the metadata stamped on every row.
+    """
+
+    def __init__(self, mapping: Dict, client_config: Dict, schema: Optional[Dict] = None):
+        self.client_id = client_config.get("client_id")
+        self.rename = list(mapping.items())
+        self.source_columns = [source for source, _ in self.rename]
+        self.target_columns = list(dict.fromkeys(target for _, target in self.rename))
+
+        self.status_lookup = dict(client_config.get("status_code_mapping", {}))
+        self.date_formats = list(client_config.get("date_formats", []))
+        self.date_fields = [field for field in DATE_FIELDS if field in self.target_columns]
+
+        fields = schema["fields"] if schema else {}
+        self.read_dtypes = {
+            source: read_dtype(fields[target])
+            for source, target in self.rename
+            if target in fields and read_dtype(fields[target]) is not None
+        }
+
+        self.csv_engine = client_config.get("csv_engine", "c")
+        if self.csv_engine not in CSV_ENGINES:
+            raise ValueError(f"Unsupported CSV engine: {self.csv_engine}")
+
+    def read_options(self, header: List[str]) -> Dict:
+        """
+        usecols and dtype for read_csv, given the file's header. Only mapped
+        columns are read; with none of them in the file every column is
+        read, so each row is still rejected for its missing fields.
+        """
+        mapped = set(self.source_columns)
+        usecols = [column for column in header if column in mapped]
+        if not usecols:
+            return {}
+
+        return {
+            "usecols": usecols,
+            "dtype": {column: self.read_dtypes[column] for column in usecols if column in self.read_dtypes}
+        }
+
+    def transform_frame(
+        self,
+        df: pd.DataFrame,
+        ingestion_id: str,
+        ingestion_timestamp: Optional[datetime] = None,
+        date_formats: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        return self.transform_batch(
+            df, self.metadata(ingestion_id, ingestion_timestamp), date_formats
+        ).to_frame()
+
+    def metadata(self, ingestion_id: str, ingestion_timestamp: Optional[datetime] = None) -> Dict:
+        """
+        The metadata fields every row of an ingestion shares. Pass the
+        ingestion's ingestion_timestamp; it is taken now otherwise.
+        """
+        return {
+            "client_id": self.client_id,
+            "ingestion_id": ingestion_id,
+            "ingestion_timestamp": ingestion_timestamp or datetime.now(UTC)
+        }
+
+    def transform_batch(
+        self,
+        df: pd.DataFrame,
+        metadata: Dict,
+        date_formats: Optional[List[str]] = None
+    ) -> RecordBatch:
+        """
+        transform_frame without stamping metadata on every row: the
+        mapped columns come back in a RecordBatch that holds metadata once.
+        """
+        date_formats = self.date_formats if date_formats is None else date_formats
+        columns = {}
+        date_failures = {}
+
+        for source, target in self.rename:
+            if target in metadata:
+                continue
+
+            if source not in df.columns:
+                columns[target] = pd.Series([None] * len(df), index=df.index, dtype=object)
+                continue
+
+            column = clean_frame(df[source])
+
+            if target == "loan_status":
+                column = _map_unique(column, lambda raw_status: self.status_lookup.get(raw_status, raw_status))
+            elif target in self.date_fields:
+                column, failed = _parse_date_values(column, date_formats)
+                if failed:
+                    date_failures[target] = failed
+
+            columns[target] = column
+
+        frame = pd.DataFrame(columns, index=df.index)
+
+        # distinct raw dates no layout accepted, for the caller to report
+        frame.attrs["date_failures"] = date_failures
+
+        return RecordBatch(frame, metadata)
+
+    def transform_record(self, record: Dict, ingestion_id: str, ingestion_timestamp: Optional[datetime] = None) -> Dict:
+        transformed = {}
+
+        for source, target in self.rename:
+            value = record.get(source)
+            if (isinstance(value, float) and math.isnan(value)) or value == "":
+                value = None
+
+            if target == "loan_status":
+                value = self.status_lookup.get(value, value)
+            elif target in self.date_fields:
+                value = parse_date(value, self.date_formats)
+
+            transformed[target] = value
+
+        transformed["client_id"] = self.client_id
+        transformed["ingestion_id"] = ingestion_id
+        transformed["ingestion_timestamp"] = ingestion_timestamp or datetime.now(UTC)
+
+        return transformed
+
+
+# Compiled plans keyed by config_fingerprint
+_plan_cache: Dict[str, CompiledClientPlan] = {}
+
+
+def config_fingerprint(*configs) -> str:
+    """
+    Stable hash of the parsed config files; key order does not matter.
+    """
+    canonical = json.dumps(configs, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_client_plan(mapping: Dict, client_config: Dict, schema: Optional[Dict] = None) -> CompiledClientPlan:
+    """
+    Return the compiled plan for these configs, compiling it only the
+    first time this process sees them.
+    """
+    key = config_fingerprint(mapping, client_config, schema)
 
-        transformed_records.append(record)
+    plan = _plan_cache.get(key)
+    if plan is None:
+        plan = CompiledClientPlan(mapping, client_config, schema)
+        _plan_cache[key] = plan
 
-    return transformed_records
+    return plan
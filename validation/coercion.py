@@ -0,0 +1,144 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from transformation.batch import RecordBatch, iter_records
+from transformation.dates import parse_date_column
+
+
+def coerce_frame(frame: pd.DataFrame, compiled_schema: List[Dict]) -> Tuple[pd.DataFrame, Dict[str, np.ndarray]]:
+    """
+    Convert each schema field to a native typed column, once per batch:
+    number -> float64, integer -> Int64, date -> datetime64, strings with
+    allowed_values -> categorical. Other columns are left as they are.
+
+    Values that are present but cannot be converted become missing in the
+    typed frame and are flagged in the returned masks, keyed by field.
+    Returns (typed_frame, invalid_masks).
+    """
+    typed = {}
+    invalid_masks = {}
+
+    for check in compiled_schema:
+        field_name = check["field"]
+        if field_name not in frame.columns:
+            continue
+
+        column = frame[field_name]
+        present = present_mask(column)
+
+        if check["type"] in ("number", "integer"):
+            numbers, invalid = parse_numbers(column, present)
+            invalid &= present
+
+            if check["type"] == "integer":
+                integral = np.isfinite(numbers) & (numbers == np.floor(numbers))
+                invalid |= present & ~integral
+                typed[field_name] = pd.Series(
+                    np.where(integral & ~invalid, numbers, np.nan), index=frame.index
+                ).astype("Int64")
+            else:
+                typed[field_name] = pd.Series(np.where(invalid, np.nan, numbers), index=frame.index)
+
+            invalid_masks[field_name] = invalid
+
+        elif check["type"] == "date":
+            dates, invalid = _parse_iso_dates(column, present)
+            typed[field_name] = dates
+            invalid_masks[field_name] = invalid
+
+        elif check["type"] == "string" and check["allowed_values"] is not None:
+            # values outside the allowed set are rejected by the validator
+            allowed = column.astype(object).where(column.isin(check["allowed_values"]))
+            typed[field_name] = pd.Series(
+                pd.Categorical(allowed, categories=check["allowed_values"]),
+                index=frame.index
+            )
+
+    if not typed:
+        return frame, invalid_masks
+
+    return frame.assign(**typed), invalid_masks
+
+
+def present_mask(column: pd.Series) -> np.ndarray:
+    """
+    Rows holding a value, i.e. not None or NaN. An empty string counts as
+    present here, as it does in validate_record's type checks.
+    """
+    return column.notna().to_numpy().copy()
+
+
+def parse_numbers(column: pd.Series, present: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a column to float64 the way float() would.
+
+    pd.to_numeric handles the bulk of the column; the few values it cannot
+    parse fall back to float() so edge cases match rules.is_number.
+    Returns (numbers, invalid_mask).
+    """
+    if pd.api.types.is_numeric_dtype(column):
+        numbers = column.to_numpy(dtype=float, na_value=np.nan)
+        return numbers, np.zeros(len(column), dtype=bool)
+
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.astype(object)
+
+    numbers = pd.to_numeric(column, errors="coerce").to_numpy(dtype=float, na_value=np.nan, copy=True)
+    invalid = np.zeros(len(column), dtype=bool)
+
+    for position in np.flatnonzero(present & np.isnan(numbers)):
+        try:
+            numbers[position] = float(column.iat[position])
+        except (TypeError, ValueError, OverflowError):
+            invalid[position] = True
+
+    return numbers, invalid
+
+
+def _parse_iso_dates(column: pd.Series, present: np.ndarray) -> Tuple[pd.Series, np.ndarray]:
+    """
+    Parse YYYY-MM-DD values (the transformer's output) once per distinct
+    value, with the same strict checks as rules.valid_date.
+    """
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column, np.zeros(len(column), dtype=bool)
+
+    distinct = column[present].unique()
+    as_text = pd.Series([value if isinstance(value, str) else str(value) for value in distinct], dtype=object)
+    lookup = dict(zip(distinct, parse_date_column(as_text, ["%Y-%m-%d"])))
+
+    iso = column.map(lookup).where(pd.Series(present, index=column.index))
+    invalid = present & iso.isna().to_numpy()
+    dates = pd.to_datetime(iso, format="%Y-%m-%d")
+
+    return dates, invalid
+
+
+def to_records(frame) -> List[Dict]:
+    """
+    Materialise a typed frame, or a RecordBatch with its metadata, as
+    dicts of native Python values: floats, ints, datetime.date for date
+    columns, str, and None for anything missing.
+    """
+    if isinstance(frame, RecordBatch):
+        return list(frame)
+    return list(iter_records(frame))
+
+
+def untype_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Undo coerce_frame for clean rows that end up rejected after all:
+    dates go back to YYYY-MM-DD text and every column to plain objects,
+    the way rejected rows are written out.
+    """
+    columns = {}
+
+    for name in frame.columns:
+        column = frame[name]
+        if pd.api.types.is_datetime64_any_dtype(column):
+            column = column.dt.strftime("%Y-%m-%d")
+        columns[name] = column.astype(object)
+
+    return pd.DataFrame(columns, index=frame.index)
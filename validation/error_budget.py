@@ -0,0 +1,166 @@
+import json
+import os
+from collections import Counter
+from datetime import datetime, UTC
+from typing import Dict, List, Optional
+
+from transformation.batch import RecordBatch
+from validation.coercion import to_records
+from validation.error_codes import count_error_codes, with_rendered_errors, ERROR_CODES_COLUMN
+
+
+# Rows a streamed file must reach before its rejection rate is trusted
+ERROR_BUDGET_MIN_ROWS = 1000
+
+# Rejected rows kept as examples in the quarantine report
+QUARANTINE_SAMPLE_SIZE = 20
+
+QUARANTINE_DIR = "data/quarantine"
+
+
+class ErrorBudgetExceeded(Exception):
+    """
+    A file's rejection rate went over the client's max_error_percentage.
+    The budget holds the counts and reasons seen up to that point.
+    """
+    def __init__(self, budget: Dict):
+        self.budget = budget
+        super().__init__(
+            f"Rejection rate {rejection_rate(budget):.2f}% over {budget['rows_seen']} rows "
+            f"exceeds max_error_percentage of {budget['max_error_percentage']}%"
+        )
+
+
+def new_error_budget(client_config: Dict) -> Optional[Dict]:
+    """
+    Running error budget from the client's ingestion_settings, or None
+    when the client sets no max_error_percentage.
+    """
+    settings = client_config.get("ingestion_settings", {})
+    if settings.get("max_error_percentage") is None:
+        return None
+
+    return {
+        "max_error_percentage": float(settings["max_error_percentage"]),
+        "min_rows": settings.get("error_budget_min_rows", ERROR_BUDGET_MIN_ROWS),
+        "rows_seen": 0,
+        "rejected": 0,
+        # set once the rate has been judged and found within the limit
+        "judged": False,
+        "reasons": Counter(),
+        "samples": []
+    }
+
+
+def rejection_rate(budget: Dict) -> float:
+    if not budget["rows_seen"]:
+        return 0.0
+    return budget["rejected"] * 100 / budget["rows_seen"]
+
+
+def check_error_budget(
+    budget: Dict,
+    clean_frame,
+    rejected_frame,
+    compiled_schema: List[Dict],
+    complete: bool = False
+):
+    """
+    Add one validated batch to the budget and raise ErrorBudgetExceeded
+    if the running rejection rate is over the limit.
+
+    The batch is a pair of DataFrames or of RecordBatches. The rate is
+    only judged once min_rows rows have been seen, unless complete says
+    the batches so far are the whole file.
+    """
+    budget["rows_seen"] += len(clean_frame) + len(rejected_frame)
+    budget["rejected"] += len(rejected_frame)
+
+    metadata = {}
+    if isinstance(rejected_frame, RecordBatch):
+        rejected_frame, metadata = rejected_frame.frame, rejected_frame.metadata
+
+    if len(rejected_frame):
+        for (_, _, reason), hits in count_error_codes(rejected_frame[ERROR_CODES_COLUMN], compiled_schema).items():
+            budget["reasons"][reason] += hits
+
+        room = QUARANTINE_SAMPLE_SIZE - len(budget["samples"])
+        if room > 0:
+            sample = with_rendered_errors(rejected_frame.head(room), compiled_schema)
+            budget["samples"].extend(to_records(RecordBatch(sample, metadata)))
+
+    if complete or budget["rows_seen"] >= budget["min_rows"]:
+        close_error_budget(budget)
+
+
+def close_error_budget(budget: Dict):
+    """
+    Judge the budget on everything seen, however few rows that is.
+    Called once a streamed file has been read to the end.
+    """
+    if rejection_rate(budget) > budget["max_error_percentage"]:
+        raise ErrorBudgetExceeded(budget)
+    budget["judged"] = True
+
+
+def write_quarantine_report(
+    budget: Dict,
+    file_path: str,
+    client_id: str,
+    ingestion_id: str,
+    directory: str = QUARANTINE_DIR,
+    committed_rows: int = 0,
+    rolled_back: Optional[Dict] = None
+) -> Dict:
+    """
+    Record why a file was quarantined as <ingestion_id>_quarantine.json.
+    committed_rows is how many input rows earlier commits had stored, and
+    rolled_back the rows then deleted per table (None if they were not).
+    Returns the report, with its location under "report_path".
+    """
+    report = {
+        "client_id": client_id,
+        "ingestion_id": ingestion_id,
+        "file": file_path,
+        "quarantined_at": datetime.now(UTC).isoformat(),
+        "rows_seen": budget["rows_seen"],
+        "rejected_records": budget["rejected"],
+        "rejection_rate_percent": round(rejection_rate(budget), 2),
+        "max_error_percentage": budget["max_error_percentage"],
+        "top_rejection_reasons": budget["reasons"].most_common(10),
+        "sample_rejected_records": budget["samples"],
+        "committed_rows": committed_rows,
+        "rolled_back": rolled_back
+    }
+
+    os.makedirs(directory, exist_ok=True)
+    report_path = os.path.join(directory, f"{ingestion_id}_quarantine.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    report["report_path"] = report_path
+    return report
+
+
+def print_quarantine_report(report: Dict):
+    print("\nQUARANTINE REPORT")
+    print("-----------------")
+    print(f"File: {report['file']}")
+    print(f"Rows seen: {report['rows_seen']}")
+    print(f"Rejected records: {report['rejected_records']}")
+    print(f"Rejection rate: {report['rejection_rate_percent']}% (max {report['max_error_percentage']}%)")
+    if report["committed_rows"]:
+        if report["rolled_back"] is not None:
+            print(
+                f"Rolled back {report['committed_rows']} rows already committed "
+                f"({report['rolled_back']['loans']} loans, {report['rolled_back']['rejected_loans']} rejected rows; "
+                f"{report['rolled_back']['restored_loans']} replaced loans restored)"
+            )
+        else:
+            print(f"{report['committed_rows']} rows were already committed: run --rollback {report['ingestion_id']}")
+
+    print("\nTop rejection reasons:")
+    for reason, count in report["top_rejection_reasons"]:
+        print(f" - {reason}: {count}")
+
+    print(f"\nReport written to {report['report_path']}")
@@ -0,0 +1,166 @@
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+# Rule codes, in the order validate_record reports them for one field
+MISSING = "missing"
+INVALID_NUMBER = "invalid_number"
+NEGATIVE = "negative"
+INVALID_INTEGER = "invalid_integer"
+BELOW_MIN = "below_min"
+ABOVE_MAX = "above_max"
+INVALID_DATE = "invalid_date"
+NOT_ALLOWED = "not_allowed"
+DUPLICATE = "duplicate"
+ALREADY_STORED = "already_stored"
+
+RULE_MESSAGES = {
+    MISSING: "Missing required field: {field}",
+    INVALID_NUMBER: "Invalid number for field: {field}",
+    NEGATIVE: "Negative value not allowed for field: {field}",
+    INVALID_INTEGER: "Invalid integer for field: {field}",
+    BELOW_MIN: "Value below minimum {min} for field: {field}",
+    ABOVE_MAX: "Value above maximum {max} for field: {field}",
+    INVALID_DATE: "Invalid date format for field: {field}",
+    NOT_ALLOWED: "Invalid value '{value}' for field: {field}",
+    DUPLICATE: "Duplicate value '{value}' for field: {field}",
+    ALREADY_STORED: "Value '{value}' already stored for field: {field}"
+}
+
+# Rules whose message quotes the offending value
+QUOTED_RULES = (NOT_ALLOWED, DUPLICATE, ALREADY_STORED)
+
+ERROR_CODES_COLUMN = "error_codes"
+
+# The field duplicate detection runs on
+KEY_FIELD = "loan_id"
+
+
+def field_rules(check: Dict) -> List[str]:
+    """
+    The rules that can fail for one compiled field check, in report order.
+    """
+    rules = [MISSING] if check["required"] else []
+
+    if check["type"] == "number":
+        rules += [INVALID_NUMBER, NEGATIVE]
+    elif check["type"] == "integer":
+        rules.append(INVALID_INTEGER)
+    if check["type"] in ("number", "integer"):
+        rules += [rule for rule, limit in ((BELOW_MIN, "min"), (ABOVE_MAX, "max")) if check[limit] is not None]
+
+    if check["type"] == "date":
+        rules.append(INVALID_DATE)
+    if check["allowed_values"] is not None:
+        rules.append(NOT_ALLOWED)
+    if check["field"] == KEY_FIELD:
+        rules += [DUPLICATE, ALREADY_STORED]
+
+    return rules
+
+
+def new_error_codes(row_count: int, compiled_schema: List[Dict]) -> np.ndarray:
+    """
+    One bitmask per row with a bit for every (field, rule) slot. uint64
+    holds any realistic schema; wider ones fall back to Python ints.
+    """
+    slot_count = sum(len(check["slots"]) for check in compiled_schema)
+    if slot_count <= 64:
+        return np.zeros(row_count, dtype=np.uint64)
+    return np.array([0] * row_count, dtype=object)
+
+
+def set_error(codes: np.ndarray, mask: np.ndarray, check: Dict, rule: str):
+    bit = 1 << check["slots"][rule]
+    codes[mask] |= np.uint64(bit) if codes.dtype == np.uint64 else bit
+
+
+def _slot_hits(codes: np.ndarray, slot: int) -> np.ndarray:
+    if codes.dtype == np.uint64:
+        return (codes >> np.uint64(slot)) & np.uint64(1) == 1
+    return np.array([(code >> slot) & 1 == 1 for code in codes], dtype=bool)
+
+
+def error_label(check: Dict, rule: str) -> str:
+    """
+    A rule's message without the offending value, for counting reasons.
+    """
+    if rule in QUOTED_RULES:
+        return RULE_MESSAGES[rule].replace(" '{value}'", "").format(field=check["field"])
+    return RULE_MESSAGES[rule].format(field=check["field"], min=check["min"], max=check["max"])
+
+
+def count_error_codes(codes, compiled_schema: List[Dict]) -> Counter:
+    """
+    Rows failing each (field, rule) pair, counted straight from the bits
+    and keyed by (field, rule, reason) where reason is error_label's text.
+    """
+    codes = np.asarray(codes)
+    counts = Counter()
+    if not len(codes):
+        return counts
+
+    for check in compiled_schema:
+        for rule, slot in check["slots"].items():
+            hits = int(_slot_hits(codes, slot).sum())
+            if hits:
+                counts[(check["field"], rule, error_label(check, rule))] = hits
+
+    return counts
+
+
+def render_errors(rejected_frame: pd.DataFrame, compiled_schema: List[Dict]) -> List[List[str]]:
+    """
+    Turn each rejected row's error codes into validate_record's messages,
+    in the same order.
+
+    Messages are built once per distinct code; only the ones that quote
+    the offending value are formatted per row.
+    """
+    codes = rejected_frame[ERROR_CODES_COLUMN].to_numpy()
+    if not len(codes):
+        return []
+
+    distinct, inverse = np.unique(codes, return_inverse=True)
+    slots = [(slot, check, rule) for check in compiled_schema for rule, slot in check["slots"].items()]
+
+    # per distinct code: fixed messages, with a field name where a value is quoted
+    templates = []
+    for code in distinct:
+        template = []
+        for slot, check, rule in slots:
+            if (int(code) >> slot) & 1:
+                if rule in QUOTED_RULES:
+                    template.append((check["field"], rule))
+                else:
+                    template.append(RULE_MESSAGES[rule].format(field=check["field"], min=check["min"], max=check["max"]))
+        templates.append(template)
+
+    quoted = {part[0] for template in templates for part in template if isinstance(part, tuple)}
+    values = {field_name: rejected_frame[field_name].to_numpy() for field_name in quoted}
+
+    errors = []
+    for position, index in enumerate(inverse):
+        errors.append([
+            RULE_MESSAGES[part[1]].format(value=values[part[0]][position], field=part[0])
+            if isinstance(part, tuple) else part
+            for part in templates[index]
+        ])
+
+    return errors
+
+
+def with_rendered_errors(rejected_frame: pd.DataFrame, compiled_schema: List[Dict]) -> pd.DataFrame:
+    """
+    Replace the error_codes column with an "errors" column of messages,
+    for writing rejected rows out.
+    """
+    if ERROR_CODES_COLUMN not in rejected_frame.columns:
+        return rejected_frame
+
+    rendered = rejected_frame.drop(columns=[ERROR_CODES_COLUMN])
+    rendered["errors"] = render_errors(rejected_frame, compiled_schema)
+    return rendered
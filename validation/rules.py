@@ -1,6 +1,7 @@
-from datetime import datetime
 import math
 
+from transformation.dates import parse_date
+
 
 def required_field(value, field_name):
     if value is None or value == "" or (isinstance(value, float) and math.isnan(value)):
@@ -25,6 +26,27 @@ def non_negative(value, field_name):
         return False, f"Invalid number for field: {field_name}"
 
 
+def is_integer(value, field_name):
+    try:
+        if not float(value).is_integer():
+            return False, f"Invalid integer for field: {field_name}"
+        return True, None
+    except (TypeError, ValueError, OverflowError):
+        return False, f"Invalid integer for field: {field_name}"
+
+
+def within_bounds(value, field_name, minimum=None, maximum=None):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return False, f"Invalid number for field: {field_name}"
+    if minimum is not None and number < minimum:
+        return False, f"Value below minimum {minimum} for field: {field_name}"
+    if maximum is not None and number > maximum:
+        return False, f"Value above maximum {maximum} for field: {field_name}"
+    return True, None
+
+
 def allowed_values(value, field_name, allowed):
     if value not in allowed:
         return False, f"Invalid value '{value}' for field: {field_name}"
@@ -39,10 +61,6 @@ def valid_date(value, field_name, date_formats):
     # Convert to string if needed
     value_str = str(value) if not isinstance(value, str) else value
     
-    for fmt in date_formats:
-        try:
-            datetime.strptime(value_str, fmt)
-            return True, None
-        except ValueError:
-            continue
+    if parse_date(value_str, date_formats) is not None:
+        return True, None
     return False, f"Invalid date format for field: {field_name}"
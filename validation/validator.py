@@ -1,6 +1,11 @@
 from typing import List, Tuple, Dict
 
-from validation import rules
+import numpy as np
+import pandas as pd
+
+from validation import rules, error_codes
+from validation.coercion import coerce_frame, present_mask
+from transformation.batch import RecordBatch
 
 
 def validate_record(
@@ -35,6 +40,30 @@ def validate_record(
                 valid, error = rules.non_negative(value, field_name)
                 if not valid:
                     errors.append(error)
+                else:
+                    valid, error = rules.within_bounds(
+                        value,
+                        field_name,
+                        field_rules.get("min"),
+                        field_rules.get("max")
+                    )
+                    if not valid:
+                        errors.append(error)
+
+            if field_rules["type"] == "integer":
+                valid, error = rules.is_integer(value, field_name)
+                if not valid:
+                    errors.append(error)
+                    continue
+
+                valid, error = rules.within_bounds(
+                    value,
+                    field_name,
+                    field_rules.get("min"),
+                    field_rules.get("max")
+                )
+                if not valid:
+                    errors.append(error)
 
             if field_rules["type"] == "date":
                 # After transformation, dates are in ISO format (YYYY-MM-DD)
@@ -85,3 +114,162 @@ def validate_records(
             rejected_records.append(rejected_record)
 
     return clean_records, rejected_records
+
+
+def compile_schema(schema: Dict) -> List[Dict]:
+    """
+    Compile the canonical schema once into an ordered list of field checks
+    for validate_frame. Field order is kept so error messages come out in
+    the same order as validate_record.
+
+    Every rule a field can fail gets its own bit ("slots") in the
+    rejected rows' error codes.
+    """
+    compiled = []
+    slot = 0
+
+    for field_name, field_rules in schema["fields"].items():
+        check = {
+            "field": field_name,
+            "type": field_rules["type"],
+            "required": bool(field_rules.get("required")),
+            "min": field_rules.get("min"),
+            "max": field_rules.get("max"),
+            "allowed_values": field_rules.get("allowed_values")
+        }
+
+        check["slots"] = {}
+        for rule in error_codes.field_rules(check):
+            check["slots"][rule] = slot
+            slot += 1
+
+        compiled.append(check)
+
+    return compiled
+
+
+def validate_frame(
+    frame,
+    compiled_schema: List[Dict]
+):
+    """
+    Validate a whole batch using boolean masks per column.
+
+    The batch is first coerced to typed columns (see coerce_frame) and the
+    checks run on those, so no value is parsed twice. Applies the same
+    rules as validate_record; None and NaN both count as missing values.
+
+    Failures are recorded as bits, one per (field, rule), rather than
+    messages: render them with error_codes.with_rendered_errors where
+    rejected rows are written out.
+
+    frame may be a DataFrame or a RecordBatch; a batch's metadata fields
+    are checked once and their result applies to every row.
+    Returns (clean, rejected), of the same kind as frame: clean rows keep
+    their typed values, rejected rows keep the values as received, plus
+    an "error_codes" column.
+    """
+    if isinstance(frame, RecordBatch):
+        return _validate_batch(frame, compiled_schema)
+
+    codes, typed_frame = _error_codes(frame, compiled_schema, compiled_schema)
+    return _split_rejected(frame, typed_frame, codes)
+
+
+def _validate_batch(batch: RecordBatch, compiled_schema: List[Dict]) -> Tuple[RecordBatch, RecordBatch]:
+    shared = [check for check in compiled_schema if check["field"] in batch.metadata]
+    per_row = [check for check in compiled_schema if check["field"] not in batch.metadata]
+
+    codes, typed_frame = _error_codes(batch.frame, compiled_schema, per_row)
+    if shared:
+        shared_codes, _ = _error_codes(pd.DataFrame([batch.metadata], dtype=object), compiled_schema, shared)
+        codes |= shared_codes[0]
+
+    clean_frame, rejected_frame = _split_rejected(batch.frame, typed_frame, codes)
+    return batch.with_frame(clean_frame), batch.with_frame(rejected_frame)
+
+
+def _error_codes(
+    frame: pd.DataFrame,
+    compiled_schema: List[Dict],
+    checks: List[Dict]
+) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    Run checks (a subset of compiled_schema) over frame.
+    Returns (error_codes, typed_frame).
+    """
+    row_count = len(frame)
+    codes = error_codes.new_error_codes(row_count, compiled_schema)
+    typed_frame, invalid_masks = coerce_frame(frame, checks)
+
+    for check in checks:
+        field_name = check["field"]
+
+        if field_name in frame.columns:
+            column = frame[field_name]
+            typed = typed_frame[field_name]
+        else:
+            column = pd.Series([None] * row_count, index=frame.index, dtype=object)
+            typed = column
+
+        present = present_mask(column)
+
+        # Required check
+        if check["required"]:
+            missing = ~present | (column == "").to_numpy(dtype=bool, na_value=False)
+            error_codes.set_error(codes, missing, check, error_codes.MISSING)
+            present &= ~missing
+
+        # rows still being checked for this field
+        alive = present.copy()
+        invalid = present & invalid_masks.get(field_name, np.zeros(row_count, dtype=bool))
+
+        # Type checks
+        if check["type"] in ("number", "integer"):
+            numbers = typed.to_numpy(dtype=float, na_value=np.nan) if field_name in invalid_masks \
+                else np.full(row_count, np.nan)
+
+            if check["type"] == "number":
+                error_codes.set_error(codes, invalid, check, error_codes.INVALID_NUMBER)
+                alive &= ~invalid
+
+                negative = alive & (numbers < 0)
+                error_codes.set_error(codes, negative, check, error_codes.NEGATIVE)
+                in_range = alive & ~negative
+            else:
+                error_codes.set_error(codes, invalid, check, error_codes.INVALID_INTEGER)
+                alive &= ~invalid
+                in_range = alive
+
+            _flag_bounds(codes, numbers, in_range, check)
+
+        if check["type"] == "date":
+            error_codes.set_error(codes, invalid, check, error_codes.INVALID_DATE)
+
+        if check["allowed_values"] is not None:
+            not_allowed = alive & ~column.isin(check["allowed_values"]).to_numpy()
+            error_codes.set_error(codes, not_allowed, check, error_codes.NOT_ALLOWED)
+
+    return codes, typed_frame
+
+
+def _split_rejected(frame: pd.DataFrame, typed_frame: pd.DataFrame, codes: np.ndarray):
+    rejected_mask = codes != 0
+
+    clean_frame = typed_frame[~rejected_mask]
+    rejected_frame = frame[rejected_mask].copy()
+    rejected_frame[error_codes.ERROR_CODES_COLUMN] = codes[rejected_mask]
+
+    return clean_frame, rejected_frame
+
+
+def _flag_bounds(codes: np.ndarray, numbers: np.ndarray, candidates: np.ndarray, check: Dict):
+    below = np.zeros(len(numbers), dtype=bool)
+
+    if check["min"] is not None:
+        below = candidates & (numbers < check["min"])
+        error_codes.set_error(codes, below, check, error_codes.BELOW_MIN)
+
+    if check["max"] is not None:
+        above = candidates & ~below & (numbers > check["max"])
+        error_codes.set_error(codes, above, check, error_codes.ABOVE_MAX)